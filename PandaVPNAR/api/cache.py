@@ -0,0 +1,242 @@
+"""
+Локальное зеркало списка ключей Outline.
+"""
+import time
+import logging
+from typing import Callable, Dict, Optional, List, Tuple
+
+from config import Config
+from api.models import AccessKey
+from api.servers import KEY_ID_SEPARATOR
+
+logger = logging.getLogger(__name__)
+
+# Имя ключа резерва: KEY_POOL_PREFIX и 32 шестнадцатеричных символа (uuid4().hex)
+POOL_MARKER_LENGTH = 32
+HEX_DIGITS = frozenset("0123456789abcdef")
+
+def pool_key_name(marker: str) -> str:
+    """
+    Имя ключа резерва на сервере.
+    
+    Args:
+        marker (str): Случайная метка (uuid4().hex)
+        
+    Returns:
+        str: Имя, по которому ключ опознается как ключ резерва
+    """
+    return f"{Config.KEY_POOL_PREFIX}{marker}"
+
+def is_pool_key(key: AccessKey) -> bool:
+    """
+    Проверка, что ключ из резерва.
+    
+    Имя должно целиком совпадать с форматом pool_key_name: одного
+    префикса мало, ключ «pool-party-laptop» остается обычным ключом.
+    
+    Args:
+        key (AccessKey): Ключ
+        
+    Returns:
+        bool: True для ключа резерва, еще не выданного пользователю
+    """
+    prefix = Config.KEY_POOL_PREFIX
+    if not prefix or not key.name.startswith(prefix):
+        return False
+    marker = key.name[len(prefix):]
+    return len(marker) == POOL_MARKER_LENGTH and HEX_DIGITS.issuperset(marker)
+
+def _id_order(key: AccessKey) -> Tuple[int, int, str]:
+    """Ключ сортировки, упорядочивающий числовые ID по значению."""
+    key_id = key.id.rpartition(KEY_ID_SEPARATOR)[2]
+    return (0, int(key_id), key_id) if key_id.isdigit() else (1, 0, key_id)
+
+class KeyCache:
+    """
+    Индекс ключей по ID с ограниченным временем жизни (TTL).
+    
+    Ключи резерва (см. services.key_pool) в зеркало не попадают и
+    не видны в списках, пока не выданы.
+    """
+    
+    _keys: Dict[str, AccessKey] = {}
+    _updated_at: float = 0.0  # Момент последней полной загрузки (monotonic)
+    _version: int = 0  # Увеличивается при любом изменении состава ключей
+    _sorted: Dict[str, Tuple[int, List[str]]] = {}  # Порядок сортировки -> (версия, список ID)
+    _watchers: List[Callable[[Optional[AccessKey], Optional[AccessKey]], None]] = []
+    
+    # Порядки сортировки для постраничного вывода: (функция ключа, по убыванию)
+    SORT_ORDERS = {
+        "name": (lambda key: (key.name.casefold(), _id_order(key)), False),
+        "id": (lambda key: _id_order(key), False),
+        "new": (lambda key: _id_order(key), True),  # ID в Outline выдаются по возрастанию
+    }
+    
+    @classmethod
+    def watch(cls, listener: Callable[[Optional[AccessKey], Optional[AccessKey]], None]) -> None:
+        """
+        Подписка на изменения отдельных ключей зеркала (например, для поискового индекса).
+        
+        Подписчик сразу получает все ключи, уже находящиеся в зеркале.
+        
+        Args:
+            listener: Функция (прежний ключ или None, новый ключ или None)
+        """
+        cls._watchers.append(listener)
+        for key in cls._keys.values():
+            listener(None, key)
+    
+    @classmethod
+    def _notify(cls, old: Optional[AccessKey], new: Optional[AccessKey]) -> None:
+        """Передача изменения ключа подписчикам."""
+        for listener in cls._watchers:
+            try:
+                listener(old, new)
+            except Exception as e:
+                logger.error(f"Ошибка подписчика зеркала ключей: {str(e)}")
+    
+    @classmethod
+    def is_fresh(cls) -> bool:
+        """
+        Проверка актуальности зеркала.
+    
+        Returns:
+            bool: True если зеркало заполнено и TTL не истек
+        """
+        if not cls._updated_at:
+            return False
+        return time.monotonic() - cls._updated_at < Config.KEYS_CACHE_TTL
+    
+    @classmethod
+    def replace(cls, keys: List[AccessKey]) -> None:
+        """
+        Полная замена содержимого зеркала.
+    
+        Args:
+            keys (List[AccessKey]): Список ключей из ответа API
+        """
+        previous = cls._keys
+        cls._keys = {key.id: key for key in keys if not is_pool_key(key)}
+        if cls._watchers:
+            for key_id, key in cls._keys.items():
+                old = previous.get(key_id)
+                if old is not key and old != key:
+                    cls._notify(old, key)
+            for key_id in previous.keys() - cls._keys.keys():
+                cls._notify(previous[key_id], None)
+        cls._updated_at = time.monotonic()
+        cls._version += 1
+        logger.debug(f"Зеркало ключей обновлено: {len(cls._keys)} шт.")
+    
+    @classmethod
+    def put(cls, key: AccessKey) -> None:
+        """
+        Добавление или обновление одного ключа (write-through).
+    
+        Args:
+            key (AccessKey): Ключ
+        """
+        if is_pool_key(key):
+            return
+        old = cls._keys.get(key.id)
+        cls._keys[key.id] = key
+        cls._version += 1
+        if old is not key:
+            cls._notify(old, key)
+    
+    @classmethod
+    def remove(cls, key_id: str) -> None:
+        """
+        Удаление ключа из зеркала.
+    
+        Args:
+            key_id (str): ID ключа
+        """
+        old = cls._keys.pop(key_id, None)
+        if old is not None:
+            cls._version += 1
+            cls._notify(old, None)
+    
+    @classmethod
+    def get(cls, key_id: str) -> Optional[AccessKey]:
+        """
+        Получение ключа по ID за O(1).
+    
+        Args:
+            key_id (str): ID ключа
+    
+        Returns:
+            Optional[AccessKey]: Ключ или None
+        """
+        return cls._keys.get(key_id)
+    
+    @classmethod
+    def all(cls) -> List[AccessKey]:
+        """
+        Получение всех ключей из зеркала.
+    
+        Returns:
+            List[AccessKey]: Список ключей
+        """
+        return list(cls._keys.values())
+    
+    @classmethod
+    def sorted_ids(cls, sort: str) -> List[str]:
+        """
+        Получение отсортированного индекса ID.
+        
+        Индекс строится один раз на версию зеркала, поэтому
+        листание страниц не пересортировывает список.
+        
+        Args:
+            sort (str): Порядок сортировки (ключ SORT_ORDERS)
+            
+        Returns:
+            List[str]: Отсортированный список ID
+        """
+        cached = cls._sorted.get(sort)
+        if cached and cached[0] == cls._version:
+            return cached[1]
+        
+        order, reverse = cls.SORT_ORDERS.get(sort, cls.SORT_ORDERS["name"])
+        ids = [key.id for key in sorted(cls._keys.values(), key=order, reverse=reverse)]
+        cls._sorted[sort] = (cls._version, ids)
+        return ids
+    
+    @classmethod
+    def page(cls, sort: str, page: int, size: int) -> Tuple[List[AccessKey], int, int]:
+        """
+        Получение одной страницы ключей.
+        
+        Args:
+            sort (str): Порядок сортировки
+            page (int): Номер страницы (с нуля)
+            size (int): Размер страницы
+            
+        Returns:
+            Tuple[List[AccessKey], int, int]: Ключи страницы, фактический номер страницы и число страниц
+        """
+        ids = cls.sorted_ids(sort)
+        pages = max(1, -(-len(ids) // size))
+        page = min(max(page, 0), pages - 1)
+        start = page * size
+        return [cls._keys[key_id] for key_id in ids[start:start + size]], page, pages
+    
+    @classmethod
+    def mark_fresh(cls) -> None:
+        """Продление актуальности зеркала после сверки, не нашедшей изменений."""
+        cls._updated_at = time.monotonic()
+    
+    @classmethod
+    def invalidate(cls) -> None:
+        """Помечает зеркало как устаревшее."""
+        cls._updated_at = 0.0
+    
+    @classmethod
+    def clear(cls) -> None:
+        """Полностью очищает зеркало."""
+        for key in cls._keys.values():
+            cls._notify(key, None)
+        cls._keys = {}
+        cls._updated_at = 0.0
+        cls._version += 1
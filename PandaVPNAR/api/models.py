@@ -0,0 +1,224 @@
+"""
+Модель ключа доступа Outline и разбор списка ключей.
+"""
+import sys
+import json
+from typing import Dict, Optional, Any, Iterator, List
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен: без него список разбирается стандартным json
+    orjson = None
+
+from api.servers import make_key_id
+
+class AccessKey:
+    """
+    Ключ доступа Outline.
+    
+    Вместо словаря ответа API хранится компактный объект со слотами:
+    при десятках тысяч ключей это в несколько раз меньше памяти.
+    Повторяющиеся строки (имя сервера, метод шифрования) интернируются
+    и хранятся в одном экземпляре на все ключи.
+    """
+    
+    __slots__ = ("id", "server", "name", "port", "method", "password", "access_url", "data_limit")
+    
+    def __init__(
+        self,
+        id: str,
+        server: str,
+        name: str = "",
+        port: Optional[int] = None,
+        method: str = "",
+        password: str = "",
+        access_url: str = "",
+        data_limit: Optional[int] = None
+    ):
+        """
+        Args:
+            id (str): Составной ID ключа
+            server (str): Имя сервера
+            name (str): Имя ключа
+            port (Optional[int]): Порт
+            method (str): Метод шифрования
+            password (str): Пароль
+            access_url (str): Ссылка доступа ss://
+            data_limit (Optional[int]): Лимит трафика на сервере в байтах
+        """
+        self.id = id
+        self.server = sys.intern(server)
+        self.name = name
+        self.port = port
+        self.method = sys.intern(method)
+        self.password = password
+        self.access_url = access_url
+        self.data_limit = data_limit
+    
+    @classmethod
+    def from_api(cls, data: Dict[str, Any], server: str) -> "AccessKey":
+        """
+        Создание ключа из объекта ответа API сервера.
+        
+        Args:
+            data (dict): Ключ в формате Outline (ID на сервере)
+            server (str): Имя сервера
+        
+        Returns:
+            AccessKey: Ключ с составным ID
+        """
+        # Поля заполняются без вызова __init__: на больших списках это заметно быстрее
+        key = cls.__new__(cls)
+        get = data.get
+        key.id = make_key_id(server, data['id'])
+        key.server = sys.intern(server)
+        key.name = get('name') or ""
+        key.port = get('port')
+        key.method = sys.intern(get('method') or "")
+        key.password = get('password') or ""
+        key.access_url = get('accessUrl') or ""
+        limit = get('dataLimit')
+        key.data_limit = limit.get('bytes') if limit else None
+        return key
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AccessKey":
+        """
+        Восстановление ключа из словаря to_dict (например, из хранилища).
+        
+        Args:
+            data (dict): Ключ с составным ID и именем сервера
+        
+        Returns:
+            AccessKey: Ключ
+        """
+        limit = data.get('dataLimit')
+        return cls(
+            data['id'],
+            data['server'],
+            data.get('name') or "",
+            data.get('port'),
+            data.get('method') or "",
+            data.get('password') or "",
+            data.get('accessUrl') or "",
+            limit.get('bytes') if limit else None
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Ключ в формате Outline с составным ID и именем сервера.
+        
+        Returns:
+            dict: Словарь, пригодный для JSON
+        """
+        data = {
+            'id': self.id,
+            'server': self.server,
+            'name': self.name,
+            'port': self.port,
+            'method': self.method,
+            'password': self.password,
+            'accessUrl': self.access_url
+        }
+        if self.data_limit is not None:
+            data['dataLimit'] = {'bytes': self.data_limit}
+        return data
+    
+    def replace(self, **changes: Any) -> "AccessKey":
+        """
+        Копия ключа с измененными полями.
+        
+        Args:
+            **changes: Новые значения полей
+        
+        Returns:
+            AccessKey: Новый ключ
+        """
+        fields = {field: getattr(self, field) for field in self.__slots__}
+        fields.update(changes)
+        return AccessKey(**fields)
+    
+    def _values(self) -> tuple:
+        """Значения всех полей для сравнения."""
+        return tuple(getattr(self, field) for field in self.__slots__)
+    
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, AccessKey):
+            return NotImplemented
+        return self._values() == other._values()
+    
+    __hash__ = None
+    
+    def __repr__(self) -> str:
+        return f"AccessKey(id={self.id!r}, name={self.name!r}, port={self.port!r})"
+
+_decoder = json.JSONDecoder()
+
+def _skip(text: str, index: int) -> int:
+    """Пропуск пробельных символов."""
+    while index < len(text) and text[index] in " \t\n\r":
+        index += 1
+    return index
+
+def _iter_array(text: str, field: str) -> Iterator[Dict[str, Any]]:
+    """
+    Последовательный разбор элементов массива верхнего уровня.
+    
+    В памяти одновременно находится только один разобранный элемент,
+    а не весь список словарей, как после json.loads.
+    
+    Args:
+        text (str): JSON-объект
+        field (str): Имя поля с массивом
+    
+    Raises:
+        ValueError: Некорректный JSON
+    """
+    index = _skip(text, 0)
+    if text[index:index + 1] != "{":
+        raise ValueError("Ожидался JSON-объект")
+    index = _skip(text, index + 1)
+    while index < len(text) and text[index] != "}":
+        name, index = _decoder.raw_decode(text, index)
+        index = _skip(text, index)
+        if text[index:index + 1] != ":":
+            raise ValueError(f"Ожидалось «:» в позиции {index}")
+        index = _skip(text, index + 1)
+        
+        if name != field or text[index:index + 1] != "[":
+            _, index = _decoder.raw_decode(text, index)
+        else:
+            index = _skip(text, index + 1)
+            while text[index:index + 1] != "]":
+                item, index = _decoder.raw_decode(text, index)
+                yield item
+                index = _skip(text, index)
+                if text[index:index + 1] == ",":
+                    index = _skip(text, index + 1)
+            index += 1
+        
+        index = _skip(text, index)
+        if text[index:index + 1] == ",":
+            index = _skip(text, index + 1)
+
+def parse_keys(body: bytes, server: str) -> List[AccessKey]:
+    """
+    Разбор ответа GET /access-keys в список ключей.
+    
+    С установленным orjson ответ разбирается им целиком (быстрее всего),
+    и каждый словарь сразу заменяется ключом. Без orjson массив
+    разбирается поэлементно, и словари не накапливаются в памяти.
+    
+    Args:
+        body (bytes): Тело ответа
+        server (str): Имя сервера
+    
+    Returns:
+        List[AccessKey]: Ключи с составными ID
+    """
+    if orjson is not None:
+        items = orjson.loads(body).get('accessKeys', [])
+        for index, item in enumerate(items):
+            items[index] = AccessKey.from_api(item, server)
+        return items
+    return [AccessKey.from_api(item, server) for item in _iter_array(body.decode("utf-8"), 'accessKeys')]
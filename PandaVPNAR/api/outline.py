@@ -1,143 +1,461 @@
 """
 API клиент для взаимодействия с Outline VPN API.
 """
+import time
+import asyncio
+import hashlib
 import logging
-from typing import Dict, Optional, Any, List
+from functools import partial
+from typing import Dict, Optional, Any, List, Tuple
 
 import aiohttp
-from aiohttp.client_exceptions import ClientError
 
 from config import Config
+from api.cache import KeyCache
+from api.models import AccessKey, parse_keys
+from api.singleflight import SingleFlight
+from api.transport import TransportError
+from api.servers import OutlineServer, ServerPool, make_key_id, split_key_id
 
 logger = logging.getLogger(__name__)
 
 class OutlineAPI:
     """Класс для работы с API сервера Outline."""
     
-    _session: Optional[aiohttp.ClientSession] = None
-    _user_requests: Dict[int, int] = {}  # Счетчик запросов по user_id
+    # Одновременные чтения одного сервера выполняются одним запросом
+    _keys_flight = SingleFlight("access-keys")
+    _transfer_flight = SingleFlight("metrics/transfer")
+    _refresh_flight = SingleFlight("refresh")
+    
+    # Изменения ключей, сделанные ботом: сервер -> ID -> (момент, имя после изменения или None для удаленного)
+    _writes: Dict[str, Dict[str, Tuple[float, Optional[str]]]] = {}
+    
+    @classmethod
+    def _note_write(cls, key_id: str, name: Optional[str]) -> None:
+        """Запись изменения ключа, сделанного ботом (для различения изменений вне бота)."""
+        server_name, _ = split_key_id(key_id)
+        cls._writes.setdefault(server_name, {})[key_id] = (time.monotonic(), name)
     
     @classmethod
-    async def get_session(cls) -> aiohttp.ClientSession:
+    def writes(cls, server_name: str) -> Dict[str, Optional[str]]:
         """
-        Получение или создание aiohttp сессии.
+        Изменения ключей сервера, сделанные ботом и еще не снятые forget_writes.
         
+        Args:
+            server_name (str): Имя сервера
+            
+        Returns:
+            Dict[str, Optional[str]]: Имя ключа после изменения или None для удаленного по ID ключа
+        """
+        return {key_id: name for key_id, (_, name) in cls._writes.get(server_name, {}).items()}
+    
+    @classmethod
+    def forget_writes(cls, server_name: str, before: float) -> None:
+        """
+        Снятие изменений, уже отраженных в полученном списке ключей.
+        
+        Args:
+            server_name (str): Имя сервера
+            before (float): Момент начала запроса списка (monotonic)
+        """
+        writes = cls._writes.get(server_name)
+        if writes:
+            for key_id in [key_id for key_id, (at, _) in writes.items() if at < before]:
+                del writes[key_id]
+    
+    @classmethod
+    async def get_session(cls, server_name: Optional[str] = None) -> aiohttp.ClientSession:
+        """
+        Получение или создание aiohttp сессии сервера.
+        
+        Args:
+            server_name (Optional[str]): Имя сервера (по умолчанию основной)
+            
         Returns:
             aiohttp.ClientSession: Активная сессия
         """
-        if cls._session is None or cls._session.closed:
-            # Подготовка URL API
-            base_url = Config.OUTLINE_API_URL
-            if not base_url.endswith('/'):
-                base_url += '/'
-                logger.warning("Автоматически добавлен / в конец URL")
-                
-            cls._session = aiohttp.ClientSession(
-                base_url=base_url,
-                headers={"Authorization": f"Bearer {Config.OUTLINE_API_TOKEN}"},
-                connector=aiohttp.TCPConnector(ssl=False)
-            )
-        return cls._session
+        server = ServerPool.get(server_name) if server_name else ServerPool.default()
+        return await server.get_session()
     
     @classmethod
-    async def check_limit(cls, user_id: int) -> bool:
+    async def _fetch_keys(cls, server: OutlineServer) -> Optional[List[AccessKey]]:
         """
-        Проверка лимита запросов пользователя.
+        Получение ключей одного сервера с составными ID.
+        
+        Если тело ответа не изменилось с прошлого раза (совпал хэш),
+        JSON не разбирается заново и возвращается прежний список.
         
         Args:
-            user_id (int): ID пользователя
+            server (OutlineServer): Сервер Outline
             
         Returns:
-            bool: True если лимит не превышен, иначе False
+            Optional[List[AccessKey]]: Список ключей или None в случае ошибки
+        """
+        try:
+            resp = await server.transport.request("GET", "access-keys")
+        except TransportError as e:
+            logger.error(f"Ошибка соединения с API ({server.name}): {str(e)}")
+            return None
+        
+        if resp.status != 200:
+            logger.error(f"Ошибка API ({server.name}): {resp.status}, тело: {resp.text()}")
+            return None
+        fingerprint = hashlib.blake2b(resp.body, digest_size=16).hexdigest()
+        if fingerprint == server.keys_fingerprint and server.keys is not None:
+            return server.keys
+        
+        keys = parse_keys(resp.body, server.name)
+        server.key_count = len(keys)
+        server.keys_fingerprint = fingerprint
+        server.keys = keys
+        return keys
+    
+    @classmethod
+    async def _fetch_keys_with_timeout(cls, server: OutlineServer) -> Optional[List[AccessKey]]:
+        """Получение ключей сервера с ограничением по времени."""
+        try:
+            return await asyncio.wait_for(cls._fetch_keys(server), Config.OUTLINE_SERVER_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error(f"Сервер {server.name} не ответил за {Config.OUTLINE_SERVER_TIMEOUT} с")
+            return None
+        except Exception as e:
+            logger.error(f"Непредвиденная ошибка API ({server.name}): {str(e)}")
+            return None
+    
+    @classmethod
+    async def get_all_keys(cls) -> Optional[Dict[str, List[Any]]]:
+        """
+        Получение всех ключей со всех серверов Outline.
+        
+        Серверы опрашиваются параллельно; недоступные серверы
+        перечисляются в failedServers и не задерживают остальные.
+        Если список сервера уже запрашивается (например, соседним
+        обработчиком), используется ответ этого запроса.
+        
+        Returns:
+            Optional[Dict]: Словарь с ключами или None, если не ответил ни один сервер
+        """
+        servers = ServerPool.all()
+        results = await asyncio.gather(*(
+            cls._keys_flight.do(server.name, partial(cls._fetch_keys_with_timeout, server)) for server in servers
+        ))
+        
+        keys, failed = [], []
+        for server, server_keys in zip(servers, results):
+            if server_keys is None:
+                failed.append(server.name)
+            else:
+                keys.extend(server_keys)
+        
+        if len(failed) == len(servers):
+            return None
+        return {'accessKeys': keys, 'failedServers': failed}
+    
+    @classmethod
+    async def refresh_keys(cls) -> bool:
         """
-        if cls._user_requests.get(user_id, 0) >= Config.REQUEST_LIMIT:
+        Полная перезагрузка зеркала ключей с сервера.
+        
+        Одновременные вызовы (например, несколько обработчиков увидели
+        устаревшее зеркало) выполняют одну перезагрузку.
+        
+        Returns:
+            bool: True если зеркало успешно обновлено
+        """
+        return await cls._refresh_flight.do(None, cls._refresh_keys)
+    
+    @classmethod
+    async def _refresh_keys(cls) -> bool:
+        """Перезагрузка зеркала ключей (см. refresh_keys)."""
+        keys = await cls.get_all_keys()
+        if not keys or 'accessKeys' not in keys:
             return False
-        cls._user_requests[user_id] = cls._user_requests.get(user_id, 0) + 1
+        
+        # Ключи недоступных серверов остаются в зеркале до следующего обновления
+        failed = set(keys['failedServers'])
+        stale = [key for key in KeyCache.all() if key.server in failed]
+        KeyCache.replace(keys['accessKeys'] + stale)
         return True
     
     @classmethod
-    async def get_all_keys(cls) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+    async def list_keys(cls) -> Optional[List[AccessKey]]:
         """
-        Получение всех ключей с сервера Outline.
+        Получение списка ключей из зеркала (с загрузкой, если оно устарело).
         
         Returns:
-            Optional[Dict]: Словарь с ключами или None в случае ошибки
+            Optional[List[AccessKey]]: Список ключей или None в случае ошибки
         """
-        try:
-            session = await cls.get_session()
-            async with session.get("access-keys") as resp:
-                if resp.status == 200:
-                    return await resp.json()
-                logger.error(f"Ошибка API: {resp.status}, тело: {await resp.text()}")
-                return None
-        except ClientError as e:
-            logger.error(f"Ошибка соединения с API: {str(e)}")
+        if not KeyCache.is_fresh() and not await cls.refresh_keys():
             return None
-        except Exception as e:
-            logger.error(f"Непредвиденная ошибка API: {str(e)}")
+        return KeyCache.all()
+    
+    @classmethod
+    async def list_keys_page(cls, page: int, sort: str = "name") -> Optional[Tuple[List[AccessKey], int, int]]:
+        """
+        Получение одной страницы ключей из зеркала.
+        
+        Args:
+            page (int): Номер страницы (с нуля)
+            sort (str): Порядок сортировки: name, id или new
+            
+        Returns:
+            Optional[Tuple]: Ключи страницы, номер страницы и число страниц или None в случае ошибки
+        """
+        if not KeyCache.is_fresh() and not await cls.refresh_keys():
             return None
+        return KeyCache.page(sort, page, Config.KEYS_PAGE_SIZE)
+    
+    @classmethod
+    async def get_key(cls, key_id: str) -> Optional[AccessKey]:
+        """
+        Получение ключа по ID из зеркала.
+        
+        Args:
+            key_id (str): ID ключа
+            
+        Returns:
+            Optional[AccessKey]: Ключ или None, если ключ не найден
+        """
+        if not KeyCache.is_fresh():
+            await cls.refresh_keys()
+        return KeyCache.get(key_id)
     
     @classmethod
-    async def create_key(cls, port: int, name: str) -> Optional[Dict[str, Any]]:
+    async def create_key(cls, port: Optional[int], name: str, server_name: Optional[str] = None) -> Optional[AccessKey]:
         """
         Создание нового ключа.
         
         Args:
-            port (int): Номер порта
+            port (Optional[int]): Номер порта (None — порт сервера по умолчанию)
             name (str): Имя ключа
+            server_name (Optional[str]): Имя сервера (по умолчанию наименее нагруженный)
             
         Returns:
-            Optional[Dict]: Информация о созданном ключе или None в случае ошибки
+            Optional[AccessKey]: Созданный ключ или None в случае ошибки
         """
+        server = ServerPool.get(server_name) if server_name else ServerPool.least_loaded()
+        if server is None:
+            logger.error(f"Неизвестный сервер: {server_name}")
+            return None
+        
         try:
-            session = await cls.get_session()
-            async with session.post("access-keys", json={"port": port, "name": name}) as resp:
-                if resp.status == 201:
-                    return await resp.json()
-                logger.error(f"Ошибка создания ключа: {resp.status}, тело: {await resp.text()}")
-                return None
-        except ClientError as e:
-            logger.error(f"Ошибка соединения при создании ключа: {str(e)}")
+            body = {"name": name} if port is None else {"port": port, "name": name}
+            resp = await server.transport.request("POST", "access-keys", json=body)
+        except TransportError as e:
+            logger.error(f"Ошибка соединения при создании ключа ({server.name}): {str(e)}")
             return None
         except Exception as e:
             logger.error(f"Непредвиденная ошибка при создании ключа: {str(e)}")
             return None
+        
+        if resp.status != 201:
+            logger.error(f"Ошибка создания ключа ({server.name}): {resp.status}, тело: {resp.text()}")
+            return None
+        
+        key = AccessKey.from_api(resp.json(), server.name)
+        server.key_count += 1
+        cls._note_write(key.id, key.name)
+        KeyCache.put(key)
+        return key
     
     @classmethod
     async def delete_key(cls, key_id: str) -> bool:
         """
-        Удаление ключа по ID.
+        Удаление ключа по составному ID.
         
         Args:
-            key_id (str): ID ключа для удаления
+            key_id (str): Составной ID ключа для удаления
             
         Returns:
             bool: True если удаление успешно, иначе False
         """
+        server_name, server_key_id = split_key_id(key_id)
+        server = ServerPool.get(server_name)
+        if server is None:
+            logger.error(f"Неизвестный сервер: {server_name}")
+            return False
+        
         try:
-            session = await cls.get_session()
-            async with session.delete(f"access-keys/{key_id}") as resp:
-                success = resp.status == 204
-                if not success:
-                    logger.error(f"Ошибка удаления ключа: {resp.status}, тело: {await resp.text()}")
-                return success
-        except ClientError as e:
-            logger.error(f"Ошибка соединения при удалении ключа: {str(e)}")
+            resp = await server.transport.request("DELETE", f"access-keys/{server_key_id}")
+        except TransportError as e:
+            logger.error(f"Ошибка соединения при удалении ключа ({server.name}): {str(e)}")
             return False
         except Exception as e:
             logger.error(f"Непредвиденная ошибка при удалении ключа: {str(e)}")
             return False
+        
+        success = resp.status == 204
+        if success:
+            server.key_count = max(0, server.key_count - 1)
+            cls._note_write(key_id, None)
+            KeyCache.remove(key_id)
+        else:
+            logger.error(f"Ошибка удаления ключа ({server.name}): {resp.status}, тело: {resp.text()}")
+        return success
     
     @classmethod
-    async def close(cls) -> None:
-        """Закрывает сессию API при завершении работы."""
-        if cls._session and not cls._session.closed:
-            await cls._session.close()
-            cls._session = None
-            logger.info("API сессия закрыта")
+    async def set_data_limit(cls, key_id: str, limit: Optional[int]) -> bool:
+        """
+        Установка или снятие лимита трафика ключа на сервере.
+        
+        Args:
+            key_id (str): Составной ID ключа
+            limit (Optional[int]): Лимит в байтах или None, чтобы снять лимит
+            
+        Returns:
+            bool: True если сервер принял изменение, иначе False
+        """
+        server_name, server_key_id = split_key_id(key_id)
+        server = ServerPool.get(server_name)
+        if server is None:
+            logger.error(f"Неизвестный сервер: {server_name}")
+            return False
+        
+        path = f"access-keys/{server_key_id}/data-limit"
+        try:
+            if limit is None:
+                resp = await server.transport.request("DELETE", path)
+            else:
+                resp = await server.transport.request("PUT", path, json={"limit": {"bytes": limit}})
+        except TransportError as e:
+            logger.error(f"Ошибка соединения при изменении лимита ключа ({server.name}): {str(e)}")
+            return False
+        except Exception as e:
+            logger.error(f"Непредвиденная ошибка при изменении лимита ключа: {str(e)}")
+            return False
+        
+        # 404 при снятии означает, что лимита уже нет
+        if resp.status == 204 or (limit is None and resp.status == 404):
+            return True
+        logger.error(f"Ошибка изменения лимита ключа ({server.name}): {resp.status}, тело: {resp.text()}")
+        return False
+    
+    @classmethod
+    async def rename_key(cls, key_id: str, name: str) -> bool:
+        """
+        Переименование ключа на сервере.
+        
+        Args:
+            key_id (str): Составной ID ключа
+            name (str): Новое имя
+            
+        Returns:
+            bool: True если сервер принял изменение, иначе False
+        """
+        server_name, server_key_id = split_key_id(key_id)
+        server = ServerPool.get(server_name)
+        if server is None:
+            logger.error(f"Неизвестный сервер: {server_name}")
+            return False
+        
+        try:
+            resp = await server.transport.request("PUT", f"access-keys/{server_key_id}/name", json={"name": name})
+        except TransportError as e:
+            logger.error(f"Ошибка соединения при переименовании ключа ({server.name}): {str(e)}")
+            return False
+        except Exception as e:
+            logger.error(f"Непредвиденная ошибка при переименовании ключа: {str(e)}")
+            return False
+        
+        if resp.status != 204:
+            logger.error(f"Ошибка переименования ключа ({server.name}): {resp.status}, тело: {resp.text()}")
+            return False
+        
+        cls._note_write(key_id, name)
+        key = KeyCache.get(key_id)
+        if key is not None:
+            KeyCache.put(key.replace(name=name))
+        return True
+    
+    @classmethod
+    async def _fetch_transfer(cls, server: OutlineServer) -> Optional[Dict[str, int]]:
+        """
+        Получение счетчиков трафика одного сервера с составными ID.
+        
+        Args:
+            server (OutlineServer): Сервер Outline
+            
+        Returns:
+            Optional[Dict[str, int]]: Байты по ID ключа или None в случае ошибки
+        """
+        try:
+            resp = await asyncio.wait_for(
+                server.transport.request("GET", "metrics/transfer"),
+                Config.OUTLINE_SERVER_TIMEOUT
+            )
+        except (TransportError, asyncio.TimeoutError) as e:
+            logger.error(f"Не удалось получить статистику трафика ({server.name}): {str(e) or 'таймаут'}")
+            return None
+        except Exception as e:
+            logger.error(f"Непредвиденная ошибка при получении трафика ({server.name}): {str(e)}")
+            return None
+        
+        if resp.status != 200:
+            logger.error(f"Ошибка API трафика ({server.name}): {resp.status}, тело: {resp.text()}")
+            return None
+        counters = resp.json().get('bytesTransferredByUserId', {})
+        return {make_key_id(server.name, key_id): int(value) for key_id, value in counters.items()}
     
     @classmethod
-    def reset_limits(cls) -> None:
-        """Сбрасывает счетчики лимитов запросов."""
-        cls._user_requests.clear()
-        logger.info("Счетчики лимитов сброшены")
\ No newline at end of file
+    async def get_transfer_metrics(cls) -> Optional[Dict[str, int]]:
+        """
+        Получение счетчиков трафика со всех серверов.
+        
+        Returns:
+            Optional[Dict[str, int]]: Байты по составному ID ключа или None, если не ответил ни один сервер
+        """
+        servers = ServerPool.all()
+        results = await asyncio.gather(*(
+            cls._transfer_flight.do(server.name, partial(cls._fetch_transfer, server)) for server in servers
+        ))
+        
+        counters: Dict[str, int] = {}
+        for result in results:
+            if result is not None:
+                counters.update(result)
+        if all(result is None for result in results):
+            return None
+        return counters
+    
+    @classmethod
+    def get_stats(cls) -> List[Dict[str, Any]]:
+        """
+        Состояние серверов и транспорта для мониторинга.
+        
+        Returns:
+            List[dict]: Статистика по каждому серверу
+        """
+        return [
+            {
+                "server": server.name,
+                "keys": server.key_count,
+                "latency": server.latency,
+                "healthy": server.healthy,
+                **server.transport.stats()
+            }
+            for server in ServerPool.all()
+        ]
+    
+    @classmethod
+    async def warmup(cls) -> Dict[str, bool]:
+        """
+        Открытие соединений со всеми серверами заранее, до первого запроса.
+        
+        Returns:
+            Dict[str, bool]: Доступность серверов по имени
+        """
+        results = await ServerPool.ping_all()
+        for name, ok in results.items():
+            logger.info(f"Прогрев соединения с {name}: {'успешно' if ok else 'сервер недоступен'}")
+        return results
+    
+    @classmethod
+    async def keepalive(cls) -> None:
+        """Легкий запрос ко всем серверам, чтобы соединения пула не закрывались по простою."""
+        await ServerPool.ping_all()
+    
+    @classmethod
+    async def close(cls) -> None:
+        """Закрывает сессии API при завершении работы."""
+        await ServerPool.close()
+        logger.info("API сессии закрыты")
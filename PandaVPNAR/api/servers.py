@@ -0,0 +1,260 @@
+"""
+Реестр серверов Outline и маршрутизация ключей между ними.
+"""
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Dict, Optional, List, Tuple
+
+import aiohttp
+
+from config import Config
+from utils.metrics import Gauge
+from api.transport import Transport, TransportError, CircuitBreaker
+
+if TYPE_CHECKING:
+    from api.models import AccessKey
+
+logger = logging.getLogger(__name__)
+
+# Разделитель имени сервера и ID ключа в составном ID
+KEY_ID_SEPARATOR = ":"
+
+def make_key_id(server: str, key_id: str) -> str:
+    """
+    Формирование составного ID ключа.
+    
+    Args:
+        server (str): Имя сервера
+        key_id (str): ID ключа на сервере
+    
+    Returns:
+        str: Составной ID вида «server:id»
+    """
+    return f"{server}{KEY_ID_SEPARATOR}{key_id}"
+
+def split_key_id(qualified_id: str) -> Tuple[str, str]:
+    """
+    Разбор составного ID ключа.
+    
+    ID без имени сервера относится к серверу по умолчанию.
+    
+    Args:
+        qualified_id (str): Составной ID ключа
+    
+    Returns:
+        Tuple[str, str]: Имя сервера и ID ключа на сервере
+    """
+    server, separator, key_id = qualified_id.rpartition(KEY_ID_SEPARATOR)
+    if not separator:
+        return ServerPool.default().name, qualified_id
+    return server, key_id
+
+class OutlineServer:
+    """Один сервер Outline с собственной HTTP-сессией и статистикой нагрузки."""
+    
+    # Коэффициент сглаживания для средней задержки API
+    LATENCY_ALPHA = 0.3
+    
+    def __init__(self, name: str, url: str, token: str, cert_sha256: str = ""):
+        """
+        Args:
+            name (str): Короткое имя сервера (используется в ID ключей)
+            url (str): URL API сервера
+            token (str): Токен доступа к API
+            cert_sha256 (str): SHA-256 отпечаток самоподписанного сертификата (hex)
+        """
+        self.name = name
+        self.url = url if url.endswith('/') else url + '/'
+        self.token = token
+        self.cert_sha256 = cert_sha256.replace(":", "").lower()
+        self.key_count = 0
+        self.keys_fingerprint: Optional[str] = None  # Хэш тела последнего списка ключей
+        self.keys: Optional[List["AccessKey"]] = None  # Ключи, разобранные из этого тела
+        self.latency = 0.0  # Экспоненциальное среднее задержки, сек
+        self.healthy = True
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.transport = Transport(name, self.get_session, self.record_call)
+    
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        Получение или создание aiohttp сессии сервера.
+        
+        Returns:
+            aiohttp.ClientSession: Активная сессия
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                base_url=self.url,
+                headers={"Authorization": f"Bearer {self.token}"},
+                connector=self._make_connector()
+            )
+        return self._session
+    
+    def _make_connector(self) -> aiohttp.TCPConnector:
+        """
+        Создание пула соединений с настройками из конфигурации.
+        
+        Если задан отпечаток сертификата, соединение проверяется по нему
+        (сертификат Outline самоподписанный, поэтому цепочка CA не проверяется).
+        
+        Returns:
+            aiohttp.TCPConnector: Пул соединений
+        """
+        if self.cert_sha256:
+            ssl = aiohttp.Fingerprint(bytes.fromhex(self.cert_sha256))
+        else:
+            ssl = False
+        
+        return aiohttp.TCPConnector(
+            ssl=ssl,
+            limit=Config.OUTLINE_POOL_LIMIT,
+            limit_per_host=Config.OUTLINE_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=Config.OUTLINE_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=Config.OUTLINE_DNS_CACHE_TTL
+        )
+    
+    async def ping(self) -> bool:
+        """
+        Легкий запрос к серверу для открытия или поддержания соединения.
+        
+        Returns:
+            bool: True если сервер ответил
+        """
+        try:
+            resp = await self.transport.request("GET", "server")
+            return resp.status == 200
+        except TransportError as e:
+            logger.warning(f"Сервер {self.name} не ответил на проверку: {str(e)}")
+            return False
+    
+    def record_call(self, seconds: float, ok: bool) -> None:
+        """
+        Учет результата вызова API.
+        
+        Args:
+            seconds (float): Длительность вызова
+            ok (bool): Успешен ли вызов
+        """
+        self.latency += self.LATENCY_ALPHA * (seconds - self.latency)
+        if self.healthy != ok:
+            logger.warning(f"Сервер {self.name} {'снова доступен' if ok else 'недоступен'}")
+        self.healthy = ok
+    
+    @property
+    def available(self) -> bool:
+        """Сервер отвечал на последний запрос и circuit breaker не разомкнут."""
+        return self.healthy and self.transport.breaker.state != CircuitBreaker.OPEN
+    
+    @property
+    def load(self) -> float:
+        """Оценка нагрузки: число ключей с поправкой на задержку API."""
+        return (self.key_count + 1) * (1 + self.latency)
+    
+    async def close(self) -> None:
+        """Закрывает сессию сервера."""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+class ServerPool:
+    """Реестр серверов Outline."""
+    
+    _servers: Dict[str, OutlineServer] = {}
+    
+    @classmethod
+    def load(cls) -> None:
+        """
+        Заполнение реестра из конфигурации.
+        
+        Формат OUTLINE_SERVERS: «имя|url|токен|certSha256» через запятую.
+        Токен можно опустить (берется OUTLINE_API_TOKEN), certSha256 —
+        тоже, но тогда сертификат сервера не проверяется. Без
+        OUTLINE_SERVERS используется единственный сервер main из
+        OUTLINE_API_URL и OUTLINE_CERT_SHA256.
+        """
+        servers = {}
+        for name, url, token, cert in Config.outline_servers():
+            servers[name] = OutlineServer(name, url, token, cert)
+        cls._servers = servers
+        logger.info(f"Загружено серверов Outline: {len(servers)}")
+    
+    @classmethod
+    def all(cls) -> List[OutlineServer]:
+        """
+        Получение всех серверов.
+        
+        Returns:
+            List[OutlineServer]: Список серверов
+        """
+        if not cls._servers:
+            cls.load()
+        return list(cls._servers.values())
+    
+    @classmethod
+    def get(cls, name: str) -> Optional[OutlineServer]:
+        """
+        Получение сервера по имени.
+        
+        Args:
+            name (str): Имя сервера
+        
+        Returns:
+            Optional[OutlineServer]: Сервер или None, если такого нет
+        """
+        if not cls._servers:
+            cls.load()
+        return cls._servers.get(name)
+    
+    @classmethod
+    def default(cls) -> OutlineServer:
+        """
+        Получение сервера по умолчанию (первого в списке).
+        
+        Returns:
+            OutlineServer: Сервер по умолчанию
+        """
+        return cls.all()[0]
+    
+    @classmethod
+    def least_loaded(cls) -> OutlineServer:
+        """
+        Выбор наименее нагруженного доступного сервера для нового ключа.
+        
+        Returns:
+            OutlineServer: Выбранный сервер
+        """
+        servers = cls.all()
+        candidates = [server for server in servers if server.available] or servers
+        return min(candidates, key=lambda server: server.load)
+    
+    @classmethod
+    async def ping_all(cls) -> Dict[str, bool]:
+        """
+        Параллельная проверка всех серверов (прогрев и keepalive соединений).
+        
+        Returns:
+            Dict[str, bool]: Результат проверки по имени сервера
+        """
+        servers = cls.all()
+        results = await asyncio.gather(*(server.ping() for server in servers))
+        return {server.name: ok for server, ok in zip(servers, results)}
+    
+    @classmethod
+    async def close(cls) -> None:
+        """Закрывает сессии всех серверов."""
+        for server in cls._servers.values():
+            await server.close()
+
+# Состояние серверов вычисляется в момент сбора метрик
+SERVER_UP = Gauge(
+    "outline_server_up", "Сервер доступен и circuit breaker не разомкнут", ("server",),
+    function=lambda: {(server.name,): int(server.available) for server in ServerPool._servers.values()}
+)
+SERVER_LATENCY = Gauge(
+    "outline_server_latency_seconds", "Сглаженная задержка ответа сервера", ("server",),
+    function=lambda: {(server.name,): server.latency for server in ServerPool._servers.values()}
+)
+SERVER_KEYS = Gauge(
+    "outline_server_keys", "Число ключей на сервере", ("server",),
+    function=lambda: {(server.name,): server.key_count for server in ServerPool._servers.values()}
+)
@@ -0,0 +1,61 @@
+"""
+Объединение одновременных одинаковых запросов к серверам Outline (single-flight).
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """
+    Один вызов на ключ в каждый момент времени.
+    
+    Пока вызов с ключом выполняется, остальные вызывающие с тем же
+    ключом не делают свой запрос, а ждут его результат — тот же
+    разобранный ответ или то же исключение. Вызов выполняется в
+    отдельной задаче: отмена одного ожидающего (например, по таймауту
+    обработчика) не прерывает запрос для остальных.
+    """
+    
+    def __init__(self, name: str):
+        """
+        Args:
+            name (str): Имя группы вызовов (для метрик)
+        """
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+    
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Выполнение вызова или присоединение к уже идущему с тем же ключом.
+        
+        Args:
+            key (Hashable): Ключ вызова, например имя сервера
+            call: Функция, создающая корутину запроса
+        
+        Returns:
+            T: Результат вызова
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            COALESCED.inc(self.name)
+        return await asyncio.shield(task)
+    
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        """Снятие завершенного вызова: следующий вызов с этим ключом пойдет на сервер."""
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Исключение помечается полученным, даже если все ожидающие уже отменены
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Объединенный вызов {self.name} {key} завершился ошибкой: {task.exception()!r}")
+
+COALESCED = Counter("outline_coalesced_requests_total", "Запросы, получившие результат уже идущего вызова", ("call",))
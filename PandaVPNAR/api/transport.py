@@ -0,0 +1,259 @@
+"""
+Транспортный слой для запросов к серверам Outline: таймауты, повторы и circuit breaker.
+"""
+import json
+import time
+import random
+import asyncio
+import logging
+from typing import Dict, Optional, Any, Callable, Awaitable
+
+import aiohttp
+from aiohttp.client_exceptions import ClientError
+
+from config import Config
+from utils.metrics import OUTLINE_REQUESTS, OUTLINE_LATENCY, OUTLINE_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# Методы, которые безопасно повторять
+IDEMPOTENT_METHODS = frozenset({"GET", "PUT", "DELETE", "HEAD"})
+
+def endpoint_name(path: str) -> str:
+    """
+    Шаблон пути для меток метрик: ID в пути заменяются на {id}.
+    
+    Args:
+        path (str): Путь запроса, например access-keys/12/name
+        
+    Returns:
+        str: Шаблон, например access-keys/{id}/name
+    """
+    return "/".join("{id}" if any(char.isdigit() for char in part) else part for part in path.split("/"))
+
+class TransportError(Exception):
+    """Запрос не выполнен: сеть недоступна, истек таймаут или исчерпаны повторы."""
+
+class CircuitOpenError(TransportError):
+    """Сервер помечен как неисправный, запрос отклонен без обращения к сети."""
+
+class Response:
+    """Прочитанный ответ сервера."""
+    
+    __slots__ = ("status", "body")
+    
+    def __init__(self, status: int, body: bytes):
+        self.status = status
+        self.body = body
+    
+    def json(self) -> Any:
+        """Разбор тела ответа как JSON."""
+        return json.loads(self.body)
+    
+    def text(self) -> str:
+        """Тело ответа как строка."""
+        return self.body.decode("utf-8", errors="replace")
+
+class CircuitBreaker:
+    """
+    Автомат состояний closed → open → half-open.
+    
+    После OUTLINE_BREAKER_THRESHOLD ошибок подряд запросы отклоняются сразу.
+    Через OUTLINE_BREAKER_RESET секунд пропускается один пробный запрос:
+    при успехе автомат закрывается, при ошибке снова открывается.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+    
+    def __init__(self, name: str):
+        """
+        Args:
+            name (str): Имя сервера (для логов)
+        """
+        self.name = name
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0  # Сколько раз автомат размыкался
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+    
+    def allow(self) -> bool:
+        """
+        Проверка, можно ли выполнить запрос.
+        
+        Returns:
+            bool: True если запрос разрешен
+        """
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < Config.OUTLINE_BREAKER_RESET:
+                return False
+            self.state = self.HALF_OPEN
+            logger.info(f"Circuit breaker {self.name}: пробный запрос")
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+    
+    def release(self) -> None:
+        """Освобождает пробный запрос, который был отменен без результата."""
+        self._probe_in_flight = False
+    
+    def record_success(self) -> None:
+        """Учет успешного запроса."""
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit breaker {self.name}: сервер восстановлен")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+    
+    def record_failure(self) -> None:
+        """Учет неудачного запроса."""
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= Config.OUTLINE_BREAKER_THRESHOLD:
+            if self.state != self.OPEN:
+                self.trips += 1
+                logger.warning(f"Circuit breaker {self.name}: разомкнут после {self.failures} ошибок")
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+class Transport:
+    """Выполнение HTTP-запросов к одному серверу Outline."""
+    
+    def __init__(
+        self,
+        name: str,
+        get_session: Callable[[], Awaitable[aiohttp.ClientSession]],
+        on_result: Optional[Callable[[float, bool], None]] = None
+    ):
+        """
+        Args:
+            name (str): Имя сервера
+            get_session: Функция получения сессии сервера
+            on_result: Обработчик результата запроса (длительность, успех)
+        """
+        self.name = name
+        self.breaker = CircuitBreaker(name)
+        self._get_session = get_session
+        self._on_result = on_result
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.timeouts = 0
+    
+    @staticmethod
+    def _timeout() -> aiohttp.ClientTimeout:
+        """Таймауты одного запроса."""
+        return aiohttp.ClientTimeout(
+            total=Config.OUTLINE_CONNECT_TIMEOUT + Config.OUTLINE_READ_TIMEOUT,
+            sock_connect=Config.OUTLINE_CONNECT_TIMEOUT,
+            sock_read=Config.OUTLINE_READ_TIMEOUT
+        )
+    
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        """Задержка перед повтором: экспонента с полным джиттером."""
+        return random.uniform(0, Config.OUTLINE_RETRY_BACKOFF * 2 ** attempt)
+    
+    async def request(self, method: str, path: str, json: Optional[Dict[str, Any]] = None) -> Response:
+        """
+        Выполнение запроса с таймаутами, повторами и circuit breaker.
+        
+        Повторяются только идемпотентные методы и только при сетевых
+        ошибках, таймаутах и ответах 5xx.
+        
+        Args:
+            method (str): HTTP метод
+            path (str): Путь относительно URL API
+            json (Optional[dict]): Тело запроса
+        
+        Returns:
+            Response: Ответ сервера
+        
+        Raises:
+            CircuitOpenError: Сервер помечен как неисправный
+            TransportError: Запрос не удался после всех попыток
+        """
+        attempts = 1 + (Config.OUTLINE_RETRIES if method in IDEMPOTENT_METHODS else 0)
+        endpoint = endpoint_name(path)
+        last_error = ""
+        
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                OUTLINE_REQUESTS.inc(self.name, method, endpoint, "circuit_open")
+                raise CircuitOpenError(f"Сервер {self.name} временно недоступен")
+            if attempt:
+                self.retries += 1
+                OUTLINE_RETRIES.inc(self.name, method, endpoint)
+            
+            self.requests += 1
+            started = time.monotonic()
+            try:
+                session = await self._get_session()
+                async with session.request(method, path, json=json, timeout=self._timeout()) as resp:
+                    body = await resp.read()
+                    status = resp.status
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                last_error = "таймаут"
+                outcome = "timeout"
+            except ClientError as e:
+                last_error = str(e) or type(e).__name__
+                outcome = "error"
+            except Exception as e:
+                # Непредвиденная ошибка не повторяется, но учитывается как сбой:
+                # иначе пробный запрос half-open так и остался бы занятым
+                self._finish(started, False, method, endpoint, "error")
+                raise TransportError(f"{method} {path} на {self.name}: {type(e).__name__}: {e}") from e
+            else:
+                if status < 500:
+                    self._finish(started, True, method, endpoint, str(status))
+                    return Response(status, body)
+                last_error = f"HTTP {status}"
+                outcome = str(status)
+                if attempt == attempts - 1:
+                    # Последняя попытка: отдаем ответ вызывающему коду как есть
+                    self._finish(started, False, method, endpoint, outcome)
+                    return Response(status, body)
+            
+            self._finish(started, False, method, endpoint, outcome)
+            if attempt < attempts - 1:
+                await asyncio.sleep(self._backoff(attempt))
+        
+        raise TransportError(f"{method} {path} на {self.name}: {last_error}")
+    
+    def _finish(self, started: float, ok: bool, method: str, endpoint: str, outcome: str) -> None:
+        """Учет результата одной попытки."""
+        duration = time.monotonic() - started
+        OUTLINE_REQUESTS.inc(self.name, method, endpoint, outcome)
+        OUTLINE_LATENCY.observe(duration, self.name, method, endpoint)
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.failures += 1
+            self.breaker.record_failure()
+        if self._on_result:
+            self._on_result(duration, ok)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Статистика транспорта.
+        
+        Returns:
+            Dict: Состояние circuit breaker и счетчики запросов
+        """
+        return {
+            "breaker": self.breaker.state,
+            "trips": self.breaker.trips,
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+        }
@@ -0,0 +1,134 @@
+"""
+Локальный имитатор REST API сервера Outline.
+"""
+import json
+import asyncio
+from typing import Dict, Optional, Any
+
+from aiohttp import web
+
+class FakeOutline:
+    """
+    Имитатор Outline с заданным числом ключей и задержкой ответа.
+    
+    Тело списка ключей кэшируется до следующего изменения, чтобы
+    сам имитатор не становился узким местом при больших списках.
+    """
+    
+    def __init__(self, keys: int = 100, latency: float = 0.0, prefix: str = "/bench"):
+        """
+        Args:
+            keys (int): Начальное число ключей
+            latency (float): Задержка перед каждым ответом в секундах
+            prefix (str): Секретный префикс пути API
+        """
+        self.latency = latency
+        self.prefix = prefix
+        self.keys: Dict[str, Dict[str, Any]] = {}
+        self.transfer: Dict[str, int] = {}
+        self.next_id = 0
+        self.requests = 0
+        self._body: Optional[bytes] = None
+        self._runner: Optional[web.AppRunner] = None
+        for index in range(keys):
+            self._add(f"key-{index:06d}", 10000 + index % 50000)
+    
+    def _add(self, name: str, port: int) -> Dict[str, Any]:
+        """Создание ключа в памяти."""
+        key_id = str(self.next_id)
+        self.next_id += 1
+        key = {
+            "id": key_id,
+            "name": name,
+            "password": "bench",
+            "port": port,
+            "method": "chacha20-ietf-poly1305",
+            "accessUrl": f"ss://Y2hhY2hhMjAtaWV0Zi1wb2x5MTMwNTpiZW5jaA@127.0.0.1:{port}/?outline=1#{key_id}"
+        }
+        self.keys[key_id] = key
+        self._body = None
+        return key
+    
+    @web.middleware
+    async def _delay(self, request: web.Request, handler) -> web.StreamResponse:
+        """Учет запросов и искусственная задержка."""
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await handler(request)
+    
+    async def list_keys(self, request: web.Request) -> web.Response:
+        if self._body is None:
+            self._body = json.dumps({"accessKeys": list(self.keys.values())}).encode()
+        return web.Response(body=self._body, content_type="application/json")
+    
+    async def create_key(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        key = self._add(body.get("name", ""), body.get("port", 443))
+        return web.json_response(key, status=201)
+    
+    async def delete_key(self, request: web.Request) -> web.Response:
+        if self.keys.pop(request.match_info["id"], None) is None:
+            return web.Response(status=404)
+        self._body = None
+        return web.Response(status=204)
+    
+    async def rename_key(self, request: web.Request) -> web.Response:
+        key = self.keys.get(request.match_info["id"])
+        if key is None:
+            return web.Response(status=404)
+        key["name"] = (await request.json())["name"]
+        self._body = None
+        return web.Response(status=204)
+    
+    async def data_limit(self, request: web.Request) -> web.Response:
+        if request.match_info["id"] not in self.keys:
+            return web.Response(status=404)
+        return web.Response(status=204)
+    
+    async def transfer_metrics(self, request: web.Request) -> web.Response:
+        # Трафик растет при каждом опросе, как на живом сервере
+        for key_id in self.keys:
+            self.transfer[key_id] = self.transfer.get(key_id, 0) + (int(key_id) % 97 + 1) * 1024
+        return web.json_response({"bytesTransferredByUserId": self.transfer})
+    
+    async def server_info(self, request: web.Request) -> web.Response:
+        return web.json_response({"name": "bench", "serverId": "bench", "portForNewAccessKeys": 443})
+    
+    def app(self) -> web.Application:
+        """Создание aiohttp-приложения с маршрутами Outline."""
+        app = web.Application(middlewares=[self._delay])
+        p = self.prefix
+        app.router.add_get(f"{p}/access-keys", self.list_keys)
+        app.router.add_post(f"{p}/access-keys", self.create_key)
+        app.router.add_delete(f"{p}/access-keys/{{id}}", self.delete_key)
+        app.router.add_put(f"{p}/access-keys/{{id}}/name", self.rename_key)
+        app.router.add_put(f"{p}/access-keys/{{id}}/data-limit", self.data_limit)
+        app.router.add_delete(f"{p}/access-keys/{{id}}/data-limit", self.data_limit)
+        app.router.add_get(f"{p}/metrics/transfer", self.transfer_metrics)
+        app.router.add_get(f"{p}/server", self.server_info)
+        return app
+    
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Запуск имитатора.
+        
+        Args:
+            host (str): Адрес
+            port (int): Порт (0 — любой свободный)
+            
+        Returns:
+            str: URL API для OUTLINE_API_URL
+        """
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        return f"http://{host}:{port}{self.prefix}"
+    
+    async def stop(self) -> None:
+        """Остановка имитатора."""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
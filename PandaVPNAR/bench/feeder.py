@@ -0,0 +1,136 @@
+"""
+Синтетические обновления Telegram и сессия бота без сети.
+"""
+import asyncio
+import itertools
+from collections import Counter
+from datetime import datetime
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import CallbackQuery, Chat, InlineQuery, Message, Update, User
+
+class FakeSession(BaseSession):
+    """
+    Сессия бота, отвечающая на любой метод Bot API без обращения к сети.
+    
+    Методы, возвращающие сообщение, получают заглушку Message, остальные — True.
+    """
+    
+    def __init__(self, latency: float = 0.0):
+        """
+        Args:
+            latency (float): Задержка ответа Bot API в секундах
+        """
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(1)
+    
+    async def make_request(self, bot: Bot, method: TelegramMethod[TelegramType], timeout: Optional[int] = None) -> TelegramType:
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        
+        returning = method.__returning__
+        if returning is Message or Message in getattr(returning, "__args__", ()):
+            chat_id = getattr(method, "chat_id", None)
+            return Message(
+                message_id=next(self._message_ids),
+                date=datetime.now(),
+                chat=Chat(id=chat_id if isinstance(chat_id, int) else 0, type="private"),
+                text=getattr(method, "text", None)
+            ).as_(bot)
+        return True
+    
+    async def stream_content(self, url: str, headers: Optional[Dict[str, Any]] = None, timeout: int = 30, chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b""
+    
+    async def close(self) -> None:
+        pass
+
+class UpdateFactory:
+    """Построение обновлений Telegram от имени заданных пользователей."""
+    
+    def __init__(self):
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+    
+    @staticmethod
+    def _user(user_id: int) -> User:
+        return User(id=user_id, is_bot=False, first_name=f"user{user_id}", username=f"user{user_id}")
+    
+    def message(self, user_id: int, text: str) -> Update:
+        """
+        Текстовое сообщение пользователя.
+        
+        Args:
+            user_id (int): ID пользователя
+            text (str): Текст сообщения
+            
+        Returns:
+            Update: Обновление
+        """
+        return Update(
+            update_id=next(self._update_ids),
+            message=Message(
+                message_id=next(self._message_ids),
+                date=datetime.now(),
+                chat=Chat(id=user_id, type="private"),
+                from_user=self._user(user_id),
+                text=text
+            )
+        )
+    
+    def callback(self, user_id: int, data: str) -> Update:
+        """
+        Нажатие inline-кнопки под сообщением бота.
+        
+        Args:
+            user_id (int): ID пользователя
+            data (str): callback_data кнопки
+            
+        Returns:
+            Update: Обновление
+        """
+        update_id = next(self._update_ids)
+        return Update(
+            update_id=update_id,
+            callback_query=CallbackQuery(
+                id=str(update_id),
+                from_user=self._user(user_id),
+                chat_instance=str(user_id),
+                data=data,
+                message=Message(
+                    message_id=next(self._message_ids),
+                    date=datetime.now(),
+                    chat=Chat(id=user_id, type="private"),
+                    text="bench"
+                )
+            )
+        )
+    
+    def inline_query(self, user_id: int, query: str) -> Update:
+        """
+        Inline-запрос «@бот запрос».
+        
+        Args:
+            user_id (int): ID пользователя
+            query (str): Текст запроса
+            
+        Returns:
+            Update: Обновление
+        """
+        update_id = next(self._update_ids)
+        return Update(
+            update_id=update_id,
+            inline_query=InlineQuery(
+                id=str(update_id),
+                from_user=self._user(user_id),
+                query=query,
+                offset=""
+            )
+        )
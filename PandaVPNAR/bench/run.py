@@ -0,0 +1,190 @@
+"""
+Запуск нагрузочного теста.
+
+Пример (из каталога PandaVPNAR):
+    python -m bench.run --keys 10000 --latency 0.02 --iterations 500
+    python -m bench.run --save-baseline bench/baseline.json
+    python -m bench.run --baseline bench/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import resource
+from typing import Callable, Dict, List
+
+from bench.fake_outline import FakeOutline
+from bench.feeder import FakeSession
+
+# ID администратора в синтетических обновлениях
+ADMIN_ID = 1
+
+# Сценарии, которые нельзя выполнять параллельно: у администратора одно состояние FSM,
+# а пачки burst должны не пересекаться, чтобы считать запросы к Outline на одну пачку
+SERIAL_SCENARIOS = {"create", "burst"}
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Перцентиль по отсортированной выборке (ближайший ранг)."""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, max(0, int(round(fraction * len(samples))) - 1))
+    return samples[index]
+
+def peak_rss_mb() -> float:
+    """Пиковый размер резидентной памяти процесса в МБ."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдает килобайты, macOS — байты
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+async def run_scenario(ctx, step, iterations: int, concurrency: int, upstream: Callable[[], int]) -> Dict[str, float]:
+    """
+    Выполнение одного сценария и расчет показателей.
+    
+    Args:
+        upstream: Счетчик запросов к имитатору Outline
+        
+    Returns:
+        Dict[str, float]: Пропускная способность, p50, p99 (мс), пиковая память и запросы к Outline на операцию
+    """
+    requests_before = upstream()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    
+    async def one(index: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await step(ctx, index)
+            latencies.append(time.perf_counter() - started)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(iterations)))
+    elapsed = time.perf_counter() - started
+    
+    latencies.sort()
+    return {
+        "ops_per_sec": round(iterations / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "outline_per_op": round((upstream() - requests_before) / iterations, 2),
+    }
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """Подготовка окружения, запуск сценариев и сбор результатов."""
+    fake = FakeOutline(keys=args.keys, latency=args.latency)
+    url = await fake.start()
+    
+    # Конфигурация читается при импорте, поэтому окружение задается до импорта модулей бота
+    os.environ.update({
+        "OUTLINE_API_URL": url,
+        "OUTLINE_API_TOKEN": "bench",
+        "OUTLINE_SERVERS": "",
+        "TELEGRAM_TOKEN": "123456:bench",
+        "ADMIN_ID": str(ADMIN_ID),
+        "STORAGE_URL": "memory://",
+        "METRICS_PORT": "0",
+        "REQUEST_LIMIT": str(10 ** 9),
+        "SEND_QUEUE_LIMIT": str(10 ** 9),
+    })
+    from aiogram import Bot
+    from config import Config
+    from api.cache import KeyCache
+    from api.outline import OutlineAPI
+    from bench.scenarios import SCENARIOS, BenchContext
+    from bot import create_dispatcher
+    from storage.backends import Storage
+    from utils.sender import MessageQueue
+    
+    # Тот же диспетчер, что и в боте, но с фиктивной сессией Bot API
+    bot = Bot(token=Config.TELEGRAM_TOKEN, session=FakeSession(latency=args.telegram_latency))
+    dp = create_dispatcher(bot)
+    MessageQueue.start(bot)
+    
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        await OutlineAPI.warmup()
+        await OutlineAPI.refresh_keys()
+        initial = [key.id for key in KeyCache.all()]
+        ctx = BenchContext(dp, bot, ADMIN_ID, list(initial))
+        
+        for name, step in SCENARIOS.items():
+            if args.scenario and name not in args.scenario:
+                continue
+            if name == "delete":
+                known = set(initial)
+                ctx.created = [key.id for key in KeyCache.all() if key.id not in known]
+            concurrency = 1 if name in SERIAL_SCENARIOS else args.concurrency
+            results[name] = await run_scenario(ctx, step, args.iterations, concurrency, lambda: fake.requests)
+            print(f"{name:<8} {results[name]['ops_per_sec']:>10.1f} оп/с  p50 {results[name]['p50_ms']:>9.3f} мс  "
+                  f"p99 {results[name]['p99_ms']:>9.3f} мс  RSS {results[name]['peak_rss_mb']:>7.1f} МБ  "
+                  f"Outline {results[name]['outline_per_op']:>6.2f} запр/оп")
+        print(f"Запросов к Outline: {fake.requests}, к Bot API: {sum(bot.session.calls.values())}")
+    finally:
+        await MessageQueue.stop(timeout=0)
+        await OutlineAPI.close()
+        await dp.storage.close()
+        await Storage.close()
+        await fake.stop()
+    return results
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """
+    Сравнение с сохраненным эталоном.
+    
+    Args:
+        results: Текущие показатели
+        baseline: Эталонные показатели
+        tolerance (float): Допустимое ухудшение (0.2 — на 20%)
+        
+    Returns:
+        List[str]: Описания регрессий
+    """
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        if current["p99_ms"] > reference["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {current['p99_ms']} мс против {reference['p99_ms']} мс")
+        if current["ops_per_sec"] < reference["ops_per_sec"] / (1 + tolerance):
+            regressions.append(f"{name}: {current['ops_per_sec']} оп/с против {reference['ops_per_sec']} оп/с")
+        if current["peak_rss_mb"] > reference["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{name}: RSS {current['peak_rss_mb']} МБ против {reference['peak_rss_mb']} МБ")
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота на имитаторе Outline")
+    parser.add_argument("--keys", type=int, default=1000, help="Число ключей на имитаторе (10–100000)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа Outline, с")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="Задержка ответа Bot API, с")
+    parser.add_argument("--iterations", type=int, default=200, help="Операций в каждом сценарии")
+    parser.add_argument("--concurrency", type=int, default=16, help="Одновременных операций")
+    parser.add_argument("--scenario", action="append", help="Запустить только указанные сценарии")
+    parser.add_argument("--baseline", help="Файл эталона для сравнения")
+    parser.add_argument("--save-baseline", help="Сохранить результаты как эталон")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Допустимое ухудшение относительно эталона")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.ERROR)
+    results = asyncio.run(run(args))
+    
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as file:
+            json.dump({"params": {"keys": args.keys, "latency": args.latency, "iterations": args.iterations}, "results": results}, file, indent=2)
+        print(f"Эталон сохранен: {args.save_baseline}")
+    
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"РЕГРЕССИЯ {line}")
+        if regressions:
+            sys.exit(1)
+        print("Регрессий нет")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Сценарии нагрузочного теста: одна операция — одна пользовательская цепочка обновлений.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, List
+
+from aiogram import Bot, Dispatcher
+
+from api.cache import KeyCache
+from bench.feeder import UpdateFactory
+
+# Одновременных нажатий в одной операции сценария burst
+BURST_SIZE = 16
+
+class BenchContext:
+    """Общее состояние сценариев."""
+    
+    def __init__(self, dp: Dispatcher, bot: Bot, admin_id: int, key_ids: List[str]):
+        """
+        Args:
+            dp (Dispatcher): Диспетчер с роутерами бота
+            bot (Bot): Бот с фиктивной сессией
+            admin_id (int): ID администратора
+            key_ids (List[str]): ID существующих ключей
+        """
+        self.dp = dp
+        self.bot = bot
+        self.admin_id = admin_id
+        self.key_ids = key_ids
+        self.created: List[str] = []
+        self.updates = UpdateFactory()
+    
+    async def feed(self, update) -> None:
+        """Передача обновления диспетчеру, как это делает polling."""
+        await self.dp.feed_update(self.bot, update)
+
+async def list_keys(ctx: BenchContext, index: int) -> None:
+    """Открытие списка ключей администратором."""
+    await ctx.feed(ctx.updates.callback(ctx.admin_id, "list_keys"))
+
+async def key_detail(ctx: BenchContext, index: int) -> None:
+    """Просмотр деталей ключа."""
+    key_id = ctx.key_ids[index % len(ctx.key_ids)]
+    await ctx.feed(ctx.updates.callback(ctx.admin_id, f"key_detail_{key_id}"))
+
+async def burst(ctx: BenchContext, index: int) -> None:
+    """Пачка одновременных открытий списка при устаревшем зеркале (двойные нажатия, несколько экранов)."""
+    KeyCache.invalidate()
+    await asyncio.gather(*(ctx.feed(ctx.updates.callback(ctx.admin_id, "list_keys")) for _ in range(BURST_SIZE)))
+
+async def search_keys(ctx: BenchContext, index: int) -> None:
+    """Inline-поиск ключей по началу имени."""
+    await ctx.feed(ctx.updates.inline_query(ctx.admin_id, f"key-{index % max(1, len(ctx.key_ids) // 100):04d}"))
+
+async def create_key(ctx: BenchContext, index: int) -> None:
+    """Создание ключа: кнопка, порт, имя и срок действия."""
+    await ctx.feed(ctx.updates.callback(ctx.admin_id, "create_key"))
+    await ctx.feed(ctx.updates.message(ctx.admin_id, "443"))
+    await ctx.feed(ctx.updates.message(ctx.admin_id, f"bench-{index}"))
+    await ctx.feed(ctx.updates.message(ctx.admin_id, "0"))
+
+async def delete_key(ctx: BenchContext, index: int) -> None:
+    """Удаление ключа с подтверждением (сначала удаляются созданные сценарием create)."""
+    pool = ctx.created or ctx.key_ids
+    if not pool:
+        return
+    key_id = pool.pop()
+    await ctx.feed(ctx.updates.callback(ctx.admin_id, f"delete_ask_{key_id}"))
+    await ctx.feed(ctx.updates.callback(ctx.admin_id, f"delete_confirm_{key_id}"))
+
+async def ticket(ctx: BenchContext, index: int) -> None:
+    """Запрос ключа новым пользователем."""
+    user_id = 1_000_000 + index
+    await ctx.feed(ctx.updates.callback(user_id, "request_key"))
+    await ctx.feed(ctx.updates.message(user_id, "Нужен доступ для работы"))
+
+async def approve(ctx: BenchContext, index: int) -> None:
+    """Одобрение заявки администратором (заявки с номерами 1..N создает сценарий ticket)."""
+    await ctx.feed(ctx.updates.callback(ctx.admin_id, f"ticket_ok_{index + 1}"))
+
+# Сценарии в порядке запуска
+SCENARIOS: Dict[str, Callable[[BenchContext, int], Awaitable[None]]] = {
+    "list": list_keys,
+    "detail": key_detail,
+    "burst": burst,
+    "search": search_keys,
+    "create": create_key,
+    "delete": delete_key,
+    "ticket": ticket,
+    "approve": approve,
+}
@@ -2,46 +2,209 @@
 Основной файл бота для управления VPN через Outline API.
 """
 import os
+import time
+import signal
 import logging
 import asyncio
-import socket
 from datetime import datetime, timedelta
+from typing import List
 
 from aiogram import Bot, Dispatcher, types
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
 
 from config import Config
 from api.outline import OutlineAPI
-from handlers import admin, user
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    filename='vpn_bot.log',  # Добавлен файл для логов
-    filemode='a'
+from services.traffic import TrafficCollector
+from services.quota import QuotaManager
+from services.expiry import ExpiryScheduler
+from services.tickets import TicketStore
+from services.key_pool import KeyPool
+from services.key_sync import KeySync, KeyChange, CHANGE_REMOVED
+from services.leader import LeaderLease, make_owner
+from services.workers import WorkerPool, ForwardMiddleware, serve_updates
+from storage.backends import Storage
+from storage.fsm import KVStorage
+from web.webhook import WebhookServer
+from web.metrics import MetricsServer
+from utils.sender import MessageQueue
+from utils.logging_setup import LogPipeline
+from utils.startup import check_dns, run_startup
+from utils.tasks import TaskSupervisor
+from utils.middlewares import (
+    UpdateMetricsMiddleware, HandlerMetricsMiddleware, TelegramMetricsMiddleware,
+    LogContextMiddleware, HandlerLogContextMiddleware, InFlightMiddleware
 )
-
-# Вывод логов также в консоль
-console = logging.StreamHandler()
-console.setLevel(logging.INFO)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-console.setFormatter(formatter)
-logging.getLogger('').addHandler(console)
+from handlers import admin, bulk, tickets, user
 
 logger = logging.getLogger(__name__)
 
-# Периодическое сбрасывание счетчиков запросов (раз в сутки)
-async def reset_request_counters():
-    """Периодически сбрасывает счетчики запросов для всех пользователей."""
+# Фоновая синхронизация зеркала ключей
+async def refresh_keys_cache():
+    """Периодически сверяет зеркало ключей с серверами Outline и применяет изменения (первую загрузку выполняет запуск)."""
+    while True:
+        try:
+            await asyncio.sleep(Config.KEYS_REFRESH_INTERVAL)
+            if not await KeySync.sync():
+                logger.warning("Не удалось обновить зеркало ключей")
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении зеркала ключей: {str(e)}")
+
+async def forget_removed_keys(changes: List[KeyChange]):
+    """Очистка статистики трафика, лимитов и сроков ключей, удаленных вне бота."""
+    for change in changes:
+        if change.kind == CHANGE_REMOVED and change.external:
+            TrafficCollector.forget(change.key_id)
+            await QuotaManager.forget(change.key_id)
+            await ExpiryScheduler.cancel(change.key_id)
+
+# Поддержание соединений с серверами Outline
+async def keep_outline_alive():
+    """Периодически отправляет легкий запрос, чтобы соединения не закрывались по простою."""
+    while True:
+        try:
+            await asyncio.sleep(Config.OUTLINE_KEEPALIVE_INTERVAL)
+            await OutlineAPI.keepalive()
+        except Exception as e:
+            logger.error(f"Ошибка проверки соединения с Outline: {str(e)}")
+
+# Сбор статистики трафика и применение лимитов
+async def collect_traffic():
+    """Периодически опрашивает счетчики трафика серверов Outline и проверяет лимиты."""
     while True:
         try:
-            await asyncio.sleep(86400)  # 24 часа
-            OutlineAPI.reset_limits()
+            if await TrafficCollector.collect():
+                if Config.BOT_WORKERS > 1:
+                    # Лимиты, назначенные через другие процессы, подхватываются перед проверкой
+                    await QuotaManager.sync()
+                await QuotaManager.enforce()
+            else:
+                logger.warning("Не удалось получить статистику трафика")
         except Exception as e:
-            logger.error(f"Ошибка при сбросе счетчиков: {str(e)}")
+            logger.error(f"Ошибка при сборе статистики трафика: {str(e)}")
+        await asyncio.sleep(Config.TRAFFIC_INTERVAL)
+
+# Фоновые задачи, которые выполняет только один процесс (лидер)
+LEADER_TASKS = ("leader_jobs", "keys_refresh", "traffic", "key_pool")
+
+async def start_leader_jobs():
+    """Запуск фоновых задач лидера: зеркало ключей, резерв ключей, трафик и лимиты, сроки действия ключей."""
+    TaskSupervisor.spawn("keys_refresh", refresh_keys_cache)
+    if Config.KEY_POOL_SIZE > 0:
+        TaskSupervisor.spawn("key_pool", KeyPool.run)
+    # Лимиты и сроки читаются из хранилища независимо; трафик проверяется после загрузки лимитов
+    await asyncio.gather(QuotaManager.load(), ExpiryScheduler.start())
+    TaskSupervisor.spawn("traffic", collect_traffic)
+
+async def spawn_leader_jobs():
+    """Запуск фоновых задач лидера под надзором без ожидания загрузки лимитов и сроков."""
+    TaskSupervisor.spawn("leader_jobs", start_leader_jobs)
+
+async def stop_leader_jobs():
+    """Остановка фоновых задач лидера."""
+    await TaskSupervisor.cancel(*LEADER_TASKS)
+    await ExpiryScheduler.stop()
+
+def create_bot() -> Bot:
+    """Создание экземпляра бота."""
+    return Bot(
+        token=Config.TELEGRAM_TOKEN, 
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+    )
+
+def create_dispatcher(bot: Bot) -> Dispatcher:
+    """Создание диспетчера с хранилищем состояний, роутерами и middleware."""
+    storage = KVStorage(
+        Storage.get(),
+        ttl=Config.FSM_TTL,
+        cache_size=Config.FSM_CACHE_SIZE,
+        flush_interval=Config.FSM_FLUSH_INTERVAL
+    )
+    dp = Dispatcher(storage=storage)
+    
+    # Учет обновлений в обработке для ожидания при остановке
+    dp.update.outer_middleware(InFlightMiddleware())
+    
+    # Регистрация роутеров обработчиков
+    dp.include_router(admin.router)
+    dp.include_router(bulk.router)
+    dp.include_router(tickets.router)
+    dp.include_router(user.router)
+    
+    # Метрики: обновления, обработчики и запросы к Bot API
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+    dp.inline_query.middleware(HandlerMetricsMiddleware())
+    bot.session.middleware(TelegramMetricsMiddleware())
+    
+    # Поля корреляции в логах: обновление, пользователь и обработчик
+    dp.update.outer_middleware(LogContextMiddleware())
+    dp.message.middleware(HandlerLogContextMiddleware())
+    dp.callback_query.middleware(HandlerLogContextMiddleware())
+    dp.inline_query.middleware(HandlerLogContextMiddleware())
+    
+    # Передаем бот-объект в контекст для обработчиков
+    # Это решение проблемы с доступом к боту в обработчиках для отправки сообщений
+    dp.workflow_data["bot"] = bot
+    return dp
+
+async def set_commands(bot: Bot):
+    """Установка команд бота."""
+    await bot.set_my_commands([
+        types.BotCommand(command="start", description="Открыть меню управления")
+    ])
+
+def install_stop_signals() -> asyncio.Event:
+    """
+    Перехват SIGTERM и SIGINT: вместо немедленного завершения процесса
+    выставляется событие, по которому прекращается прием обновлений.
+    
+    Returns:
+        asyncio.Event: Событие остановки
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    
+    def on_signal(sig: signal.Signals):
+        logger.info(f"Получен сигнал {sig.name}, прием обновлений прекращается")
+        stop.set()
+    
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, on_signal, sig)
+        except NotImplementedError:
+            pass  # Windows: остается остановка по KeyboardInterrupt
+    return stop
+
+async def run_webhook(dp: Dispatcher, bot: Bot, stop: asyncio.Event):
+    """Запуск бота в режиме webhook до сигнала остановки."""
+    server = WebhookServer(dp, bot)
+    await server.start()
+    logger.info("Бот запущен (webhook)")
+    try:
+        await stop.wait()
+    finally:
+        await server.stop()
+
+async def receive_updates(dp: Dispatcher, bot: Bot, stop: asyncio.Event, **kwargs):
+    """Получение обновлений через webhook или polling (в зависимости от BOT_MODE) до сигнала остановки."""
+    if Config.BOT_MODE == "webhook":
+        return await run_webhook(dp, bot, stop)
+    
+    await bot.delete_webhook()
+    logger.info("Бот запущен (polling)")
+    # Сессию бота закрываем сами, после завершения начатых обработчиков
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, close_bot_session=False, **kwargs))
+    stopped = asyncio.create_task(stop.wait())
+    try:
+        await asyncio.wait((polling, stopped), return_when=asyncio.FIRST_COMPLETED)
+        if not polling.done():
+            await dp.stop_polling()
+        await polling
+    finally:
+        stopped.cancel()
+        polling.cancel()
 
 async def main():
     """Основная функция запуска бота."""
@@ -50,34 +213,43 @@ async def main():
         logger.error("Не все обязательные переменные окружения заданы!")
         return
     
+    if Config.BOT_WORKERS > 1:
+        return await run_front()
+    
     # Инициализация бота и диспетчера
-    bot = Bot(
-        token=Config.TELEGRAM_TOKEN, 
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-    )
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+    started = time.perf_counter()
+    bot = create_bot()
+    dp = create_dispatcher(bot)
     
     try:
-        # Регистрация роутеров обработчиков
-        dp.include_router(admin.router)
-        dp.include_router(user.router)
+        stop = install_stop_signals()
+        KeySync.subscribe(forget_removed_keys)
+        await MetricsServer.start()
         
-        # Установка команд бота
-        await bot.set_my_commands([
-            types.BotCommand(command="start", description="Открыть меню управления")
-        ])
+        # Запуск очереди исходящих сообщений
+        MessageQueue.start(bot)
         
-        # Передаем бот-объект в контекст для обработчиков
-        # Это решение проблемы с доступом к боту в обработчиках для отправки сообщений
-        dp.workflow_data["bot"] = bot
+        # Фоновые задачи лидера запускаются без таймаута этапов: загрузка лимитов и сроков
+        # из большого хранилища не должна прерываться, а сбой перезапускает запуск задач
+        TaskSupervisor.spawn("leader_jobs", start_leader_jobs)
         
-        # Запуск задачи сброса счетчиков запросов
-        asyncio.create_task(reset_request_counters())
+        # Независимые этапы инициализации выполняются одновременно
+        results = await run_startup({
+            "DNS": check_dns(),
+            "Telegram API": bot.get_me(),
+            "команды бота": set_commands(bot),
+            "соединения Outline": OutlineAPI.warmup(),
+            "зеркало ключей": KeySync.sync(),
+            "очередь заявок": TicketStore.load()
+        })
+        if not results["DNS"]:
+            logger.error("Нет подключения к интернету!")
+            return
+        TaskSupervisor.spawn("outline_keepalive", keep_outline_alive)
         
         # Запуск бота
-        logger.info("Бот запущен")
-        await dp.start_polling(bot)
+        logger.info(f"Бот готов к работе за {(time.perf_counter() - started) * 1000:.0f} мс")
+        await receive_updates(dp, bot, stop)
     
     except Exception as e:
         logger.error(f"Критическая ошибка: {str(e)}")
@@ -85,23 +257,120 @@ async def main():
     finally:
         # Корректное завершение работы
         logger.info("Завершение работы бота...")
+        # Начатые обработчики (например, создание ключа) должны успеть отчитаться до закрытия сессий
+        await InFlightMiddleware.drain(Config.SHUTDOWN_TIMEOUT)
+        await stop_leader_jobs()
+        # Очередь отправки и сброс состояний FSM работают под надзором: их останавливают
+        # до остальных задач, чтобы успеть отправить сообщения и сохранить состояния
+        await MessageQueue.stop()
+        await dp.storage.close()
+        await TaskSupervisor.stop()
+        await MetricsServer.stop()
         await OutlineAPI.close()
+        await Storage.close()
         await bot.session.close()
 
-if __name__ == '__main__':
+async def run_front():
+    """
+    Приемный процесс многопроцессного режима: получает обновления и
+    раздает их процессам-обработчикам, сам их не обрабатывая.
+    """
+    bot = create_bot()
+    dp = Dispatcher()
+    # Роутеры нужны только для списка типов обновлений, которые запрашиваются у Telegram
+    dp.include_routers(admin.router, bulk.router, tickets.router, user.router)
+    pool = WorkerPool(worker_main, Config.BOT_WORKERS, LogPipeline.records())
+    dp.update.outer_middleware(ForwardMiddleware(pool))
+    
+    try:
+        stop = install_stop_signals()
+        results = await run_startup({
+            "DNS": check_dns(),
+            "Telegram API": bot.get_me(),
+            "команды бота": set_commands(bot)
+        })
+        if not results["DNS"]:
+            logger.error("Нет подключения к интернету!")
+            return
+        pool.start()
+        logger.info(f"Запущено процессов-обработчиков: {Config.BOT_WORKERS}")
+        # Передача идет по порядку, чтобы обновления одного пользователя не переставлялись
+        await receive_updates(dp, bot, stop, handle_as_tasks=False)
+    
+    except Exception as e:
+        logger.error(f"Критическая ошибка: {str(e)}")
+    
+    finally:
+        logger.info("Завершение работы бота...")
+        # Обработчики дообрабатывают свои очереди и завершаются
+        await pool.stop()
+        await Storage.close()
+        await bot.session.close()
+
+def worker_main(index: int, count: int, updates, records):
+    """
+    Точка входа процесса-обработчика.
+    
+    Args:
+        index (int): Номер процесса
+        count (int): Число процессов
+        updates: Очередь обновлений от приемного процесса
+        records: Очередь записей лога приемного процесса
+    """
+    # Останавливает обработчики приемный процесс, а не Ctrl+C в терминале
+    # или SIGTERM, разосланный менеджером служб всей группе процессов
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    LogPipeline.attach(records)
+    asyncio.run(run_worker(index, count, updates))
+
+async def run_worker(index: int, count: int, updates):
+    """Работа процесса-обработчика: обработка своей доли обновлений и, если он лидер, фоновых задач."""
+    bot = create_bot()
+    dp = create_dispatcher(bot)
+    
     try:
-        # Проверка подключения к интернету
-        socket.gethostbyname("api.telegram.org")
-        logger.info("Проверка подключения успешна")
+        KeySync.subscribe(forget_removed_keys)
+        await MetricsServer.start(Config.METRICS_PORT + 1 + index if Config.METRICS_PORT else 0)
+        # Общий лимит отправки делится между процессами
+        MessageQueue.start(bot, rate=Config.SEND_GLOBAL_RATE / count)
+        await run_startup({
+            "соединения Outline": OutlineAPI.warmup(),
+            "зеркало ключей": OutlineAPI.refresh_keys(),
+            "очередь заявок": TicketStore.load()
+        })
+        TaskSupervisor.spawn("outline_keepalive", keep_outline_alive)
+        LeaderLease.start(make_owner(index), spawn_leader_jobs, stop_leader_jobs)
         
-        # Запуск бота
-        asyncio.run(main())
+        logger.info(f"Обработчик {index} из {count} запущен")
+        await serve_updates(dp, bot, updates)
+    
+    except Exception as e:
+        logger.error(f"Критическая ошибка обработчика {index}: {str(e)}")
+    
+    finally:
+        await LeaderLease.stop()
+        await MessageQueue.stop()
+        await dp.storage.close()
+        await TaskSupervisor.stop()
+        await MetricsServer.stop()
+        await OutlineAPI.close()
+        await Storage.close()
+        await bot.session.close()
+
+if __name__ == '__main__':
+    # Настройка логирования: запись в файл и консоль в отдельном потоке
+    LogPipeline.start()
     
-    except socket.gaierror:
-        logger.error("Нет подключения к интернету!")
+    try:
+        # Запуск бота (проверка подключения выполняется при запуске, не блокируя цикл событий)
+        asyncio.run(main())
     
     except KeyboardInterrupt:
         logger.info("Бот остановлен пользователем")
     
     except Exception as e:
-        logger.error(f"Фатальная ошибка: {str(e)}")
\ No newline at end of file
+        logger.error(f"Фатальная ошибка: {str(e)}")
+    
+    finally:
+        LogPipeline.stop()
\ No newline at end of file
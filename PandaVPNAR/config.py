@@ -2,7 +2,7 @@
 Файл конфигурации бота для управления VPN через Outline API.
 """
 import os
-from typing import Final
+from typing import Final, List, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,6 +13,24 @@ class Config:
     # API URL и токены
     OUTLINE_API_URL: Final[str] = os.getenv("OUTLINE_API_URL", "")
     OUTLINE_API_TOKEN: Final[str] = os.getenv("OUTLINE_API_TOKEN", "")
+    OUTLINE_CERT_SHA256: Final[str] = os.getenv("OUTLINE_CERT_SHA256", "")  # certSha256 из конфигурации Outline
+    OUTLINE_SERVERS: Final[str] = os.getenv("OUTLINE_SERVERS", "")  # имя|url|токен|certSha256 через запятую
+    OUTLINE_SERVER_TIMEOUT: Final[float] = float(os.getenv("OUTLINE_SERVER_TIMEOUT", 5))
+    
+    # Транспорт Outline API: таймауты (сек), повторы и circuit breaker
+    OUTLINE_CONNECT_TIMEOUT: Final[float] = float(os.getenv("OUTLINE_CONNECT_TIMEOUT", 3))
+    OUTLINE_READ_TIMEOUT: Final[float] = float(os.getenv("OUTLINE_READ_TIMEOUT", 10))
+    OUTLINE_RETRIES: Final[int] = int(os.getenv("OUTLINE_RETRIES", 2))
+    OUTLINE_RETRY_BACKOFF: Final[float] = float(os.getenv("OUTLINE_RETRY_BACKOFF", 0.3))
+    OUTLINE_BREAKER_THRESHOLD: Final[int] = int(os.getenv("OUTLINE_BREAKER_THRESHOLD", 5))
+    OUTLINE_BREAKER_RESET: Final[float] = float(os.getenv("OUTLINE_BREAKER_RESET", 30))
+    
+    # Пул соединений Outline API
+    OUTLINE_POOL_LIMIT: Final[int] = int(os.getenv("OUTLINE_POOL_LIMIT", 100))
+    OUTLINE_POOL_LIMIT_PER_HOST: Final[int] = int(os.getenv("OUTLINE_POOL_LIMIT_PER_HOST", 20))
+    OUTLINE_KEEPALIVE_TIMEOUT: Final[float] = float(os.getenv("OUTLINE_KEEPALIVE_TIMEOUT", 75))
+    OUTLINE_DNS_CACHE_TTL: Final[int] = int(os.getenv("OUTLINE_DNS_CACHE_TTL", 300))
+    OUTLINE_KEEPALIVE_INTERVAL: Final[float] = float(os.getenv("OUTLINE_KEEPALIVE_INTERVAL", 60))
     TELEGRAM_TOKEN: Final[str] = os.getenv("TELEGRAM_TOKEN", "")
     
     # ID администратора
@@ -20,16 +38,142 @@ class Config:
     
     # Ограничения
     REQUEST_LIMIT: Final[int] = int(os.getenv("REQUEST_LIMIT", 3))
+    REQUEST_WINDOW: Final[int] = int(os.getenv("REQUEST_WINDOW", 86400))  # Окно лимита, сек
+    
+    # Режим получения обновлений: polling или webhook
+    BOT_MODE: Final[str] = os.getenv("BOT_MODE", "polling")
+    WEBHOOK_URL: Final[str] = os.getenv("WEBHOOK_URL", "")  # Публичный адрес, например https://bot.example.com
+    WEBHOOK_PATH: Final[str] = os.getenv("WEBHOOK_PATH", "/webhook")
+    WEBHOOK_SECRET: Final[str] = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_HOST: Final[str] = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT: Final[int] = int(os.getenv("WEBHOOK_PORT", 8080))
+    WEBHOOK_WORKERS: Final[int] = int(os.getenv("WEBHOOK_WORKERS", 16))
+    WEBHOOK_QUEUE_SIZE: Final[int] = int(os.getenv("WEBHOOK_QUEUE_SIZE", 1000))
+    WEBHOOK_MAX_CONNECTIONS: Final[int] = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", 40))
+    WEBHOOK_DRAIN_TIMEOUT: Final[float] = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", 10))
+    
+    # Запуск и остановка: таймаут одного этапа инициализации и ожидания обработчиков, сек
+    STARTUP_TIMEOUT: Final[float] = float(os.getenv("STARTUP_TIMEOUT", 5))
+    SHUTDOWN_TIMEOUT: Final[float] = float(os.getenv("SHUTDOWN_TIMEOUT", 20))
+    
+    # Перезапуск упавших фоновых задач: начальная и максимальная задержка, сек
+    TASK_RESTART_DELAY: Final[float] = float(os.getenv("TASK_RESTART_DELAY", 1))
+    TASK_RESTART_MAX_DELAY: Final[float] = float(os.getenv("TASK_RESTART_MAX_DELAY", 60))
+    
+    # Массовое создание ключей
+    BULK_CONCURRENCY: Final[int] = int(os.getenv("BULK_CONCURRENCY", 10))
+    BULK_RETRIES: Final[int] = int(os.getenv("BULK_RETRIES", 2))
+    BULK_MAX_KEYS: Final[int] = int(os.getenv("BULK_MAX_KEYS", 1000))
+    BULK_MAX_FILE_SIZE: Final[int] = int(os.getenv("BULK_MAX_FILE_SIZE", 1024 * 1024))
+    BULK_PROGRESS_INTERVAL: Final[float] = float(os.getenv("BULK_PROGRESS_INTERVAL", 2))
+    
+    # Очередь исходящих сообщений: общий лимит (сообщений/сек) и интервал для одного чата (сек)
+    SEND_GLOBAL_RATE: Final[float] = float(os.getenv("SEND_GLOBAL_RATE", 25))
+    SEND_CHAT_INTERVAL: Final[float] = float(os.getenv("SEND_CHAT_INTERVAL", 1))
+    SEND_MAX_ATTEMPTS: Final[int] = int(os.getenv("SEND_MAX_ATTEMPTS", 5))
+    SEND_QUEUE_LIMIT: Final[int] = int(os.getenv("SEND_QUEUE_LIMIT", 10000))
+    
+    # Многопроцессный режим: число процессов-обработчиков (1 — один процесс),
+    # срок аренды лидера (сек) и размер очереди обновлений одного обработчика
+    BOT_WORKERS: Final[int] = int(os.getenv("BOT_WORKERS", 1))
+    LEADER_LEASE_TTL: Final[float] = float(os.getenv("LEADER_LEASE_TTL", 15))
+    WORKER_QUEUE_SIZE: Final[int] = int(os.getenv("WORKER_QUEUE_SIZE", 1000))
+    
+    # Хранилище состояния: memory://, sqlite:///bot.db или redis://host:6379/0
+    STORAGE_URL: Final[str] = os.getenv("STORAGE_URL", "memory://")
+    
+    # Состояния FSM: время жизни незавершенного диалога, размер кэша и период записи
+    FSM_TTL: Final[int] = int(os.getenv("FSM_TTL", 86400))
+    FSM_CACHE_SIZE: Final[int] = int(os.getenv("FSM_CACHE_SIZE", 1024))
+    FSM_FLUSH_INTERVAL: Final[float] = float(os.getenv("FSM_FLUSH_INTERVAL", 0.5))
+    
+    # Зеркало ключей (в секундах)
+    KEYS_CACHE_TTL: Final[int] = int(os.getenv("KEYS_CACHE_TTL", 60))
+    KEYS_REFRESH_INTERVAL: Final[int] = int(os.getenv("KEYS_REFRESH_INTERVAL", 30))
+    
+    # Лента изменений ключей: сколько хранить и показывать администратору
+    KEY_CHANGES_KEEP: Final[int] = int(os.getenv("KEY_CHANGES_KEEP", 100))
+    KEY_CHANGES_SHOWN: Final[int] = int(os.getenv("KEY_CHANGES_SHOWN", 15))
+    
+    # Резерв заранее созданных ключей: размер (0 — отключен), порог пополнения,
+    # префикс имени ключей резерва на сервере (за ним следует случайная метка) и период проверки (сек)
+    KEY_POOL_SIZE: Final[int] = int(os.getenv("KEY_POOL_SIZE", 0))
+    KEY_POOL_MIN: Final[int] = int(os.getenv("KEY_POOL_MIN", 5))
+    KEY_POOL_PREFIX: Final[str] = os.getenv("KEY_POOL_PREFIX", "pool-")
+    KEY_POOL_INTERVAL: Final[float] = float(os.getenv("KEY_POOL_INTERVAL", 5))
+    
+    # Постраничный вывод списка ключей
+    KEYS_PAGE_SIZE: Final[int] = int(os.getenv("KEYS_PAGE_SIZE", 10))
+    
+    # Inline-поиск ключей: результатов в одном ответе (не больше 50) и время кэширования ответа в Telegram (в секундах)
+    INLINE_RESULTS: Final[int] = int(os.getenv("INLINE_RESULTS", 20))
+    INLINE_CACHE_TIME: Final[int] = int(os.getenv("INLINE_CACHE_TIME", 5))
+    
+    # Статистика трафика: период опроса metrics/transfer (в секундах) и размер топа
+    TRAFFIC_INTERVAL: Final[int] = int(os.getenv("TRAFFIC_INTERVAL", 60))
+    TRAFFIC_TOP: Final[int] = int(os.getenv("TRAFFIC_TOP", 10))
+    
+    # Лимиты трафика: доля лимита для предупреждения и одновременных запросов к серверам
+    QUOTA_WARN_RATIO: Final[float] = float(os.getenv("QUOTA_WARN_RATIO", 0.8))
+    QUOTA_CONCURRENCY: Final[int] = int(os.getenv("QUOTA_CONCURRENCY", 10))
+    
+    # Срок действия ключей: наибольший срок (дней), уведомление заранее (в секундах), удаление и повторы,
+    # период подхвата сроков, назначенных через другие процессы (сек, многопроцессный режим)
+    EXPIRY_MAX_DAYS: Final[int] = int(os.getenv("EXPIRY_MAX_DAYS", 3650))
+    EXPIRY_NOTICE_BEFORE: Final[int] = int(os.getenv("EXPIRY_NOTICE_BEFORE", 86400))
+    EXPIRY_CONCURRENCY: Final[int] = int(os.getenv("EXPIRY_CONCURRENCY", 5))
+    EXPIRY_RETRY_DELAY: Final[int] = int(os.getenv("EXPIRY_RETRY_DELAY", 60))
+    EXPIRY_MAX_ATTEMPTS: Final[int] = int(os.getenv("EXPIRY_MAX_ATTEMPTS", 5))
+    EXPIRY_SYNC_INTERVAL: Final[float] = float(os.getenv("EXPIRY_SYNC_INTERVAL", 30))
+    
+    # Эндпоинт метрик Prometheus (0 — отключен)
+    METRICS_HOST: Final[str] = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT: Final[int] = int(os.getenv("METRICS_PORT", 9101))
+    
+    # Заявки пользователей: размер страницы, параллельность пакетного одобрения,
+    # срок действия выданных ключей в днях (0 — бессрочно) и хранение закрытых заявок (сек)
+    TICKETS_PAGE_SIZE: Final[int] = int(os.getenv("TICKETS_PAGE_SIZE", 5))
+    TICKETS_CONCURRENCY: Final[int] = int(os.getenv("TICKETS_CONCURRENCY", 10))
+    TICKETS_KEY_DAYS: Final[int] = int(os.getenv("TICKETS_KEY_DAYS", 0))
+    TICKETS_TTL: Final[int] = int(os.getenv("TICKETS_TTL", 30 * 86400))
+    
+    # Логирование: файл (пусто — только консоль), уровень, формат text или json и ротация
+    LOG_FILE: Final[str] = os.getenv("LOG_FILE", "vpn_bot.log")
+    LOG_LEVEL: Final[str] = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT: Final[str] = os.getenv("LOG_FORMAT", "text")
+    LOG_MAX_BYTES: Final[int] = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))  # Ротация по размеру (0 — без ротации)
+    LOG_ROTATE_WHEN: Final[str] = os.getenv("LOG_ROTATE_WHEN", "")  # Ротация по времени, например midnight
+    LOG_BACKUP_COUNT: Final[int] = int(os.getenv("LOG_BACKUP_COUNT", 5))
+    
+    @classmethod
+    def outline_servers(cls) -> List[Tuple[str, str, str, str]]:
+        """Возвращает список серверов Outline в виде (имя, url, токен, certSha256)."""
+        if not cls.OUTLINE_SERVERS:
+            return [("main", cls.OUTLINE_API_URL, cls.OUTLINE_API_TOKEN, cls.OUTLINE_CERT_SHA256)]
+        
+        servers = []
+        for item in cls.OUTLINE_SERVERS.split(","):
+            if not item.strip():
+                continue
+            name, url, *rest = [part.strip() for part in item.split("|")]
+            token = rest[0] if len(rest) > 0 and rest[0] else cls.OUTLINE_API_TOKEN
+            cert = rest[1] if len(rest) > 1 else ""
+            servers.append((name, url, token, cert))
+        return servers
     
     # Проверка на валидность конфигурации
     @classmethod
     def validate(cls) -> bool:
         """Проверяет, что все необходимые переменные окружения заданы."""
         return all([
-            cls.OUTLINE_API_URL, 
-            cls.OUTLINE_API_TOKEN, 
+            cls.OUTLINE_SERVERS or (cls.OUTLINE_API_URL and cls.OUTLINE_API_TOKEN), 
             cls.TELEGRAM_TOKEN, 
-            cls.ADMIN_ID
+            cls.ADMIN_ID,
+            cls.BOT_MODE != "webhook" or cls.WEBHOOK_URL,
+            # Секрет общий для всех экземпляров, случайный у каждого ломал бы прием
+            cls.BOT_MODE != "webhook" or cls.WEBHOOK_SECRET,
+            # Процессы-обработчики делят состояние только через внешнее хранилище
+            cls.BOT_WORKERS <= 1 or cls.STORAGE_URL.startswith(("sqlite:///", "redis://", "rediss://", "unix://"))
         ])
 
 # Сообщения для пользователей
@@ -41,28 +185,99 @@ class Messages:
     ENTER_PORT: Final[str] = "Введите номер порта:"
     ONLY_DIGITS: Final[str] = "❌ Только числа!"
     ENTER_KEY_NAME: Final[str] = "Введите имя ключа:"
-    KEY_CREATED: Final[str] = "✅ Ключ создан!\n🔐 Имя: {name}\n🔢 Порт: {port}\n📎 Ссылка: <code>{url}</code>"
+    ENTER_EXPIRY: Final[str] = (
+        "⏳ Срок действия ключа: число дней (например <code>30</code>), "
+        "дата <code>ДД.ММ.ГГГГ</code> или <code>0</code> — бессрочно:"
+    )
+    EXPIRY_INVALID: Final[str] = "❌ Введите число дней от 1 до {max_days}, будущую дату ДД.ММ.ГГГГ в этих пределах или 0!"
+    KEY_CREATED: Final[str] = "✅ Ключ создан!\n🔐 Имя: {name}\n🔢 Порт: {port}\n🖥 Сервер: {server}\n⏳ Срок: {expires}\n📎 Ссылка: <code>{url}</code>"
     KEY_CREATION_ERROR: Final[str] = "❌ Ошибка создания!"
     NO_KEYS_FOUND: Final[str] = "❌ Ключи не найдены"
     KEY_LIST_TITLE: Final[str] = "📋 Список ключей:"
+    KEY_LIST_PAGE: Final[str] = "📋 Список ключей (стр. {page} из {pages}):"
     KEY_DETAILS: Final[str] = (
         "🔐 Детали ключа:\n\n"
         "🆔 ID: {id}\n"
         "📛 Имя: {name}\n"
         "🔢 Порт: {port}\n"
+        "🖥 Сервер: {server}\n"
+        "📊 Трафик: {traffic}\n"
+        "📏 Лимит: {quota}\n"
+        "⏳ Срок: {expires}\n"
         "📎 Ссылка: <code>{url}</code>"
     )
+    INLINE_KEY_DESCRIPTION: Final[str] = "{server} · порт {port} · ID {id}"
+    KEY_TRAFFIC: Final[str] = "час {hour} · сутки {day} · месяц {month}"
+    KEY_QUOTA: Final[str] = "{used} из {limit} за месяц"
+    KEY_QUOTA_BLOCKED: Final[str] = " ⛔ заблокирован"
+    NO_QUOTA: Final[str] = "нет"
+    NO_EXPIRY: Final[str] = "бессрочно"
     DELETE_CONFIRMATION: Final[str] = "⚠️ Вы уверены, что хотите удалить ключ?"
     KEY_DELETED: Final[str] = "✅ Ключ успешно удален!"
     DELETE_ERROR: Final[str] = "❌ Ошибка удаления!"
     REQUEST_LIMIT_EXCEEDED: Final[str] = "🚫 Превышен лимит запросов!"
     DESCRIBE_REQUEST: Final[str] = "✍️ Опишите ваш запрос:"
     NEW_REQUEST: Final[str] = (
-        "🆕 Новый запрос от @{username}\n"
+        "🆕 Новый запрос #{ticket_id} от @{username}\n"
         "👤 ID: {user_id}\n"
         "📝 Текст: {text}\n"
         "🕒 Время: {time}"
     )
     REQUEST_SENT: Final[str] = "✅ Ваш запрос отправлен администратору!"
     REQUEST_ERROR: Final[str] = "❌ Не удалось отправить запрос!"
-    GENERIC_ERROR: Final[str] = "❌ Произошла ошибка!"
\ No newline at end of file
+    GENERIC_ERROR: Final[str] = "❌ Произошла ошибка!"
+    BULK_PROMPT: Final[str] = (
+        "📦 Отправьте файл CSV/TXT со строками «имя[,порт]» "
+        "или сообщение вида «N префикс [порт]», например <code>200 team 443</code>.\n"
+        "Максимум ключей за раз: {limit}."
+    )
+    BULK_FILE_TOO_LARGE: Final[str] = "❌ Файл слишком большой!"
+    BULK_PARSE_ERROR: Final[str] = "❌ {error}. Попробуйте еще раз."
+    BULK_PROGRESS: Final[str] = "⏳ Создание ключей: {done} из {total}"
+    BULK_DONE: Final[str] = "✅ Создано ключей: {created} из {total}"
+    BULK_FAILED: Final[str] = "\n❌ Не удалось создать ({count}): {names}"
+    DIGEST_HEADER: Final[str] = "📬 Сводка: {count} сообщ.\n\n"
+    SERVERS_STATUS_TITLE: Final[str] = "🖥 Состояние серверов:\n"
+    SERVER_STATUS: Final[str] = (
+        "\n<b>{server}</b> {icon}\n"
+        "🔑 Ключей: {keys} · ⏱ {latency:.0f} мс\n"
+        "⚡ Breaker: {breaker} (срабатываний: {trips})\n"
+        "📨 Запросов: {requests} · 🔁 Повторов: {retries} · ❌ Ошибок: {failures} · ⌛ Таймаутов: {timeouts}"
+    )
+    TRAFFIC_TITLE: Final[str] = "📊 Топ ключей по трафику за {period}:\n"
+    TRAFFIC_ROW: Final[str] = "\n{place}. {name} ({server}) — {amount}"
+    TRAFFIC_EMPTY: Final[str] = "\nДанных пока нет, статистика собирается раз в {interval} с."
+    KEY_CHANGES_TITLE: Final[str] = "🕘 Последние изменения ключей:\n"
+    KEY_CHANGE_ROW: Final[str] = "\n<code>{time}</code> {text}{origin}"
+    KEY_CHANGE_ADDED: Final[str] = "➕ {name} ({server})"
+    KEY_CHANGE_REMOVED: Final[str] = "➖ {name} ({server})"
+    KEY_CHANGE_RENAMED: Final[str] = "✏️ {old} → {new} ({server})"
+    KEY_CHANGE_PORT: Final[str] = "🔢 {name} ({server}): порт {old} → {new}"
+    KEY_CHANGE_EXTERNAL: Final[str] = " · <i>вне бота</i>"
+    KEY_CHANGES_EMPTY: Final[str] = "\nИзменений пока не было, список сверяется раз в {interval} с."
+    QUOTA_PROMPT: Final[str] = "📏 Введите месячный лимит трафика в ГБ (0 — снять лимит):"
+    QUOTA_INVALID: Final[str] = "❌ Введите положительное число ГБ или 0, чтобы снять лимит!"
+    QUOTA_SET: Final[str] = "✅ Лимит ключа установлен: {limit}"
+    QUOTA_REMOVED: Final[str] = "✅ Лимит ключа снят"
+    QUOTA_WARNING: Final[str] = "⚠️ Ключ {name} ({server}) израсходовал {percent}% лимита: {used} из {limit}"
+    QUOTA_BLOCKED: Final[str] = "⛔ Ключ {name} ({server}) заблокирован: израсходовано {used} из {limit}"
+    QUOTA_UNBLOCKED: Final[str] = "✅ Ключ {name} ({server}) снова доступен: {used} из {limit}"
+    EXPIRY_NOTICE: Final[str] = "⏳ Ключ {name} ({server}) истекает {date}"
+    KEY_EXPIRED: Final[str] = "⌛ Ключ {name} ({server}) удален: истек срок действия"
+    EXPIRY_FAILED: Final[str] = "❌ Не удалось удалить истекший ключ {name} ({server})"
+    TICKETS_TITLE: Final[str] = "📥 Открытые заявки: {count} (стр. {page}/{pages})\n"
+    TICKET_ROW: Final[str] = "\n<b>#{id}</b> @{username} · {time}\n{text}\n"
+    TICKETS_EMPTY: Final[str] = "📭 Открытых заявок нет"
+    TICKET_APPROVED: Final[str] = "✅ Заявка #{id} одобрена, ключ отправлен"
+    TICKET_DENIED: Final[str] = "🚫 Заявка #{id} отклонена"
+    TICKET_CLOSED: Final[str] = "Заявка уже обработана"
+    TICKET_APPROVE_ERROR: Final[str] = "❌ Не удалось создать ключ для заявки #{id}"
+    TICKETS_APPROVING: Final[str] = "⏳ Одобряю заявки..."
+    TICKETS_BATCH_DONE: Final[str] = "✅ Одобрено заявок: {approved} из {total}"
+    TICKET_KEY_ISSUED: Final[str] = (
+        "🎉 Ваш запрос одобрен!\n\n"
+        "🔑 Ключ доступа:\n<code>{url}</code>\n\n"
+        "Скопируйте ссылку и добавьте ее в приложение Outline."
+    )
+    TICKET_KEY_EXPIRES: Final[str] = "\n⏳ Ключ действует до {date}"
+    TICKET_DENIED_USER: Final[str] = "😔 Ваш запрос на ключ отклонен администратором."
\ No newline at end of file
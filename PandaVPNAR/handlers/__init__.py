@@ -1,4 +1,4 @@
 """
 Пакет с обработчиками событий бота.
 """
-from . import admin, user
\ No newline at end of file
+from . import admin, bulk, user
\ No newline at end of file
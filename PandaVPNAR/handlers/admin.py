@@ -1,23 +1,40 @@
 """
 Обработчики сообщений и колбэков для администраторов.
 """
+import html
 import logging
 from datetime import datetime
 
 from aiogram import Router, F, types
 from aiogram.fsm.context import FSMContext
 from aiogram.filters import Command
+from aiogram.exceptions import TelegramBadRequest
 
 from config import Config, Messages
 from api.outline import OutlineAPI
+from api.cache import KeyCache
+from api.models import AccessKey
+from api.servers import KEY_ID_SEPARATOR, split_key_id
+from services.traffic import TrafficCollector
+from services.quota import QuotaManager, parse_quota
+from services.expiry import ExpiryScheduler, parse_expiry, format_deadline
+from services.key_pool import KeyPool
+from services.key_sync import KeySync, CHANGE_ADDED, CHANGE_REMOVED, CHANGE_RENAMED
+from services.search import KeySearch
 from states.forms import Form
 from keyboards.inline import (
     main_menu_keyboard, 
     keys_list_keyboard, 
     key_detail_keyboard,
-    delete_confirmation_keyboard
+    delete_confirmation_keyboard,
+    servers_status_keyboard,
+    traffic_keyboard,
+    key_changes_keyboard,
+    TRAFFIC_LABELS
 )
+from utils.callbacks import edit_callback_text
 from utils.decorators import admin_only, log_errors
+from utils.formatting import format_bytes
 
 # Создаем роутер для администраторских команд
 router = Router()
@@ -47,15 +64,34 @@ async def process_port(message: types.Message, state: FSMContext):
 @log_errors
 async def process_name(message: types.Message, state: FSMContext):
     """Обработчик ввода имени ключа."""
+    await state.update_data(name=message.text)
+    await message.answer(Messages.ENTER_EXPIRY)
+    await state.set_state(Form.CREATE_EXPIRY)
+
+@router.message(Form.CREATE_EXPIRY)
+@log_errors
+async def process_expiry(message: types.Message, state: FSMContext):
+    """Обработчик ввода срока действия ключа."""
+    try:
+        deadline = parse_expiry(message.text or "")
+        # Срок форматируется до создания ключа: ошибка не должна оставить ключ без срока
+        expires = format_deadline(deadline) if deadline else Messages.NO_EXPIRY
+    except (ValueError, OverflowError, OSError):
+        return await message.answer(Messages.EXPIRY_INVALID.format(max_days=Config.EXPIRY_MAX_DAYS))
+    
     data = await state.get_data()
-    result = await OutlineAPI.create_key(data['port'], message.text)
+    result = await KeyPool.issue(data['port'], data['name'])
     
     if result:
+        if deadline:
+            await ExpiryScheduler.schedule(result.id, deadline)
         await message.answer(
             Messages.KEY_CREATED.format(
-                name=message.text,
+                name=data['name'],
                 port=data['port'],
-                url=result['accessUrl']
+                server=result.server,
+                expires=expires,
+                url=result.access_url
             ),
             reply_markup=await main_menu_keyboard(message.from_user.id)
         )
@@ -67,56 +103,165 @@ async def process_name(message: types.Message, state: FSMContext):
     
     await state.clear()
 
+async def show_keys_page(callback: types.CallbackQuery, state: FSMContext, page: int, sort: str):
+    """Выводит страницу списка ключей и запоминает ее для кнопки «Назад»."""
+    result = await OutlineAPI.list_keys_page(page, sort)
+    
+    if not result or not result[0]:
+        return await callback.answer(Messages.NO_KEYS_FOUND, show_alert=True)
+    
+    keys, page, pages = result
+    await state.update_data(keys_page=page, keys_sort=sort)
+    await edit_callback_text(
+        callback,
+        Messages.KEY_LIST_PAGE.format(page=page + 1, pages=pages),
+        reply_markup=keys_list_keyboard(keys, page, pages, sort)
+    )
+    await callback.answer()
+
 @router.callback_query(F.data == "list_keys")
 @admin_only
 @log_errors
-async def list_keys_handler(callback: types.CallbackQuery):
+async def list_keys_handler(callback: types.CallbackQuery, state: FSMContext):
     """Обработчик запроса на получение списка ключей."""
-    keys = await OutlineAPI.get_all_keys()
-    
-    if not keys or 'accessKeys' not in keys or len(keys['accessKeys']) == 0:
-        return await callback.answer(Messages.NO_KEYS_FOUND, show_alert=True)
+    data = await state.get_data()
+    await show_keys_page(callback, state, data.get('keys_page', 0), data.get('keys_sort', "name"))
+
+@router.callback_query(F.data.startswith("keys_page_"))
+@admin_only
+@log_errors
+async def keys_page_handler(callback: types.CallbackQuery, state: FSMContext):
+    """Обработчик перехода по страницам списка ключей."""
+    _, _, sort, page = callback.data.split("_")
+    await show_keys_page(callback, state, int(page), sort)
+
+@router.callback_query(F.data == "noop")
+async def noop_handler(callback: types.CallbackQuery):
+    """Обработчик кнопок без действия (например, номера страницы)."""
+    await callback.answer()
+
+def key_details_text(key: AccessKey) -> str:
+    """Текст карточки ключа: параметры, трафик, лимит и срок действия."""
+    usage = TrafficCollector.store.usage(key.id)
+    limit = QuotaManager.get(key.id)
+    if limit is None:
+        quota = Messages.NO_QUOTA
+    else:
+        quota = Messages.KEY_QUOTA.format(used=format_bytes(usage['month']), limit=format_bytes(limit))
+        if QuotaManager.is_blocked(key.id):
+            quota += Messages.KEY_QUOTA_BLOCKED
     
-    await callback.message.edit_text(
-        Messages.KEY_LIST_TITLE,
-        reply_markup=keys_list_keyboard(keys['accessKeys'])
+    deadline = ExpiryScheduler.get(key.id)
+    return Messages.KEY_DETAILS.format(
+        id=key.id,
+        name=html.escape(key.name or 'Без имени'),
+        port=key.port,
+        server=key.server,
+        traffic=Messages.KEY_TRAFFIC.format(**{period: format_bytes(amount) for period, amount in usage.items()}),
+        quota=quota,
+        expires=format_deadline(deadline) if deadline else Messages.NO_EXPIRY,
+        url=key.access_url
     )
-    await callback.answer()
 
 @router.callback_query(F.data.startswith("key_detail_"))
 @admin_only
 @log_errors
 async def key_detail_handler(callback: types.CallbackQuery):
     """Обработчик запроса детальной информации о ключе."""
-    key_id = callback.data.split("_")[2]
-    keys = await OutlineAPI.get_all_keys()
-    
-    if not keys or 'accessKeys' not in keys:
-        return await callback.answer(Messages.NO_KEYS_FOUND, show_alert=True)
-    
-    key = next((k for k in keys['accessKeys'] if k['id'] == key_id), None)
+    key_id = callback.data.split("_", 2)[2]
+    key = await OutlineAPI.get_key(key_id)
     if not key:
         return await callback.answer(Messages.NO_KEYS_FOUND, show_alert=True)
     
-    await callback.message.edit_text(
-        Messages.KEY_DETAILS.format(
-            id=key['id'],
-            name=key.get('name', 'Без имени'),
-            port=key['port'],
-            url=key['accessUrl']
-        ),
-        reply_markup=key_detail_keyboard(key_id)
+    await edit_callback_text(
+        callback,
+        key_details_text(key),
+        reply_markup=key_detail_keyboard(key_id, back=not callback.inline_message_id)
     )
     await callback.answer()
 
+@router.inline_query()
+@admin_only
+@log_errors
+async def key_search_handler(inline_query: types.InlineQuery):
+    """
+    Обработчик inline-поиска ключей («@бот alice»): по началу имени, ID или порта.
+    
+    Ищет по зеркалу, не обращаясь к серверам, чтобы уложиться в срок
+    ответа на inline-запрос; зеркало поддерживает в актуальном
+    состоянии фоновая синхронизация.
+    """
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+    query = inline_query.query.strip()
+    if KEY_ID_SEPARATOR in query:
+        # Составной ID «сервер:ID» ищется точным совпадением
+        found = [query] if KeyCache.get(query) else []
+    elif query:
+        found = KeySearch.search(query, offset + Config.INLINE_RESULTS + 1)
+    else:
+        found = KeyCache.sorted_ids("name")[:offset + Config.INLINE_RESULTS + 1]
+    
+    results = []
+    for key_id in found[offset:offset + Config.INLINE_RESULTS]:
+        key = KeyCache.get(key_id)
+        if key is None:
+            continue
+        results.append(types.InlineQueryResultArticle(
+            id=key.id,
+            title=key.name or 'Без имени',
+            description=Messages.INLINE_KEY_DESCRIPTION.format(server=key.server, port=key.port, id=key.id),
+            input_message_content=types.InputTextMessageContent(message_text=key_details_text(key)),
+            reply_markup=key_detail_keyboard(key.id, back=False)
+        ))
+    
+    more = len(found) > offset + Config.INLINE_RESULTS
+    await inline_query.answer(
+        results,
+        cache_time=Config.INLINE_CACHE_TIME,
+        is_personal=True,
+        next_offset=str(offset + Config.INLINE_RESULTS) if more else ""
+    )
+
+@router.callback_query(F.data.startswith("quota_set_"))
+@admin_only
+@log_errors
+async def quota_set_handler(callback: types.CallbackQuery, state: FSMContext):
+    """Обработчик запроса на изменение лимита трафика ключа."""
+    await state.update_data(quota_key=callback.data.split("_", 2)[2])
+    # Запрос лимита уходит в личный чат: кнопка могла быть нажата в результате inline-поиска
+    await callback.bot.send_message(callback.from_user.id, Messages.QUOTA_PROMPT)
+    await state.set_state(Form.QUOTA_INPUT)
+    await callback.answer()
+
+@router.message(Form.QUOTA_INPUT)
+@admin_only
+@log_errors
+async def process_quota(message: types.Message, state: FSMContext):
+    """Обработчик ввода лимита трафика в гигабайтах."""
+    try:
+        limit = parse_quota(message.text or "")
+    except ValueError:
+        return await message.answer(Messages.QUOTA_INVALID)
+    
+    data = await state.get_data()
+    await state.clear()
+    await QuotaManager.set_limit(data['quota_key'], limit)
+    await QuotaManager.enforce()
+    
+    await message.answer(
+        Messages.QUOTA_SET.format(limit=format_bytes(limit)) if limit else Messages.QUOTA_REMOVED,
+        reply_markup=await main_menu_keyboard(message.from_user.id)
+    )
+
 @router.callback_query(F.data.startswith("delete_ask_"))
 @admin_only
 @log_errors
 async def delete_ask_handler(callback: types.CallbackQuery):
     """Обработчик запроса на подтверждение удаления ключа."""
-    key_id = callback.data.split("_")[2]
+    key_id = callback.data.split("_", 2)[2]
     
-    await callback.message.edit_text(
+    await edit_callback_text(
+        callback,
         Messages.DELETE_CONFIRMATION,
         reply_markup=delete_confirmation_keyboard(key_id)
     )
@@ -127,12 +272,94 @@ async def delete_ask_handler(callback: types.CallbackQuery):
 @log_errors
 async def delete_confirm_handler(callback: types.CallbackQuery):
     """Обработчик подтверждения удаления ключа."""
-    key_id = callback.data.split("_")[2]
+    key_id = callback.data.split("_", 2)[2]
     
     if await OutlineAPI.delete_key(key_id):
-        await callback.message.edit_text(
+        TrafficCollector.forget(key_id)
+        await QuotaManager.forget(key_id)
+        await ExpiryScheduler.cancel(key_id)
+        await edit_callback_text(
+            callback,
             Messages.KEY_DELETED,
-            reply_markup=await main_menu_keyboard(callback.from_user.id)
+            reply_markup=None if callback.inline_message_id else await main_menu_keyboard(callback.from_user.id)
         )
     else:
-        await callback.answer(Messages.DELETE_ERROR, show_alert=True)
\ No newline at end of file
+        await callback.answer(Messages.DELETE_ERROR, show_alert=True)
+
+@router.callback_query(F.data == "servers_status")
+@admin_only
+@log_errors
+async def servers_status_handler(callback: types.CallbackQuery):
+    """Обработчик запроса состояния серверов Outline."""
+    text = Messages.SERVERS_STATUS_TITLE + "".join(
+        Messages.SERVER_STATUS.format(
+            icon="🟢" if stats['healthy'] and stats['breaker'] == "closed" else "🔴",
+            latency=stats['latency'] * 1000,
+            **{k: v for k, v in stats.items() if k != 'latency'}
+        )
+        for stats in OutlineAPI.get_stats()
+    )
+    
+    await callback.message.edit_text(text, reply_markup=servers_status_keyboard())
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("traffic_"))
+@admin_only
+@log_errors
+async def traffic_handler(callback: types.CallbackQuery):
+    """Обработчик экрана топа ключей по трафику."""
+    period = callback.data.split("_", 1)[1]
+    if period not in TRAFFIC_LABELS:
+        return await callback.answer()
+    
+    top = TrafficCollector.store.top(period, Config.TRAFFIC_TOP)
+    text = Messages.TRAFFIC_TITLE.format(period=TRAFFIC_LABELS[period].lower())
+    for place, (key_id, amount) in enumerate(top, 1):
+        key = KeyCache.get(key_id)
+        text += Messages.TRAFFIC_ROW.format(
+            place=place,
+            name=html.escape(key.name or 'Без имени') if key else key_id,
+            server=split_key_id(key_id)[0],
+            amount=format_bytes(amount)
+        )
+    if not top:
+        text += Messages.TRAFFIC_EMPTY.format(interval=Config.TRAFFIC_INTERVAL)
+    
+    try:
+        await callback.message.edit_text(text, reply_markup=traffic_keyboard(period))
+    except TelegramBadRequest:
+        pass  # Данные не изменились с прошлого показа
+    await callback.answer()
+
+@router.callback_query(F.data == "key_changes")
+@admin_only
+@log_errors
+async def key_changes_handler(callback: types.CallbackQuery):
+    """Обработчик ленты последних изменений ключей на серверах."""
+    changes = KeySync.recent(Config.KEY_CHANGES_SHOWN)
+    text = Messages.KEY_CHANGES_TITLE
+    for change in changes:
+        name = html.escape(change.name or 'Без имени')
+        if change.kind == CHANGE_ADDED:
+            row = Messages.KEY_CHANGE_ADDED.format(name=name, server=change.server)
+        elif change.kind == CHANGE_REMOVED:
+            row = Messages.KEY_CHANGE_REMOVED.format(name=name, server=change.server)
+        elif change.kind == CHANGE_RENAMED:
+            row = Messages.KEY_CHANGE_RENAMED.format(
+                old=html.escape(change.old or 'Без имени'), new=name, server=change.server
+            )
+        else:
+            row = Messages.KEY_CHANGE_PORT.format(name=name, server=change.server, old=change.old, new=change.new)
+        text += Messages.KEY_CHANGE_ROW.format(
+            time=datetime.fromtimestamp(change.at).strftime('%d.%m %H:%M'),
+            text=row,
+            origin=Messages.KEY_CHANGE_EXTERNAL if change.external else ""
+        )
+    if not changes:
+        text += Messages.KEY_CHANGES_EMPTY.format(interval=Config.KEYS_REFRESH_INTERVAL)
+    
+    try:
+        await callback.message.edit_text(text, reply_markup=key_changes_keyboard())
+    except TelegramBadRequest:
+        pass  # Лента не изменилась с прошлого показа
+    await callback.answer()
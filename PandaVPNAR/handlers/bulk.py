@@ -0,0 +1,80 @@
+"""
+Обработчики массового создания ключей.
+"""
+import html
+import time
+import logging
+from datetime import datetime
+
+from aiogram import Router, F, Bot, types
+from aiogram.fsm.context import FSMContext
+
+from config import Config, Messages
+from states.forms import Form
+from keyboards.inline import main_menu_keyboard
+from services.bulk import BulkParseError, parse_bulk_request, provision_keys, keys_to_csv
+from utils.decorators import admin_only, log_errors
+
+# Создаем роутер для массового создания ключей
+router = Router()
+logger = logging.getLogger(__name__)
+
+@router.callback_query(F.data == "bulk_create")
+@admin_only
+@log_errors
+async def bulk_create_handler(callback: types.CallbackQuery, state: FSMContext):
+    """Обработчик запроса на массовое создание ключей."""
+    await callback.message.answer(Messages.BULK_PROMPT.format(limit=Config.BULK_MAX_KEYS))
+    await state.set_state(Form.BULK_INPUT)
+    await callback.answer()
+
+@router.message(Form.BULK_INPUT)
+@admin_only
+@log_errors
+async def process_bulk_input(message: types.Message, state: FSMContext, bot: Bot):
+    """Обработчик списка ключей (текстом или файлом CSV/TXT)."""
+    if message.document:
+        if message.document.file_size and message.document.file_size > Config.BULK_MAX_FILE_SIZE:
+            return await message.answer(Messages.BULK_FILE_TOO_LARGE)
+        content = await bot.download(message.document)
+        text = content.read().decode("utf-8-sig", errors="replace")
+    else:
+        text = message.text or ""
+    
+    try:
+        items = parse_bulk_request(text)
+    except BulkParseError as e:
+        return await message.answer(Messages.BULK_PARSE_ERROR.format(error=str(e)))
+    
+    await state.clear()
+    progress = await message.answer(Messages.BULK_PROGRESS.format(done=0, total=len(items)))
+    last_update = time.monotonic()
+    
+    async def on_progress(done: int, total: int) -> None:
+        nonlocal last_update
+        # Редактируем сообщение не чаще раза в BULK_PROGRESS_INTERVAL секунд
+        if done < total and time.monotonic() - last_update < Config.BULK_PROGRESS_INTERVAL:
+            return
+        last_update = time.monotonic()
+        try:
+            await progress.edit_text(Messages.BULK_PROGRESS.format(done=done, total=total))
+        except Exception as e:
+            logger.warning(f"Не удалось обновить прогресс массового создания: {str(e)}")
+    
+    created, failed = await provision_keys(items, on_progress)
+    
+    summary = Messages.BULK_DONE.format(created=len(created), total=len(items))
+    if failed:
+        names = html.escape(", ".join(name for name, _ in failed[:20]))
+        more = f" и еще {len(failed) - 20}" if len(failed) > 20 else ""
+        summary += Messages.BULK_FAILED.format(count=len(failed), names=names + more)
+    
+    if created:
+        filename = f"keys_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        await message.answer_document(
+            types.BufferedInputFile(keys_to_csv(created), filename=filename),
+            caption=summary[:1024],
+            reply_markup=await main_menu_keyboard(message.from_user.id)
+        )
+    else:
+        await message.answer(summary, reply_markup=await main_menu_keyboard(message.from_user.id))
@@ -0,0 +1,100 @@
+"""
+Обработчики очереди заявок пользователей.
+"""
+import html
+import logging
+from datetime import datetime
+
+from aiogram import Router, F, types
+from aiogram.fsm.context import FSMContext
+from aiogram.exceptions import TelegramBadRequest
+
+from config import Messages
+from keyboards.inline import tickets_keyboard
+from services.tickets import TicketStore
+from utils.decorators import admin_only, log_errors
+
+# Создаем роутер для заявок
+router = Router()
+logger = logging.getLogger(__name__)
+
+async def show_tickets_page(callback: types.CallbackQuery, state: FSMContext, page: int):
+    """Выводит страницу открытых заявок и запоминает показанные заявки."""
+    await TicketStore.sync()
+    tickets, page, pages = TicketStore.page(page)
+    await state.update_data(tickets_page=page, tickets_shown=[ticket.id for ticket in tickets])
+    
+    if tickets:
+        text = Messages.TICKETS_TITLE.format(count=TicketStore.count(), page=page + 1, pages=pages)
+        for ticket in tickets:
+            text += Messages.TICKET_ROW.format(
+                id=ticket.id,
+                username=html.escape(ticket.username or f"user{ticket.user_id}"),
+                time=datetime.fromtimestamp(ticket.created).strftime('%d.%m.%Y %H:%M'),
+                text=html.escape(ticket.text[:300])
+            )
+    else:
+        text = Messages.TICKETS_EMPTY
+    
+    try:
+        await callback.message.edit_text(text, reply_markup=tickets_keyboard([ticket.id for ticket in tickets], page, pages))
+    except TelegramBadRequest:
+        pass  # Список не изменился с прошлого показа
+
+@router.callback_query(F.data.startswith("tickets_page_"))
+@admin_only
+@log_errors
+async def tickets_page_handler(callback: types.CallbackQuery, state: FSMContext):
+    """Обработчик списка открытых заявок."""
+    await show_tickets_page(callback, state, int(callback.data.rsplit("_", 1)[1]))
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("ticket_ok_"))
+@admin_only
+@log_errors
+async def ticket_approve_handler(callback: types.CallbackQuery, state: FSMContext):
+    """Обработчик одобрения одной заявки."""
+    ticket_id = int(callback.data.rsplit("_", 1)[1])
+    result = await TicketStore.approve(ticket_id)
+    
+    if result is None:
+        await callback.answer(Messages.TICKET_CLOSED)
+    elif result:
+        await callback.answer(Messages.TICKET_APPROVED.format(id=ticket_id))
+    else:
+        return await callback.answer(Messages.TICKET_APPROVE_ERROR.format(id=ticket_id), show_alert=True)
+    
+    data = await state.get_data()
+    await show_tickets_page(callback, state, data.get('tickets_page', 0))
+
+@router.callback_query(F.data.startswith("ticket_no_"))
+@admin_only
+@log_errors
+async def ticket_deny_handler(callback: types.CallbackQuery, state: FSMContext):
+    """Обработчик отклонения заявки."""
+    ticket_id = int(callback.data.rsplit("_", 1)[1])
+    if await TicketStore.deny(ticket_id):
+        await callback.answer(Messages.TICKET_DENIED.format(id=ticket_id))
+    else:
+        await callback.answer(Messages.TICKET_CLOSED)
+    
+    data = await state.get_data()
+    await show_tickets_page(callback, state, data.get('tickets_page', 0))
+
+@router.callback_query(F.data.startswith("tickets_ok_"))
+@admin_only
+@log_errors
+async def tickets_approve_many_handler(callback: types.CallbackQuery, state: FSMContext):
+    """Обработчик пакетного одобрения: показанной страницы или всех открытых заявок."""
+    data = await state.get_data()
+    if callback.data == "tickets_ok_all":
+        await TicketStore.sync()
+        ticket_ids = TicketStore.open_ids()
+    else:
+        # Одобряем именно те заявки, которые администратор видел на странице
+        ticket_ids = data.get('tickets_shown', [])
+    
+    await callback.answer(Messages.TICKETS_APPROVING)
+    approved, total = await TicketStore.approve_many(ticket_ids)
+    await callback.message.answer(Messages.TICKETS_BATCH_DONE.format(approved=approved, total=total))
+    await show_tickets_page(callback, state, data.get('tickets_page', 0))
@@ -1,6 +1,7 @@
 """
 Обработчики сообщений и колбэков для обычных пользователей.
 """
+import html
 import logging
 from datetime import datetime
 
@@ -9,10 +10,12 @@ from aiogram.fsm.context import FSMContext
 from aiogram.filters import Command
 
 from config import Config, Messages
-from api.outline import OutlineAPI
 from states.forms import Form
-from keyboards.inline import main_menu_keyboard
+from keyboards.inline import main_menu_keyboard, ticket_notice_keyboard
+from services.tickets import TicketStore
 from utils.decorators import log_errors
+from utils.rate_limit import RequestLimiter
+from utils.sender import MessageQueue
 
 # Создаем роутер для пользовательских команд
 router = Router()
@@ -77,7 +80,7 @@ async def main_menu_handler(callback: types.CallbackQuery):
 @log_errors
 async def request_key_handler(callback: types.CallbackQuery, state: FSMContext):
     """Обработчик запроса на получение ключа."""
-    if not await OutlineAPI.check_limit(callback.from_user.id):
+    if not await RequestLimiter.check(callback.from_user.id):
         await callback.answer(Messages.REQUEST_LIMIT_EXCEEDED, show_alert=True)
         return
 
@@ -87,21 +90,27 @@ async def request_key_handler(callback: types.CallbackQuery, state: FSMContext):
 
 @router.message(Form.TICKET_REQUEST)
 @log_errors
-async def process_ticket_request(message: types.Message, state: FSMContext, bot):
+async def process_ticket_request(message: types.Message, state: FSMContext):
     """Обработчик текста запроса на ключ."""
     try:
-        # Формируем текст заявки
+        # Регистрируем заявку в очереди
+        ticket = await TicketStore.create(message.from_user.id, message.from_user.username or "", message.text or "")
+        
+        # Формируем текст уведомления
         request_text = Messages.NEW_REQUEST.format(
-            username=message.from_user.username or f"user{message.from_user.id}",
+            ticket_id=ticket.id,
+            username=html.escape(message.from_user.username or f"user{message.from_user.id}"),
             user_id=message.from_user.id,
-            text=message.text,
+            text=html.escape(ticket.text),
             time=datetime.now().strftime('%d.%m.%Y %H:%M')
         )
         
-        # Отправляем админу
-        await bot.send_message(Config.ADMIN_ID, request_text)
+        # Ставим уведомление админу в очередь (при всплеске заявки объединяются в сводку);
+        # заявка уже сохранена, поэтому переполнение очереди ее не теряет
+        if not MessageQueue.send(Config.ADMIN_ID, request_text, digest="tickets", reply_markup=ticket_notice_keyboard()):
+            logger.warning(f"Уведомление о заявке #{ticket.id} не поставлено в очередь")
         
-        # Сообщаем пользователю
+        # Сообщаем пользователю, не дожидаясь отправки уведомления
         await message.answer(
             Messages.REQUEST_SENT,
             reply_markup=await main_menu_keyboard(message.from_user.id)
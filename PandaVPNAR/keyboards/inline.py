@@ -7,6 +7,7 @@ from aiogram import types
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from config import Config
+from api.models import AccessKey
 
 async def is_admin(user_id: int) -> bool:
     """
@@ -37,6 +38,18 @@ async def main_menu_keyboard(user_id: int) -> types.InlineKeyboardMarkup:
             types.InlineKeyboardButton(text="🆕 Создать ключ", callback_data="create_key"),
             types.InlineKeyboardButton(text="📋 Список ключей", callback_data="list_keys")
         )
+        builder.row(
+            types.InlineKeyboardButton(text="📦 Массовое создание", callback_data="bulk_create"),
+            types.InlineKeyboardButton(text="🖥 Серверы", callback_data="servers_status")
+        )
+        builder.row(
+            types.InlineKeyboardButton(text="📊 Трафик", callback_data="traffic_day"),
+            types.InlineKeyboardButton(text="📥 Заявки", callback_data="tickets_page_0")
+        )
+        builder.row(
+            types.InlineKeyboardButton(text="🕘 Изменения", callback_data="key_changes"),
+            types.InlineKeyboardButton(text="🔎 Поиск", switch_inline_query_current_chat="")
+        )
     else:
         builder.add(types.InlineKeyboardButton(
             text="📨 Запросить ключ", 
@@ -45,12 +58,45 @@ async def main_menu_keyboard(user_id: int) -> types.InlineKeyboardMarkup:
     
     return builder.as_markup()
 
-def keys_list_keyboard(keys: List[dict]) -> types.InlineKeyboardMarkup:
+# Подписи кнопок сортировки списка ключей
+SORT_LABELS = {"name": "🔤 Имя", "id": "🆔 ID", "new": "🆕 Новые"}
+
+def pagination_row(prefix: str, page: int, pages: int) -> List[types.InlineKeyboardButton]:
+    """
+    Создает ряд кнопок навигации по страницам.
+    
+    Args:
+        prefix (str): Префикс callback_data, к которому добавляется номер страницы
+        page (int): Текущая страница (с нуля)
+        pages (int): Общее число страниц
+        
+    Returns:
+        List[types.InlineKeyboardButton]: Кнопки навигации
+    """
+    jump = max(1, pages // 10)
+    buttons = []
+    if page > 0:
+        buttons.append(types.InlineKeyboardButton(text="⏮", callback_data=f"{prefix}0"))
+        if page - jump > 0:
+            buttons.append(types.InlineKeyboardButton(text=f"⏪ -{jump}", callback_data=f"{prefix}{page - jump}"))
+        buttons.append(types.InlineKeyboardButton(text="◀️", callback_data=f"{prefix}{page - 1}"))
+    buttons.append(types.InlineKeyboardButton(text=f"{page + 1}/{pages}", callback_data="noop"))
+    if page < pages - 1:
+        buttons.append(types.InlineKeyboardButton(text="▶️", callback_data=f"{prefix}{page + 1}"))
+        if page + jump < pages - 1:
+            buttons.append(types.InlineKeyboardButton(text=f"+{jump} ⏩", callback_data=f"{prefix}{page + jump}"))
+        buttons.append(types.InlineKeyboardButton(text="⏭", callback_data=f"{prefix}{pages - 1}"))
+    return buttons
+
+def keys_list_keyboard(keys: List[AccessKey], page: int = 0, pages: int = 1, sort: str = "name") -> types.InlineKeyboardMarkup:
     """
-    Создает клавиатуру со списком ключей.
+    Создает клавиатуру с одной страницей списка ключей.
     
     Args:
-        keys (List[dict]): Список словарей с информацией о ключах
+        keys (List[AccessKey]): Ключи текущей страницы
+        page (int): Номер текущей страницы (с нуля)
+        pages (int): Общее число страниц
+        sort (str): Текущий порядок сортировки
         
     Returns:
         types.InlineKeyboardMarkup: Клавиатура со списком ключей
@@ -59,31 +105,48 @@ def keys_list_keyboard(keys: List[dict]) -> types.InlineKeyboardMarkup:
     
     for key in keys:
         builder.row(types.InlineKeyboardButton(
-            text=f"🔑 {key.get('name', 'Без имени')}",
-            callback_data=f"key_detail_{key['id']}"
+            text=f"🔑 {key.name or 'Без имени'}",
+            callback_data=f"key_detail_{key.id}"
         ))
     
+    if pages > 1:
+        builder.row(*pagination_row(f"keys_page_{sort}_", page, pages))
+    
+    builder.row(*[
+        types.InlineKeyboardButton(
+            text=f"• {label}" if order == sort else label,
+            callback_data=f"keys_page_{order}_0"
+        )
+        for order, label in SORT_LABELS.items()
+    ])
     builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="main_menu"))
     return builder.as_markup()
 
-def key_detail_keyboard(key_id: str) -> types.InlineKeyboardMarkup:
+def key_detail_keyboard(key_id: str, back: bool = True) -> types.InlineKeyboardMarkup:
     """
     Создает клавиатуру для детальной информации о ключе.
     
     Args:
         key_id (str): ID ключа
+        back (bool): Кнопка возврата к списку (не нужна в результате inline-поиска)
         
     Returns:
         types.InlineKeyboardMarkup: Клавиатура действий для ключа
     """
     builder = InlineKeyboardBuilder()
     
+    builder.row(types.InlineKeyboardButton(
+        text="📏 Лимит трафика",
+        callback_data=f"quota_set_{key_id}"
+    ))
+    
     builder.row(types.InlineKeyboardButton(
         text="🗑 Удалить ключ",
         callback_data=f"delete_ask_{key_id}"
     ))
     
-    builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="list_keys"))
+    if back:
+        builder.row(types.InlineKeyboardButton(text="🔙 Назад", callback_data="list_keys"))
     return builder.as_markup()
 
 def delete_confirmation_keyboard(key_id: str) -> types.InlineKeyboardMarkup:
@@ -101,4 +164,108 @@ def delete_confirmation_keyboard(key_id: str) -> types.InlineKeyboardMarkup:
         types.InlineKeyboardButton(text="✅ Да", callback_data=f"delete_confirm_{key_id}"),
         types.InlineKeyboardButton(text="❌ Нет", callback_data=f"key_detail_{key_id}")
     )
-    return builder.as_markup()
\ No newline at end of file
+    return builder.as_markup()
+
+def servers_status_keyboard() -> types.InlineKeyboardMarkup:
+    """
+    Создает клавиатуру экрана состояния серверов.
+    
+    Returns:
+        types.InlineKeyboardMarkup: Клавиатура с кнопками обновления и возврата
+    """
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        types.InlineKeyboardButton(text="🔄 Обновить", callback_data="servers_status"),
+        types.InlineKeyboardButton(text="🔙 Назад", callback_data="main_menu")
+    )
+    return builder.as_markup()
+
+def key_changes_keyboard() -> types.InlineKeyboardMarkup:
+    """
+    Создает клавиатуру ленты изменений ключей.
+    
+    Returns:
+        types.InlineKeyboardMarkup: Клавиатура с кнопками обновления и возврата
+    """
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        types.InlineKeyboardButton(text="🔄 Обновить", callback_data="key_changes"),
+        types.InlineKeyboardButton(text="🔙 Назад", callback_data="main_menu")
+    )
+    return builder.as_markup()
+
+# Подписи кнопок окон статистики трафика
+TRAFFIC_LABELS = {"hour": "Час", "day": "Сутки", "month": "Месяц"}
+
+def traffic_keyboard(period: str) -> types.InlineKeyboardMarkup:
+    """
+    Создает клавиатуру экрана статистики трафика.
+    
+    Args:
+        period (str): Текущее окно статистики: hour, day или month
+        
+    Returns:
+        types.InlineKeyboardMarkup: Клавиатура выбора окна и возврата
+    """
+    builder = InlineKeyboardBuilder()
+    builder.row(*[
+        types.InlineKeyboardButton(
+            text=f"• {label}" if name == period else label,
+            callback_data=f"traffic_{name}"
+        )
+        for name, label in TRAFFIC_LABELS.items()
+    ])
+    builder.row(
+        types.InlineKeyboardButton(text="🔄 Обновить", callback_data=f"traffic_{period}"),
+        types.InlineKeyboardButton(text="🔙 Назад", callback_data="main_menu")
+    )
+    return builder.as_markup()
+
+def tickets_keyboard(ticket_ids: List[int], page: int = 0, pages: int = 1) -> types.InlineKeyboardMarkup:
+    """
+    Создает клавиатуру страницы открытых заявок.
+    
+    Args:
+        ticket_ids (List[int]): Номера заявок текущей страницы
+        page (int): Номер текущей страницы (с нуля)
+        pages (int): Общее число страниц
+        
+    Returns:
+        types.InlineKeyboardMarkup: Кнопки одобрения и отклонения заявок
+    """
+    builder = InlineKeyboardBuilder()
+    
+    for ticket_id in ticket_ids:
+        builder.row(
+            types.InlineKeyboardButton(text=f"✅ #{ticket_id}", callback_data=f"ticket_ok_{ticket_id}"),
+            types.InlineKeyboardButton(text=f"❌ #{ticket_id}", callback_data=f"ticket_no_{ticket_id}")
+        )
+    
+    if ticket_ids:
+        builder.row(
+            types.InlineKeyboardButton(text="✅ Все на странице", callback_data=f"tickets_ok_page_{page}"),
+            types.InlineKeyboardButton(text="✅ Все заявки", callback_data="tickets_ok_all")
+        )
+    
+    if pages > 1:
+        builder.row(*pagination_row("tickets_page_", page, pages))
+    
+    builder.row(
+        types.InlineKeyboardButton(text="🔄 Обновить", callback_data=f"tickets_page_{page}"),
+        types.InlineKeyboardButton(text="🔙 Назад", callback_data="main_menu")
+    )
+    return builder.as_markup()
+
+def ticket_notice_keyboard() -> types.InlineKeyboardMarkup:
+    """
+    Создает клавиатуру уведомления о новой заявке.
+    
+    Уведомления объединяются в сводку, поэтому кнопка ведет в общий
+    список заявок, а не к конкретной заявке.
+    
+    Returns:
+        types.InlineKeyboardMarkup: Кнопка перехода к заявкам
+    """
+    builder = InlineKeyboardBuilder()
+    builder.row(types.InlineKeyboardButton(text="📥 Открыть заявки", callback_data="tickets_page_0"))
+    return builder.as_markup()
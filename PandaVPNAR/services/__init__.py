@@ -0,0 +1,3 @@
+"""
+Пакет с фоновыми сервисами и бизнес-логикой бота.
+"""
\ No newline at end of file
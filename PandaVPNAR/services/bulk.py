@@ -0,0 +1,134 @@
+"""
+Массовое создание ключей.
+"""
+import csv
+import io
+import re
+import random
+import asyncio
+import logging
+from typing import List, Optional, Tuple, Callable, Awaitable
+
+from config import Config
+from api.models import AccessKey
+from api.outline import OutlineAPI
+
+logger = logging.getLogger(__name__)
+
+# Задание на один ключ: (имя, порт или None для порта сервера по умолчанию)
+BulkItem = Tuple[str, Optional[int]]
+
+# Запрос вида «N префикс [порт]», например «200 team 443»
+GENERATE_PATTERN = re.compile(r"^\s*(\d+)\s+(\S+)(?:\s+(\d+))?\s*$")
+
+class BulkParseError(ValueError):
+    """Некорректный список ключей для массового создания."""
+
+def parse_bulk_request(text: str) -> List[BulkItem]:
+    """
+    Разбор запроса на массовое создание.
+    
+    Поддерживаются два формата:
+    «N префикс [порт]» — N ключей с именами префикс-001 … префикс-N;
+    список строк «имя[,порт]» (CSV/TXT, разделитель , ; или табуляция).
+    
+    Args:
+        text (str): Текст сообщения или содержимое файла
+    
+    Returns:
+        List[BulkItem]: Задания на создание ключей
+    
+    Raises:
+        BulkParseError: Запрос пустой, некорректный или слишком большой
+    """
+    match = GENERATE_PATTERN.match(text)
+    if match:
+        count, prefix, port = int(match.group(1)), match.group(2), match.group(3)
+        width = max(3, len(str(count)))
+        items = [(f"{prefix}-{index:0{width}d}", int(port) if port else None) for index in range(1, count + 1)]
+    else:
+        items = []
+        try:
+            dialect = csv.Sniffer().sniff(text[:2048], delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel  # Одна колонка с именами
+        for row in csv.reader(io.StringIO(text), dialect):
+            row = [cell.strip() for cell in row]
+            if not row or not row[0]:
+                continue
+            if row[0].lower() in ("name", "имя"):
+                continue  # Заголовок
+            port = row[1] if len(row) > 1 and row[1] else None
+            if port is not None and not port.isdigit():
+                raise BulkParseError(f"Некорректный порт «{port}» для ключа «{row[0]}»")
+            items.append((row[0], int(port) if port else None))
+    
+    if not items:
+        raise BulkParseError("Список ключей пуст")
+    if len(items) > Config.BULK_MAX_KEYS:
+        raise BulkParseError(f"Слишком много ключей: {len(items)} (максимум {Config.BULK_MAX_KEYS})")
+    return items
+
+async def provision_keys(
+    items: List[BulkItem],
+    on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None
+) -> Tuple[List[AccessKey], List[BulkItem]]:
+    """
+    Параллельное создание ключей с ограничением числа одновременных запросов.
+    
+    Неудачные попытки повторяются до BULK_RETRIES раз с паузой.
+    
+    Args:
+        items (List[BulkItem]): Задания на создание ключей
+        on_progress: Вызывается после каждого завершенного задания (готово, всего)
+    
+    Returns:
+        Tuple[List[AccessKey], List[BulkItem]]: Созданные ключи и задания, которые не удалось выполнить
+    """
+    semaphore = asyncio.Semaphore(Config.BULK_CONCURRENCY)
+    created: List[AccessKey] = []
+    failed: List[BulkItem] = []
+    done = 0
+    
+    async def create(item: BulkItem) -> None:
+        nonlocal done
+        name, port = item
+        key = None
+        for attempt in range(1 + Config.BULK_RETRIES):
+            if attempt:
+                await asyncio.sleep(random.uniform(0.5, 1.5) * 2 ** attempt)
+            async with semaphore:
+                key = await OutlineAPI.create_key(port, name)
+            if key:
+                break
+        
+        if key:
+            created.append(key)
+        else:
+            failed.append(item)
+        done += 1
+        if on_progress:
+            await on_progress(done, len(items))
+    
+    await asyncio.gather(*(create(item) for item in items))
+    if failed:
+        logger.warning(f"Массовое создание: не создано ключей: {len(failed)} из {len(items)}")
+    return created, failed
+
+def keys_to_csv(keys: List[AccessKey]) -> bytes:
+    """
+    Выгрузка созданных ключей в CSV.
+    
+    Args:
+        keys (List[AccessKey]): Созданные ключи
+    
+    Returns:
+        bytes: Содержимое CSV-файла в UTF-8
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["name", "port", "server", "id", "accessUrl"])
+    for key in keys:
+        writer.writerow([key.name, key.port, key.server, key.id, key.access_url])
+    # BOM, чтобы Excel корректно открывал кириллицу
+    return buffer.getvalue().encode("utf-8-sig")
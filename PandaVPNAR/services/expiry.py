@@ -0,0 +1,326 @@
+"""
+Срок действия ключей и их автоматическое удаление.
+"""
+import html
+import json
+import time
+import heapq
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from config import Config, Messages
+from api.cache import KeyCache
+from api.outline import OutlineAPI
+from api.servers import split_key_id
+from services.quota import QuotaManager
+from services.traffic import TrafficCollector
+from storage.backends import Storage
+from storage.writes import LocalWrites
+from utils.sender import MessageQueue
+from utils.tasks import TaskSupervisor
+
+logger = logging.getLogger(__name__)
+
+# События планировщика
+EVENT_NOTICE = "notice"
+EVENT_EXPIRE = "expire"
+
+class ExpiryRecord:
+    """Срок действия одного ключа."""
+    
+    __slots__ = ("deadline", "owner", "notified", "attempts")
+    
+    def __init__(self, deadline: float, owner: Optional[int] = None, notified: bool = False):
+        self.deadline = deadline
+        self.owner = owner
+        self.notified = notified
+        self.attempts = 0
+    
+    def dump(self) -> str:
+        """Сериализация для хранилища."""
+        return json.dumps({"deadline": self.deadline, "owner": self.owner, "notified": self.notified})
+
+def parse_expiry(text: str, now: Optional[float] = None) -> Optional[float]:
+    """
+    Разбор срока действия ключа.
+    
+    Args:
+        text (str): Число дней, дата ДД.ММ.ГГГГ (ключ действует до конца дня) или 0 — бессрочно
+        now (Optional[float]): Текущий момент
+        
+    Returns:
+        Optional[float]: Момент истечения (unix time) или None для бессрочного ключа
+        
+    Raises:
+        ValueError: Некорректный, уже прошедший или длиннее EXPIRY_MAX_DAYS срок
+    """
+    now = time.time() if now is None else now
+    text = text.strip()
+    if text.isdigit():
+        days = int(text)
+        if days > Config.EXPIRY_MAX_DAYS:
+            raise ValueError("Слишком большой срок")
+        return now + days * 86400 if days else None
+    
+    try:
+        deadline = (datetime.strptime(text, "%d.%m.%Y") + timedelta(days=1)).timestamp()
+    except OverflowError:
+        raise ValueError("Слишком поздняя дата")
+    if deadline <= now:
+        raise ValueError("Дата уже прошла")
+    if deadline > now + (Config.EXPIRY_MAX_DAYS + 1) * 86400:
+        raise ValueError("Слишком большой срок")
+    return deadline
+
+def format_deadline(deadline: float) -> str:
+    """Форматирование момента истечения для сообщений."""
+    return datetime.fromtimestamp(deadline).strftime('%d.%m.%Y %H:%M')
+
+class ExpiryScheduler:
+    """
+    Планировщик истечения ключей.
+    
+    Все сроки лежат в одной куче событий (уведомление и удаление);
+    фоновая задача спит до ближайшего события и просыпается раньше,
+    только если добавлен более ранний срок. Отмененные и перенесенные
+    события не удаляются из кучи, а пропускаются при извлечении.
+    В многопроцессном режиме фоновая задача лидера подхватывает сроки,
+    записанные другими процессами (sync), раз в EXPIRY_SYNC_INTERVAL и
+    перед обработкой наступивших событий.
+    """
+    
+    PREFIX = "expiry:"
+    TASK = "expiry"
+    
+    _records: Dict[str, ExpiryRecord] = {}
+    _heap: List[Tuple[float, str, str, float]] = []  # (момент, ID ключа, событие, срок ключа)
+    _wakeup: Optional[asyncio.Event] = None
+    _writes = LocalWrites()  # Собственные изменения сроков (для sync)
+    
+    @classmethod
+    async def start(cls) -> None:
+        """Загрузка сроков из хранилища и запуск фоновой задачи."""
+        if TaskSupervisor.running(cls.TASK):
+            return  # Повторный запуск задач лидера после сбоя: планировщик уже работает
+        # Загрузка, прерванная сбоем, повторяется с начала без дублей в куче
+        cls._records, cls._heap = {}, []
+        for key_id, record in (await cls._read()).items():
+            cls._add(key_id, record)
+        logger.info(f"Загружено сроков действия ключей: {len(cls._records)}")
+        
+        cls._wakeup = asyncio.Event()
+        TaskSupervisor.spawn(cls.TASK, cls._run)
+    
+    @classmethod
+    async def _read(cls) -> Dict[str, ExpiryRecord]:
+        """Чтение сроков из хранилища по ID ключа."""
+        backend = Storage.get()
+        records = {}
+        for name in await backend.keys(cls.PREFIX):
+            raw = await backend.get(name)
+            if raw is None:
+                continue
+            payload = json.loads(raw)
+            records[name[len(cls.PREFIX):]] = ExpiryRecord(payload["deadline"], payload.get("owner"), payload.get("notified", False))
+        return records
+        
+    @classmethod
+    async def sync(cls) -> int:
+        """
+        Подхват сроков, измененных другими процессами.
+        
+        Обновление администратора может попасть не к лидеру (лидер еще
+        не известен приемному процессу или только что сменился), и тогда
+        срок меняется только в хранилище. Новые и перенесенные сроки
+        добавляются в кучу, удаленные из хранилища отменяются.
+        
+        Returns:
+            int: Число ключей, срок которых изменился
+        """
+        mark = cls._writes.mark()
+        stored = await cls._read()
+        if not cls._writes.unchanged(mark):
+            return 0  # Снимок мог устареть, подхват в следующем проходе
+        
+        changed = [
+            key_id for key_id, record in stored.items()
+            if key_id not in cls._records
+            or (cls._records[key_id].deadline, cls._records[key_id].owner) != (record.deadline, record.owner)
+        ]
+        removed = [key_id for key_id in cls._records if key_id not in stored]
+        for key_id in changed:
+            cls._add(key_id, stored[key_id])
+        for key_id in removed:
+            del cls._records[key_id]
+        if changed or removed:
+            logger.info(f"Подхвачено изменений сроков действия ключей: {len(changed) + len(removed)}")
+        return len(changed) + len(removed)
+    
+    @classmethod
+    def _add(cls, key_id: str, record: ExpiryRecord) -> None:
+        """Регистрация срока ключа и его событий в куче."""
+        cls._records[key_id] = record
+        if not record.notified and Config.EXPIRY_NOTICE_BEFORE > 0:
+            heapq.heappush(cls._heap, (record.deadline - Config.EXPIRY_NOTICE_BEFORE, key_id, EVENT_NOTICE, record.deadline))
+        heapq.heappush(cls._heap, (record.deadline, key_id, EVENT_EXPIRE, record.deadline))
+        # Будим планировщик, только если новое событие раньше текущего ожидания
+        if cls._wakeup and cls._heap[0][1] == key_id:
+            cls._wakeup.set()
+    
+    @classmethod
+    async def schedule(cls, key_id: str, deadline: float, owner: Optional[int] = None) -> None:
+        """
+        Назначение срока действия ключа.
+        
+        Args:
+            key_id (str): ID ключа
+            deadline (float): Момент истечения (unix time)
+            owner (Optional[int]): ID пользователя-владельца для уведомлений
+        """
+        record = ExpiryRecord(deadline, owner)
+        with cls._writes.write():
+            cls._add(key_id, record)
+            await Storage.get().set(cls.PREFIX + key_id, record.dump())
+    
+    @classmethod
+    async def cancel(cls, key_id: str) -> None:
+        """
+        Отмена срока действия (например, при ручном удалении ключа).
+        
+        Args:
+            key_id (str): ID ключа
+        """
+        with cls._writes.write():
+            if cls._records.pop(key_id, None) is not None:
+                await Storage.get().delete(cls.PREFIX + key_id)
+    
+    @classmethod
+    def get(cls, key_id: str) -> Optional[float]:
+        """
+        Срок действия ключа.
+        
+        Args:
+            key_id (str): ID ключа
+            
+        Returns:
+            Optional[float]: Момент истечения или None для бессрочного ключа
+        """
+        record = cls._records.get(key_id)
+        return record.deadline if record else None
+    
+    @classmethod
+    def _take_due(cls, now: float) -> Tuple[List[str], List[str]]:
+        """Извлечение наступивших событий с пропуском устаревших."""
+        notices, expired = [], []
+        while cls._heap and cls._heap[0][0] <= now:
+            _, key_id, event, deadline = heapq.heappop(cls._heap)
+            record = cls._records.get(key_id)
+            if record is None or record.deadline != deadline:
+                continue  # Срок отменен или перенесен
+            if event == EVENT_NOTICE:
+                if not record.notified:
+                    notices.append(key_id)
+            elif key_id not in expired:
+                expired.append(key_id)
+        return notices, expired
+    
+    @classmethod
+    async def _run(cls) -> None:
+        """Основной цикл планировщика."""
+        synced = time.monotonic()
+        while True:
+            try:
+                # Подхват идет в этой же задаче и перед каждой обработкой событий, поэтому
+                # уведомление или удаление не затрет срок, измененный другим процессом
+                due = bool(cls._heap) and cls._heap[0][0] <= time.time()
+                if Config.BOT_WORKERS > 1 and (due or time.monotonic() - synced >= Config.EXPIRY_SYNC_INTERVAL):
+                    synced = time.monotonic()
+                    await cls.sync()
+                notices, expired = cls._take_due(time.time())
+                if notices:
+                    await cls._send_notices(notices)
+                if expired:
+                    await cls._expire(expired)
+            except Exception as e:
+                logger.error(f"Ошибка планировщика сроков ключей: {str(e)}")
+            
+            timeout = max(0.0, cls._heap[0][0] - time.time()) if cls._heap else None
+            if Config.BOT_WORKERS > 1:
+                remaining = max(0.0, synced + Config.EXPIRY_SYNC_INTERVAL - time.monotonic())
+                timeout = remaining if timeout is None else min(timeout, remaining)
+            cls._wakeup.clear()
+            try:
+                await asyncio.wait_for(cls._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+    
+    @classmethod
+    def _describe(cls, key_id: str) -> Dict[str, str]:
+        """Имя и сервер ключа для сообщений."""
+        key = KeyCache.get(key_id)
+        return {
+            "name": html.escape(key.name or 'Без имени') if key else key_id,
+            "server": split_key_id(key_id)[0]
+        }
+    
+    @classmethod
+    async def _send_notices(cls, key_ids: List[str]) -> None:
+        """Предупреждение администратора и владельцев о скором истечении ключей."""
+        items = {}
+        for key_id in key_ids:
+            record = cls._records[key_id]
+            text = Messages.EXPIRY_NOTICE.format(date=format_deadline(record.deadline), **cls._describe(key_id))
+            MessageQueue.send(Config.ADMIN_ID, text, digest="expiry")
+            if record.owner and record.owner != Config.ADMIN_ID:
+                MessageQueue.send(record.owner, text)
+            record.notified = True
+            items[cls.PREFIX + key_id] = record.dump()
+        await Storage.get().set_many(items)
+    
+    @classmethod
+    async def _expire(cls, key_ids: List[str]) -> None:
+        """Удаление истекших ключей пакетом с ограничением параллельности и повтором неудач."""
+        semaphore = asyncio.Semaphore(Config.EXPIRY_CONCURRENCY)
+        
+        async def delete(key_id: str) -> bool:
+            async with semaphore:
+                return await OutlineAPI.delete_key(key_id)
+        
+        # Имена берем до удаления, пока ключи еще есть в зеркале
+        described = {key_id: cls._describe(key_id) for key_id in key_ids}
+        results = await asyncio.gather(*(delete(key_id) for key_id in key_ids))
+        
+        removed = []
+        now = time.time()
+        for key_id, ok in zip(key_ids, results):
+            record = cls._records.get(key_id)
+            if record is None:
+                continue  # Срок отменен, пока шло удаление
+            text = Messages.KEY_EXPIRED.format(**described[key_id])
+            if ok:
+                MessageQueue.send(Config.ADMIN_ID, text, digest="expiry")
+                if record.owner and record.owner != Config.ADMIN_ID:
+                    MessageQueue.send(record.owner, text)
+                TrafficCollector.forget(key_id)
+                await QuotaManager.forget(key_id)
+            else:
+                record.attempts += 1
+                if record.attempts < Config.EXPIRY_MAX_ATTEMPTS:
+                    delay = Config.EXPIRY_RETRY_DELAY * 2 ** (record.attempts - 1)
+                    heapq.heappush(cls._heap, (now + delay, key_id, EVENT_EXPIRE, record.deadline))
+                    continue
+                logger.error(f"Истекший ключ {key_id} не удален после {record.attempts} попыток")
+                MessageQueue.send(Config.ADMIN_ID, Messages.EXPIRY_FAILED.format(**described[key_id]), digest="expiry")
+            del cls._records[key_id]
+            removed.append(cls.PREFIX + key_id)
+        
+        if removed:
+            await Storage.get().delete_many(removed)
+            logger.info(f"Удалено истекших ключей: {len(removed)}")
+    
+    @classmethod
+    async def stop(cls) -> None:
+        """Остановка фоновой задачи."""
+        await TaskSupervisor.cancel(cls.TASK)
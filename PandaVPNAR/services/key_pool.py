@@ -0,0 +1,237 @@
+"""
+Резерв заранее созданных ключей для мгновенной выдачи.
+"""
+import json
+import uuid
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+
+from config import Config
+from api.cache import KeyCache, is_pool_key, pool_key_name
+from api.models import AccessKey
+from api.outline import OutlineAPI
+from storage.backends import Storage
+from utils.metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+class KeyPool:
+    """
+    Резерв невыданных ключей.
+    
+    Ключи резерва создаются на сервере заранее с именем из
+    KEY_POOL_PREFIX и случайной метки (см. pool_key_name) и
+    записываются в хранилище. Выдача забирает
+    ключ из резерва и только переименовывает его — один короткий
+    запрос вместо создания. Фоновая задача лидера пополняет резерв до
+    KEY_POOL_SIZE, когда в нем остается KEY_POOL_MIN ключей и меньше.
+    
+    Ключом резерва считается только ключ, записанный в хранилище:
+    имя на сервере лишь скрывает ключ из списков. При запуске резерв
+    сверяется с сервером: ключи, имя которых резерв записал перед
+    созданием, но сам ключ записать не успел (аварийная остановка),
+    возвращаются в резерв, а записи о ключах, которых на сервере уже
+    нет или которые переименованы, удаляются. Чужие ключи сверка
+    не трогает, как бы они ни назывались.
+    """
+    
+    PREFIX = "keypool:"
+    PENDING_PREFIX = "keypool-pending:"  # Имена создаваемых ключей резерва
+    CLAIM_PREFIX = "keypool-claim:"
+    CLAIM_TTL = 3600  # Защита от повторной выдачи ключа, пока идет переименование
+    
+    _keys: Dict[str, AccessKey] = {}  # Ключи резерва по составному ID
+    
+    @classmethod
+    async def reconcile(cls) -> None:
+        """Сверка резерва с ключами на серверах."""
+        result = await OutlineAPI.get_all_keys()
+        if result is None:
+            logger.warning("Резерв ключей не сверен: серверы недоступны")
+            await cls.sync(force=True)
+            return
+        
+        backend = Storage.get()
+        failed = set(result['failedServers'])
+        on_server = {key.id: key for key in result['accessKeys']}
+        stored = await cls._read()
+        pending = {name[len(cls.PENDING_PREFIX):] for name in await backend.keys(cls.PENDING_PREFIX)}
+        # Записи недоступных серверов сохраняются до следующей сверки
+        stale = [
+            key_id for key_id, key in stored.items()
+            if key.server not in failed and not (key_id in on_server and is_pool_key(on_server[key_id]))
+        ]
+        # Возвращаются только ключи, созданные резервом: их имя записано в хранилище до создания
+        adopted = {
+            key.id: key for key in on_server.values()
+            if key.id not in stored and key.name in pending and is_pool_key(key)
+        }
+        
+        if stale:
+            await backend.delete_many([cls.PREFIX + key_id for key_id in stale])
+        if adopted:
+            await backend.set_many({cls.PREFIX + key_id: json.dumps(key.to_dict()) for key_id, key in adopted.items()})
+        # Имя без ключа на доступных серверах значит, что создание не удалось
+        if not failed:
+            await backend.delete_many([cls.PENDING_PREFIX + name for name in pending])
+        
+        cls._keys = {**{key_id: key for key_id, key in stored.items() if key_id not in stale}, **adopted}
+        logger.info(f"Резерв ключей сверен: {len(cls._keys)} шт., возвращено {len(adopted)}, удалено записей {len(stale)}")
+    
+    @classmethod
+    async def _read(cls) -> Dict[str, AccessKey]:
+        """Чтение резерва из хранилища."""
+        backend = Storage.get()
+        keys = {}
+        for name in await backend.keys(cls.PREFIX):
+            raw = await backend.get(name)
+            if raw is not None:
+                keys[name[len(cls.PREFIX):]] = AccessKey.from_dict(json.loads(raw))
+        return keys
+    
+    @classmethod
+    async def sync(cls, force: bool = False) -> None:
+        """
+        Перечитывание резерва из хранилища.
+        
+        В многопроцессном режиме резерв пополняет лидер, а ключи
+        выдают все процессы, поэтому перед выдачей список обновляется.
+        
+        Args:
+            force (bool): Перечитать и в однопроцессном режиме
+        """
+        if force or Config.BOT_WORKERS > 1:
+            cls._keys = await cls._read()
+    
+    @classmethod
+    def size(cls) -> int:
+        """Число ключей в резерве."""
+        return len(cls._keys)
+    
+    @classmethod
+    async def _claim(cls, port: Optional[int]) -> Optional[Tuple[AccessKey, str]]:
+        """Захват ключа резерва с подходящим портом; ключ удаляется из резерва. Возвращает ключ и метку захвата."""
+        await cls.sync()
+        backend = Storage.get()
+        for key_id, key in list(cls._keys.items()):
+            if port is not None and key.port != port:
+                continue
+            cls._keys.pop(key_id, None)
+            # Захват атомарен в хранилище, а метка своя у каждого захвата: ключ не получит
+            # ни другой процесс, ни другая задача этого процесса (например, удаление лишних)
+            token = uuid.uuid4().hex
+            if not await backend.acquire(cls.CLAIM_PREFIX + key_id, token, cls.CLAIM_TTL):
+                continue
+            # Список резерва мог устареть: ключ, уже выданный и освобожденный другим
+            # захватом, в хранилище больше не записан и повторно не выдается
+            if await backend.get(cls.PREFIX + key_id) is None:
+                await backend.release(cls.CLAIM_PREFIX + key_id, token)
+                continue
+            await backend.delete(cls.PREFIX + key_id)
+            return key, token
+        return None
+    
+    @classmethod
+    async def _restore(cls, key: AccessKey) -> None:
+        """Возврат захваченного ключа в резерв (переименование или удаление не удалось)."""
+        cls._keys[key.id] = key
+        await Storage.get().set(cls.PREFIX + key.id, json.dumps(key.to_dict()))
+    
+    @classmethod
+    async def issue(cls, port: Optional[int], name: str) -> Optional[AccessKey]:
+        """
+        Выдача ключа: из резерва, если там есть ключ с нужным портом, иначе создание нового.
+        
+        Args:
+            port (Optional[int]): Номер порта (None — порт сервера по умолчанию)
+            name (str): Имя ключа
+            
+        Returns:
+            Optional[AccessKey]: Ключ или None в случае ошибки
+        """
+        claimed = await cls._claim(port)
+        if claimed is not None:
+            key, token = claimed
+            try:
+                if await OutlineAPI.rename_key(key.id, name):
+                    key = key.replace(name=name)
+                    KeyCache.put(key)
+                    logger.info(f"Ключ {key.id} выдан из резерва, осталось {len(cls._keys)}")
+                    return key
+                logger.warning(f"Не удалось переименовать ключ резерва {key.id}, создается новый")
+                await cls._restore(key)
+            finally:
+                await Storage.get().release(cls.CLAIM_PREFIX + key.id, token)
+        return await OutlineAPI.create_key(port, name)
+    
+    @classmethod
+    async def _add(cls) -> bool:
+        """Создание одного ключа резерва."""
+        backend = Storage.get()
+        name = pool_key_name(uuid.uuid4().hex)
+        # Имя записывается до создания: ключ, созданный перед аварийной остановкой,
+        # сверка вернет в резерв, а запись неудавшегося создания удалит
+        await backend.set(cls.PENDING_PREFIX + name, "")
+        key = await OutlineAPI.create_key(None, name)
+        if not key:
+            return False
+        cls._keys[key.id] = key
+        await backend.set(cls.PREFIX + key.id, json.dumps(key.to_dict()))
+        await backend.delete(cls.PENDING_PREFIX + name)
+        return True
+    
+    @classmethod
+    async def _remove(cls, key_id: str) -> bool:
+        """Удаление лишнего ключа резерва с сервера."""
+        key = cls._keys.pop(key_id, None)
+        if key is None:
+            return False  # Ключ уже выдан
+        backend = Storage.get()
+        token = uuid.uuid4().hex
+        if not await backend.acquire(cls.CLAIM_PREFIX + key_id, token, cls.CLAIM_TTL):
+            return False  # Ключ как раз выдается
+        if await backend.get(cls.PREFIX + key_id) is None:
+            await backend.release(cls.CLAIM_PREFIX + key_id, token)
+            return False  # Ключ уже выдан
+        try:
+            await backend.delete(cls.PREFIX + key_id)
+            if await OutlineAPI.delete_key(key_id):
+                return True
+            await cls._restore(key)
+            return False
+        finally:
+            await backend.release(cls.CLAIM_PREFIX + key_id, token)
+    
+    @classmethod
+    async def maintain(cls) -> None:
+        """Пополнение резерва ниже порога и удаление ключей сверх KEY_POOL_SIZE."""
+        await cls.sync()
+        size = len(cls._keys)
+        semaphore = asyncio.Semaphore(Config.BULK_CONCURRENCY)
+        
+        async def limited(step) -> bool:
+            async with semaphore:
+                return await step
+        
+        if size > Config.KEY_POOL_SIZE:
+            surplus = list(cls._keys)[Config.KEY_POOL_SIZE:]
+            results = await asyncio.gather(*(limited(cls._remove(key_id)) for key_id in surplus))
+            logger.info(f"Удалено лишних ключей резерва: {sum(results)} из {len(surplus)}")
+        elif size <= Config.KEY_POOL_MIN and size < Config.KEY_POOL_SIZE:
+            missing = Config.KEY_POOL_SIZE - size
+            results = await asyncio.gather(*(limited(cls._add()) for _ in range(missing)))
+            logger.info(f"Резерв ключей пополнен: {sum(results)} из {missing}, всего {len(cls._keys)}")
+    
+    @classmethod
+    async def run(cls) -> None:
+        """Фоновая задача лидера: сверка при запуске и поддержание размера резерва."""
+        await cls.reconcile()
+        while True:
+            try:
+                await cls.maintain()
+            except Exception as e:
+                logger.error(f"Ошибка пополнения резерва ключей: {str(e)}")
+            await asyncio.sleep(Config.KEY_POOL_INTERVAL)
+
+KEY_POOL_SIZE = Gauge("bot_key_pool_size", "Ключи в резерве", function=lambda: {(): len(KeyPool._keys)})
@@ -0,0 +1,187 @@
+"""
+Инкрементальная синхронизация зеркала ключей с серверами Outline.
+"""
+import time
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from config import Config
+from api.cache import KeyCache, is_pool_key
+from api.models import AccessKey
+from api.outline import OutlineAPI
+from api.servers import ServerPool
+from utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+# Виды изменений ключа
+CHANGE_ADDED = "added"
+CHANGE_REMOVED = "removed"
+CHANGE_RENAMED = "renamed"
+CHANGE_PORT = "port"
+
+class KeyChange:
+    """Одно изменение ключа на сервере."""
+    
+    __slots__ = ("kind", "key_id", "server", "name", "old", "new", "external", "at")
+    
+    def __init__(
+        self,
+        kind: str,
+        key: AccessKey,
+        old: Any = None,
+        new: Any = None,
+        external: bool = False
+    ):
+        self.kind = kind
+        self.key_id = key.id
+        self.server = key.server
+        self.name = key.name
+        self.old = old
+        self.new = new
+        self.external = external  # Сделано не через бота (например, в Outline Manager)
+        self.at = time.time()
+
+class KeySync:
+    """
+    Синхронизация списка ключей по изменениям.
+    
+    Список каждого сервера сравнивается с предыдущим снимком: если
+    тело ответа не изменилось (совпал хэш), сервер пропускается целиком,
+    иначе вычисляются изменения по ID — добавление, удаление,
+    переименование и смена порта. В зеркало применяются только они, а
+    подписчики и лента последних изменений получают их как события.
+    
+    Свои создания, переименования и удаления бот записывает в журнал
+    (OutlineAPI.writes), поэтому изменение, которого нет в журнале,
+    сделано вне бота. Зеркало для этого не подходит: его может целиком
+    перезагрузить запрос пользователя (OutlineAPI.refresh_keys).
+    """
+    
+    _snapshots: Dict[str, Dict[str, AccessKey]] = {}  # Сервер -> ID -> ключ
+    _fingerprints: Dict[str, Optional[str]] = {}
+    _listeners: List[Callable[[List[KeyChange]], Awaitable[None]]] = []
+    _recent: Deque[KeyChange] = deque(maxlen=Config.KEY_CHANGES_KEEP)
+    
+    @classmethod
+    def subscribe(cls, listener: Callable[[List[KeyChange]], Awaitable[None]]) -> None:
+        """
+        Подписка на изменения ключей.
+        
+        Args:
+            listener: Корутина, получающая список изменений одной синхронизации
+        """
+        cls._listeners.append(listener)
+    
+    @classmethod
+    def recent(cls, limit: int) -> List[KeyChange]:
+        """
+        Последние изменения, сначала новые.
+        
+        Args:
+            limit (int): Максимальное число изменений
+            
+        Returns:
+            List[KeyChange]: Изменения
+        """
+        return list(cls._recent)[-limit:][::-1]
+    
+    @staticmethod
+    def _diff(
+        previous: Dict[str, AccessKey],
+        current: Dict[str, AccessKey],
+        writes: Dict[str, Optional[str]]
+    ) -> List[KeyChange]:
+        """Изменения между двумя снимками одного сервера; writes — журнал изменений бота."""
+        changes = []
+        for key_id, key in current.items():
+            old = previous.get(key_id)
+            # Ключ создан или переименован ботом, если последнее записанное им имя совпадает с текущим
+            by_bot = key_id in writes and writes[key_id] == key.name
+            if old is None:
+                changes.append(KeyChange(CHANGE_ADDED, key, external=not by_bot))
+                continue
+            if old.name != key.name:
+                changes.append(KeyChange(CHANGE_RENAMED, key, old.name, key.name, not by_bot))
+            if old.port != key.port:
+                # Порт существующего ключа бот не меняет
+                changes.append(KeyChange(CHANGE_PORT, key, old.port, key.port, True))
+        for key_id, key in previous.items():
+            if key_id not in current:
+                by_bot = key_id in writes and writes[key_id] is None
+                changes.append(KeyChange(CHANGE_REMOVED, key, external=not by_bot))
+        return changes
+    
+    @classmethod
+    async def sync(cls) -> bool:
+        """
+        Синхронизация зеркала с серверами.
+        
+        Returns:
+            bool: True, если ответил хотя бы один сервер
+        """
+        started = time.monotonic()
+        result = await OutlineAPI.get_all_keys()
+        if result is None:
+            return False
+        
+        failed = set(result['failedServers'])
+        by_server: Dict[str, List[AccessKey]] = {}
+        for key in result['accessKeys']:
+            by_server.setdefault(key.server, []).append(key)
+        
+        changes: List[KeyChange] = []
+        initial = False
+        for server in ServerPool.all():
+            if server.name in failed:
+                continue
+            writes = OutlineAPI.writes(server.name)
+            # Изменения бота до начала запроса уже отражены в полученном списке
+            OutlineAPI.forget_writes(server.name, started)
+            if server.name in cls._fingerprints and cls._fingerprints[server.name] == server.keys_fingerprint:
+                SYNC_UNCHANGED.inc(server.name)
+                continue
+            
+            current = {key.id: key for key in by_server.get(server.name, []) if not is_pool_key(key)}
+            previous = cls._snapshots.get(server.name)
+            cls._snapshots[server.name] = current
+            cls._fingerprints[server.name] = server.keys_fingerprint
+            if previous is None:
+                initial = True  # Первый снимок сервера: событий нет, зеркало загружается целиком
+                continue
+            
+            changes.extend(cls._diff(previous, current, writes))
+            for key_id, key in current.items():
+                if previous.get(key_id) != key:
+                    KeyCache.put(key)  # В том числе изменения других полей, например лимита
+            for key_id in previous.keys() - current.keys():
+                KeyCache.remove(key_id)
+        
+        if initial:
+            # Снимки недоступных серверов остаются прежними до следующей синхронизации
+            KeyCache.replace([key for snapshot in cls._snapshots.values() for key in snapshot.values()])
+        else:
+            KeyCache.mark_fresh()
+        
+        if changes:
+            await cls._publish(changes)
+        return True
+    
+    @classmethod
+    async def _publish(cls, changes: List[KeyChange]) -> None:
+        """Запись изменений в ленту и рассылка подписчикам."""
+        cls._recent.extend(changes)
+        for change in changes:
+            SYNC_CHANGES.inc(change.kind, "external" if change.external else "bot")
+        external = sum(1 for change in changes if change.external)
+        logger.info(f"Изменения ключей на серверах: {len(changes)}, из них вне бота: {external}")
+        
+        for listener in cls._listeners:
+            try:
+                await listener(changes)
+            except Exception as e:
+                logger.error(f"Ошибка обработчика изменений ключей: {str(e)}")
+
+SYNC_UNCHANGED = Counter("outline_keys_unchanged_total", "Синхронизации без изменений списка ключей", ("server",))
+SYNC_CHANGES = Counter("outline_key_changes_total", "Изменения ключей на серверах", ("kind", "origin"))
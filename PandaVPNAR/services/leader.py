@@ -0,0 +1,111 @@
+"""
+Аренда лидерства: фоновые задачи выполняет только один процесс.
+"""
+import os
+import time
+import socket
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from config import Config
+from storage.backends import Storage
+from utils.tasks import TaskSupervisor
+
+logger = logging.getLogger(__name__)
+
+def make_owner(index: int) -> str:
+    """
+    Идентификатор претендента на лидерство.
+    
+    Args:
+        index (int): Номер процесса-обработчика
+        
+    Returns:
+        str: Строка вида хост:pid:номер
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+class LeaderLease:
+    """
+    Лидер среди процессов, работающих с общим хранилищем.
+    
+    Аренда — запись в хранилище со сроком LEADER_LEASE_TTL; владелец
+    продлевает ее каждую треть срока. Если продлить не удалось за
+    срок аренды, процесс считает лидерство потерянным и останавливает
+    фоновые задачи до того, как другой процесс сможет их запустить.
+    """
+    
+    KEY = "leader"
+    TASK = "leader_lease"
+    
+    _owner: str = ""
+    _leader: bool = False
+    _renewed: float = 0.0  # Момент последнего успешного продления (monotonic)
+    _on_acquire: Optional[Callable[[], Awaitable[None]]] = None
+    _on_release: Optional[Callable[[], Awaitable[None]]] = None
+    
+    @classmethod
+    def start(
+        cls,
+        owner: str,
+        on_acquire: Callable[[], Awaitable[None]],
+        on_release: Callable[[], Awaitable[None]]
+    ) -> None:
+        """
+        Запуск борьбы за лидерство.
+        
+        Args:
+            owner (str): Идентификатор процесса
+            on_acquire: Запуск фоновых задач при получении лидерства; должен
+                возвращаться сразу, иначе цикл продления ждет его и аренда истекает
+            on_release: Остановка фоновых задач при его потере
+        """
+        cls._owner = owner
+        cls._on_acquire = on_acquire
+        cls._on_release = on_release
+        TaskSupervisor.spawn(cls.TASK, cls._run)
+    
+    @classmethod
+    def is_leader(cls) -> bool:
+        """Проверка, является ли процесс лидером."""
+        return cls._leader
+    
+    @classmethod
+    async def _set_leader(cls, leader: bool) -> None:
+        """Смена роли с запуском или остановкой фоновых задач."""
+        if leader == cls._leader:
+            return
+        cls._leader = leader
+        logger.info(f"Процесс {cls._owner} {'стал лидером' if leader else 'потерял лидерство'}")
+        try:
+            await (cls._on_acquire if leader else cls._on_release)()
+        except Exception as e:
+            logger.error(f"Ошибка смены роли лидера: {str(e)}")
+    
+    @classmethod
+    async def _run(cls) -> None:
+        """Цикл захвата и продления аренды."""
+        while True:
+            try:
+                acquired = await Storage.get().acquire(cls.KEY, cls._owner, Config.LEADER_LEASE_TTL)
+                if acquired:
+                    cls._renewed = time.monotonic()
+                await cls._set_leader(acquired)
+            except Exception as e:
+                logger.error(f"Ошибка продления аренды лидера: {str(e)}")
+                # Без связи с хранилищем аренда истечет сама, и лидером может стать другой процесс
+                if cls._leader and time.monotonic() - cls._renewed >= Config.LEADER_LEASE_TTL:
+                    await cls._set_leader(False)
+            await asyncio.sleep(Config.LEADER_LEASE_TTL / 3)
+    
+    @classmethod
+    async def stop(cls) -> None:
+        """Остановка задач лидера и освобождение аренды для резервного процесса."""
+        await TaskSupervisor.cancel(cls.TASK)
+        if cls._leader:
+            await cls._set_leader(False)
+            try:
+                await Storage.get().release(cls.KEY, cls._owner)
+            except Exception as e:
+                logger.error(f"Не удалось освободить аренду лидера: {str(e)}")
@@ -0,0 +1,291 @@
+"""
+Месячные лимиты трафика ключей и их принудительное применение.
+"""
+import html
+import json
+import math
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set
+
+from config import Config, Messages
+from api.cache import KeyCache
+from api.outline import OutlineAPI
+from api.servers import split_key_id
+from services.traffic import TrafficCollector
+from storage.backends import Storage
+from storage.writes import LocalWrites
+from utils.formatting import format_bytes
+from utils.sender import MessageQueue
+
+logger = logging.getLogger(__name__)
+
+# Состояния ключа относительно лимита
+QUOTA_OK = "ok"
+QUOTA_WARNED = "warned"
+QUOTA_BLOCKED = "blocked"
+
+# Наибольший лимит в байтах: сервер Outline хранит числа как double, точные только до 2^53
+MAX_LIMIT = 2 ** 53
+
+def parse_quota(text: str) -> Optional[int]:
+    """
+    Разбор месячного лимита трафика, введенного в гигабайтах.
+    
+    Args:
+        text (str): Число ГБ (дробная часть через точку или запятую) или 0 — снять лимит
+        
+    Returns:
+        Optional[int]: Лимит в байтах или None, чтобы снять лимит
+        
+    Raises:
+        ValueError: Не число, отрицательное, бесконечное или NaN значение, меньше байта или больше MAX_LIMIT
+    """
+    gigabytes = float(text.strip().replace(",", "."))
+    if not math.isfinite(gigabytes) or gigabytes < 0:
+        raise ValueError("Лимит должен быть конечным неотрицательным числом")
+    if gigabytes == 0:
+        return None
+    limit = gigabytes * 1024 ** 3
+    # Пределы проверяются до int(): произведение может оказаться бесконечным
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError("Лимит вне допустимых пределов")
+    return int(limit)
+
+class QuotaManager:
+    """
+    Лимиты трафика ключей.
+    
+    Расход берется из окна «месяц» TrafficCollector. Пока счетчик
+    ключа не получен (сразу после запуска или при недоступном
+    сервере), состояние ключа не меняется: блокировка, сохраненная
+    до перезапуска, не снимается из-за нулевого расхода. За проход
+    перепроверяются только ключи с новым трафиком, ключи с измененным
+    лимитом и заблокированные ключи (их окно сдвигается без нового
+    трафика). Заблокированным ключам на сервере ставится лимит 0,
+    изменения лимитов отправляются пакетом с ограничением числа
+    одновременных запросов; неудачные повторяются в следующем проходе.
+    В многопроцессном режиме лидер подхватывает лимиты, записанные
+    другими процессами, через sync.
+    """
+    
+    PREFIX = "quota:"
+    
+    _limits: Dict[str, int] = {}  # Лимит в байтах по ID ключа
+    _states: Dict[str, str] = {}  # Состояние ключей, отличное от QUOTA_OK
+    _dirty: Set[str] = set()  # Ключи с измененным лимитом, ожидающие проверки
+    _pending: Dict[str, Optional[int]] = {}  # Лимиты для отправки на сервер (None — снять)
+    _writes = LocalWrites()  # Собственные изменения лимитов (для sync)
+    
+    @classmethod
+    async def _read(cls) -> Dict[str, dict]:
+        """Чтение записей лимитов из хранилища по ID ключа."""
+        backend = Storage.get()
+        records = {}
+        for name in await backend.keys(cls.PREFIX):
+            raw = await backend.get(name)
+            if raw is not None:
+                records[name[len(cls.PREFIX):]] = json.loads(raw)
+        return records
+    
+    @classmethod
+    async def load(cls) -> None:
+        """Загрузка лимитов из хранилища при запуске."""
+        for key_id, record in (await cls._read()).items():
+            cls._limits[key_id] = record["limit"]
+            if record.get("state", QUOTA_OK) != QUOTA_OK:
+                cls._states[key_id] = record["state"]
+        cls._dirty.update(cls._limits)
+        logger.info(f"Загружено лимитов трафика: {len(cls._limits)}")
+    
+    @classmethod
+    async def sync(cls) -> int:
+        """
+        Подхват лимитов, измененных другими процессами.
+        
+        Обновление администратора может попасть не к лидеру (лидер еще
+        не известен приемному процессу или только что сменился), и тогда
+        лимит меняется только в хранилище. Новые и измененные лимиты
+        проверяются в следующем проходе, удаленные снимаются, как в forget.
+        
+        Returns:
+            int: Число ключей, лимит которых изменился
+        """
+        mark = cls._writes.mark()
+        stored = {key_id: record["limit"] for key_id, record in (await cls._read()).items()}
+        if not cls._writes.unchanged(mark):
+            return 0  # Снимок мог устареть, подхват в следующем проходе
+        
+        changed = [key_id for key_id, limit in stored.items() if cls._limits.get(key_id) != limit]
+        removed = [key_id for key_id in cls._limits if key_id not in stored]
+        for key_id in changed:
+            cls._limits[key_id] = stored[key_id]
+            cls._dirty.add(key_id)
+        for key_id in removed:
+            cls._discard(key_id)
+        if changed or removed:
+            logger.info(f"Подхвачено изменений лимитов трафика: {len(changed) + len(removed)}")
+        return len(changed) + len(removed)
+    
+    @classmethod
+    def get(cls, key_id: str) -> Optional[int]:
+        """
+        Лимит ключа.
+        
+        Args:
+            key_id (str): ID ключа
+            
+        Returns:
+            Optional[int]: Лимит в байтах или None, если лимита нет
+        """
+        return cls._limits.get(key_id)
+    
+    @classmethod
+    def is_blocked(cls, key_id: str) -> bool:
+        """Проверка, заблокирован ли ключ за превышение лимита."""
+        return cls._states.get(key_id) == QUOTA_BLOCKED
+    
+    @classmethod
+    async def set_limit(cls, key_id: str, limit: Optional[int]) -> None:
+        """
+        Назначение или снятие лимита ключа.
+        
+        Args:
+            key_id (str): ID ключа
+            limit (Optional[int]): Лимит в байтах или None, чтобы снять лимит
+        """
+        if limit is None:
+            await cls.forget(key_id)
+            return
+        with cls._writes.write():
+            cls._limits[key_id] = limit
+            cls._dirty.add(key_id)
+            await cls._save([key_id])
+    
+    @classmethod
+    async def forget(cls, key_id: str) -> None:
+        """
+        Удаление лимита ключа (при снятии лимита или удалении ключа).
+        
+        Args:
+            key_id (str): ID ключа
+        """
+        with cls._writes.write():
+            cls._discard(key_id)
+            await Storage.get().delete(cls.PREFIX + key_id)
+    
+    @classmethod
+    def _discard(cls, key_id: str) -> None:
+        """Снятие лимита в памяти; блокировка на сервере снимается при отправке изменений."""
+        cls._limits.pop(key_id, None)
+        cls._dirty.discard(key_id)
+        if cls._states.pop(key_id, None) == QUOTA_BLOCKED:
+            cls._pending[key_id] = None
+    
+    @classmethod
+    async def _save(cls, key_ids: List[str]) -> None:
+        """Запись лимитов и состояний ключей в хранилище одним пакетом."""
+        items = {
+            cls.PREFIX + key_id: json.dumps({"limit": cls._limits[key_id], "state": cls._states.get(key_id, QUOTA_OK)})
+            for key_id in key_ids if key_id in cls._limits
+        }
+        if items:
+            await Storage.get().set_many(items)
+    
+    @classmethod
+    def _notify(cls, template: str, key_id: str, used: int, limit: int) -> None:
+        """Уведомление администратора об изменении состояния ключа."""
+        key = KeyCache.get(key_id)
+        MessageQueue.send(
+            Config.ADMIN_ID,
+            template.format(
+                name=html.escape(key.name or 'Без имени') if key else key_id,
+                server=split_key_id(key_id)[0],
+                used=format_bytes(used),
+                limit=format_bytes(limit),
+                percent=used * 100 // limit if limit else 100
+            ),
+            digest="quota"
+        )
+    
+    @classmethod
+    async def evaluate(cls) -> int:
+        """
+        Проверка ключей, расход или лимит которых изменились.
+        
+        Returns:
+            int: Число ключей, сменивших состояние
+        """
+        candidates = TrafficCollector.take_changed() | cls._dirty
+        candidates.update(key_id for key_id, state in cls._states.items() if state == QUOTA_BLOCKED)
+        cls._dirty = set()
+        
+        changed = []
+        for key_id in candidates:
+            limit = cls._limits.get(key_id)
+            if limit is None:
+                continue
+            if not TrafficCollector.known(key_id):
+                cls._dirty.add(key_id)  # Проверяется после первого опроса счетчиков
+                continue
+            used = TrafficCollector.store.usage(key_id)["month"]
+            if used >= limit:
+                state = QUOTA_BLOCKED
+            elif used >= limit * Config.QUOTA_WARN_RATIO:
+                state = QUOTA_WARNED
+            else:
+                state = QUOTA_OK
+            
+            previous = cls._states.get(key_id, QUOTA_OK)
+            if state == previous:
+                continue
+            
+            if state == QUOTA_BLOCKED:
+                cls._pending[key_id] = 0
+                cls._notify(Messages.QUOTA_BLOCKED, key_id, used, limit)
+            elif previous == QUOTA_BLOCKED:
+                cls._pending[key_id] = None
+                cls._notify(Messages.QUOTA_UNBLOCKED, key_id, used, limit)
+            elif state == QUOTA_WARNED:
+                cls._notify(Messages.QUOTA_WARNING, key_id, used, limit)
+            
+            if state == QUOTA_OK:
+                cls._states.pop(key_id, None)
+            else:
+                cls._states[key_id] = state
+            changed.append(key_id)
+        
+        if changed:
+            await cls._save(changed)
+        return len(changed)
+    
+    @classmethod
+    async def flush(cls) -> int:
+        """
+        Отправка накопленных изменений лимитов на серверы Outline.
+        
+        Returns:
+            int: Число изменений, которые не удалось применить
+        """
+        if not cls._pending:
+            return 0
+        pending, cls._pending = cls._pending, {}
+        semaphore = asyncio.Semaphore(Config.QUOTA_CONCURRENCY)
+        
+        async def push(key_id: str, limit: Optional[int]) -> None:
+            async with semaphore:
+                ok = await OutlineAPI.set_data_limit(key_id, limit)
+            if not ok:
+                # Более новое изменение того же ключа не затираем
+                cls._pending.setdefault(key_id, limit)
+        
+        await asyncio.gather(*(push(key_id, limit) for key_id, limit in pending.items()))
+        if cls._pending:
+            logger.warning(f"Не применено изменений лимитов: {len(cls._pending)} из {len(pending)}")
+        return len(cls._pending)
+    
+    @classmethod
+    async def enforce(cls) -> None:
+        """Один проход проверки лимитов с отправкой изменений на серверы."""
+        await cls.evaluate()
+        await cls.flush()
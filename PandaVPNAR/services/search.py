@@ -0,0 +1,189 @@
+"""
+Поиск ключей по префиксу имени, ID и порту.
+"""
+import re
+from typing import Dict, Iterator, List, Optional, Set, Union
+
+from api.cache import KeyCache
+from api.models import AccessKey
+from api.servers import KEY_ID_SEPARATOR
+
+# Разделители слов в имени ключа: поиск находит ключ и по началу любого слова
+WORD_BOUNDARY = re.compile(r"[\s\-_.@]+")
+
+def _tokens(key: AccessKey) -> Set[str]:
+    """Строки, по началу которых находится ключ."""
+    tokens = {key.id.rpartition(KEY_ID_SEPARATOR)[2]}
+    if key.port is not None:
+        tokens.add(str(key.port))
+    name = key.name.casefold()
+    if name:
+        tokens.add(name)
+        # «alice iphone» находится и по «iph»: индексируется хвост имени с начала каждого слова
+        tokens.update(name[match.end():] for match in WORD_BOUNDARY.finditer(name) if match.end() < len(name))
+    return tokens
+
+class _Node:
+    """Узел сжатого префиксного дерева: ребро с меткой и ключи, чьи строки заканчиваются здесь."""
+    
+    __slots__ = ("label", "children", "ids")
+    
+    def __init__(self, label: str):
+        self.label = label
+        self.children: Optional[Dict[str, "_Node"]] = None  # Первый символ метки -> узел
+        # Обычно строка принадлежит одному ключу: множество заводится только для нескольких
+        self.ids: Union[None, str, Set[str]] = None
+
+class KeySearch:
+    """
+    Префиксный индекс ключей для inline-поиска.
+    
+    Строки ключа (имя, хвосты имени с начала слов, ID на сервере и
+    порт) хранятся в сжатом префиксном дереве: поиск спускается по
+    символам запроса и собирает ключи из найденного поддерева до
+    нужного числа результатов. Время поиска зависит от длины запроса
+    и числа результатов, а не от числа ключей.
+    
+    Индекс обновляется по изменениям зеркала ключей (KeyCache.watch):
+    меняются только строки добавленного, измененного или удаленного ключа.
+    """
+    
+    _root = _Node("")
+    
+    @classmethod
+    def apply(cls, old: Optional[AccessKey], new: Optional[AccessKey]) -> None:
+        """
+        Обновление индекса по изменению одного ключа в зеркале.
+        
+        Args:
+            old (Optional[AccessKey]): Прежняя версия ключа (None — ключ добавлен)
+            new (Optional[AccessKey]): Новая версия ключа (None — ключ удален)
+        """
+        old_tokens = _tokens(old) if old is not None else set()
+        new_tokens = _tokens(new) if new is not None else set()
+        for token in old_tokens - new_tokens:
+            cls._remove(token, old.id)
+        for token in new_tokens - old_tokens:
+            cls._insert(token, new.id)
+    
+    @classmethod
+    def _insert(cls, token: str, key_id: str) -> None:
+        """Добавление строки ключа в дерево."""
+        node = cls._root
+        while token:
+            if node.children is None:
+                node.children = {}
+            child = node.children.get(token[0])
+            if child is None:
+                child = node.children[token[0]] = _Node(token)
+                node = child
+                break
+            
+            common = 0
+            limit = min(len(token), len(child.label))
+            while common < limit and token[common] == child.label[common]:
+                common += 1
+            if common < len(child.label):
+                # Строка расходится с меткой ребра посередине: ребро делится
+                middle = _Node(child.label[:common])
+                child.label = child.label[common:]
+                middle.children = {child.label[0]: child}
+                node.children[token[0]] = middle
+                child = middle
+            node = child
+            token = token[common:]
+        
+        if node.ids is None:
+            node.ids = key_id
+        elif isinstance(node.ids, str):
+            if node.ids != key_id:
+                node.ids = {node.ids, key_id}
+        else:
+            node.ids.add(key_id)
+    
+    @classmethod
+    def _remove(cls, token: str, key_id: str) -> None:
+        """Удаление строки ключа из дерева со сжатием опустевших узлов."""
+        path = [cls._root]
+        node = cls._root
+        while token:
+            child = node.children.get(token[0]) if node.children else None
+            if child is None or not token.startswith(child.label):
+                return
+            token = token[len(child.label):]
+            node = child
+            path.append(node)
+        
+        if node.ids is None or (node.ids != key_id if isinstance(node.ids, str) else key_id not in node.ids):
+            return
+        if isinstance(node.ids, str):
+            node.ids = None
+        else:
+            node.ids.discard(key_id)
+            if len(node.ids) == 1:
+                (node.ids,) = node.ids
+        
+        # Снизу вверх: пустой лист удаляется, узел с одним потомком сливается с ним
+        for depth in range(len(path) - 1, 0, -1):
+            node, parent = path[depth], path[depth - 1]
+            if node.ids is None and not node.children:
+                del parent.children[node.label[0]]
+                if not parent.children:
+                    parent.children = None
+            elif node.ids is None and len(node.children) == 1:
+                (child,) = node.children.values()
+                child.label = node.label + child.label
+                parent.children[child.label[0]] = child
+            else:
+                break
+    
+    @classmethod
+    def _walk(cls, node: _Node) -> Iterator[str]:
+        """ID ключей поддерева: сначала точные совпадения, затем потомки по алфавиту."""
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node.ids, str):
+                yield node.ids
+            elif node.ids:
+                yield from node.ids
+            if node.children:
+                stack.extend(node.children[char] for char in sorted(node.children, reverse=True))
+    
+    @classmethod
+    def search(cls, query: str, limit: int) -> List[str]:
+        """
+        Поиск ключей по началу имени, слова в имени, ID или порта.
+        
+        Args:
+            query (str): Строка запроса
+            limit (int): Максимальное число результатов
+        
+        Returns:
+            List[str]: ID найденных ключей
+        """
+        rest = query.strip().casefold()
+        node = cls._root
+        while rest:
+            child = node.children.get(rest[0]) if node.children else None
+            if child is None:
+                return []
+            if child.label.startswith(rest):
+                rest = ""  # Запрос кончается внутри ребра: подходит все поддерево
+            elif rest.startswith(child.label):
+                rest = rest[len(child.label):]
+            else:
+                return []
+            node = child
+        
+        found: List[str] = []
+        seen: Set[str] = set()
+        for key_id in cls._walk(node):
+            if key_id not in seen:
+                seen.add(key_id)
+                found.append(key_id)
+                if len(found) >= limit:
+                    break
+        return found
+
+KeyCache.watch(KeySearch.apply)
@@ -0,0 +1,231 @@
+"""
+Заявки пользователей на ключи: хранение, одобрение и отклонение.
+"""
+import time
+import json
+import asyncio
+import logging
+from itertools import islice
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import Config, Messages
+from services.key_pool import KeyPool
+from services.expiry import ExpiryScheduler, format_deadline
+from storage.backends import Storage
+from utils.sender import MessageQueue
+
+logger = logging.getLogger(__name__)
+
+# Статусы заявки
+TICKET_OPEN = "open"
+TICKET_APPROVED = "approved"
+TICKET_DENIED = "denied"
+
+class Ticket:
+    """Одна заявка пользователя."""
+    
+    __slots__ = ("id", "user_id", "username", "text", "created", "status", "key_id", "resolved")
+    
+    def __init__(self, ticket_id: int, user_id: int, username: str, text: str, created: float):
+        self.id = ticket_id
+        self.user_id = user_id
+        self.username = username
+        self.text = text
+        self.created = created
+        self.status = TICKET_OPEN
+        self.key_id: Optional[str] = None
+        self.resolved: Optional[float] = None
+    
+    def dump(self) -> str:
+        """Сериализация для хранилища."""
+        return json.dumps({field: getattr(self, field) for field in self.__slots__}, ensure_ascii=False)
+    
+    @classmethod
+    def load(cls, raw: str) -> "Ticket":
+        """Восстановление заявки из хранилища."""
+        payload = json.loads(raw)
+        ticket = cls(payload["id"], payload["user_id"], payload["username"], payload["text"], payload["created"])
+        ticket.status = payload.get("status", TICKET_OPEN)
+        ticket.key_id = payload.get("key_id")
+        ticket.resolved = payload.get("resolved")
+        return ticket
+    
+    @property
+    def key_name(self) -> str:
+        """Имя ключа, создаваемого по заявке."""
+        return f"@{self.username}" if self.username else f"user{self.user_id}"
+
+class TicketStore:
+    """
+    Очередь заявок.
+    
+    Открытые заявки держатся в памяти в порядке поступления и
+    дублируются в хранилище; закрытые сохраняются с TICKETS_TTL для
+    истории и из памяти удаляются. Номера заявок выдает атомарный
+    счетчик хранилища.
+    """
+    
+    PREFIX = "ticket:"
+    SEQUENCE = "tickets:seq"
+    
+    _open: Dict[int, Ticket] = {}  # Открытые заявки по номеру, в порядке поступления
+    _busy: Set[int] = set()  # Заявки, по которым сейчас создается ключ
+    
+    @classmethod
+    async def _read_open(cls) -> Dict[int, Ticket]:
+        """Чтение открытых заявок из хранилища в порядке номеров."""
+        backend = Storage.get()
+        tickets = []
+        for name in await backend.keys(cls.PREFIX):
+            raw = await backend.get(name)
+            if raw is None:
+                continue
+            ticket = Ticket.load(raw)
+            if ticket.status == TICKET_OPEN:
+                tickets.append(ticket)
+        return {ticket.id: ticket for ticket in sorted(tickets, key=lambda ticket: ticket.id)}
+    
+    @classmethod
+    async def load(cls) -> None:
+        """Загрузка открытых заявок из хранилища при запуске."""
+        cls._open = await cls._read_open()
+        logger.info(f"Загружено открытых заявок: {len(cls._open)}")
+    
+    @classmethod
+    async def sync(cls) -> None:
+        """
+        Перечитывание открытых заявок перед показом администратору.
+        
+        В многопроцессном режиме заявки создают все процессы-обработчики,
+        а показывает и одобряет их процесс администратора, поэтому
+        список в памяти нужно обновить из общего хранилища.
+        """
+        if Config.BOT_WORKERS > 1:
+            cls._open = await cls._read_open()
+    
+    @classmethod
+    async def create(cls, user_id: int, username: str, text: str) -> Ticket:
+        """
+        Регистрация новой заявки.
+        
+        Args:
+            user_id (int): ID пользователя
+            username (str): Username пользователя (может быть пустым)
+            text (str): Текст заявки
+            
+        Returns:
+            Ticket: Созданная заявка
+        """
+        backend = Storage.get()
+        ticket = Ticket(await backend.incr(cls.SEQUENCE), user_id, username, text, time.time())
+        await backend.set(cls.PREFIX + str(ticket.id), ticket.dump())
+        if Config.BOT_WORKERS <= 1:
+            cls._open[ticket.id] = ticket  # Иначе заявку прочитает процесс администратора в sync()
+        return ticket
+    
+    @classmethod
+    def count(cls) -> int:
+        """Число открытых заявок."""
+        return len(cls._open)
+    
+    @classmethod
+    def page(cls, page: int) -> Tuple[List[Ticket], int, int]:
+        """
+        Страница открытых заявок (сначала старые).
+        
+        Args:
+            page (int): Номер страницы (с нуля)
+            
+        Returns:
+            Tuple[List[Ticket], int, int]: Заявки страницы, номер страницы после ограничения и число страниц
+        """
+        size = Config.TICKETS_PAGE_SIZE
+        pages = max(1, -(-len(cls._open) // size))
+        page = min(max(page, 0), pages - 1)
+        return list(islice(cls._open.values(), page * size, (page + 1) * size)), page, pages
+    
+    @classmethod
+    async def _close(cls, ticket: Ticket, status: str) -> None:
+        """Закрытие заявки с сохранением в историю."""
+        ticket.status = status
+        ticket.resolved = time.time()
+        cls._open.pop(ticket.id, None)
+        await Storage.get().set(cls.PREFIX + str(ticket.id), ticket.dump(), ttl=Config.TICKETS_TTL)
+    
+    @classmethod
+    async def approve(cls, ticket_id: int) -> Optional[bool]:
+        """
+        Одобрение заявки: создание ключа и отправка ссылки пользователю.
+        
+        Args:
+            ticket_id (int): Номер заявки
+            
+        Returns:
+            Optional[bool]: True — ключ выдан, False — ключ создать не удалось,
+                None — заявка уже закрыта или обрабатывается
+        """
+        ticket = cls._open.get(ticket_id)
+        if ticket is None or ticket_id in cls._busy:
+            return None
+        
+        cls._busy.add(ticket_id)
+        try:
+            key = await KeyPool.issue(None, ticket.key_name)
+            if not key:
+                return False
+            
+            ticket.key_id = key.id
+            text = Messages.TICKET_KEY_ISSUED.format(url=key.access_url)
+            if Config.TICKETS_KEY_DAYS > 0:
+                deadline = time.time() + Config.TICKETS_KEY_DAYS * 86400
+                await ExpiryScheduler.schedule(key.id, deadline, owner=ticket.user_id)
+                text += Messages.TICKET_KEY_EXPIRES.format(date=format_deadline(deadline))
+            MessageQueue.send(ticket.user_id, text)
+            await cls._close(ticket, TICKET_APPROVED)
+            logger.info(f"Заявка #{ticket_id} одобрена, ключ {key.id}")
+            return True
+        finally:
+            cls._busy.discard(ticket_id)
+    
+    @classmethod
+    async def deny(cls, ticket_id: int) -> bool:
+        """
+        Отклонение заявки с уведомлением пользователя.
+        
+        Args:
+            ticket_id (int): Номер заявки
+            
+        Returns:
+            bool: True, если заявка была открыта и отклонена
+        """
+        ticket = cls._open.get(ticket_id)
+        if ticket is None or ticket_id in cls._busy:
+            return False
+        MessageQueue.send(ticket.user_id, Messages.TICKET_DENIED_USER)
+        await cls._close(ticket, TICKET_DENIED)
+        return True
+    
+    @classmethod
+    async def approve_many(cls, ticket_ids: List[int]) -> Tuple[int, int]:
+        """
+        Пакетное одобрение заявок с ограничением параллельности.
+        
+        Args:
+            ticket_ids (List[int]): Номера заявок
+            
+        Returns:
+            Tuple[int, int]: Число одобренных заявок и число заявок, которые были открыты
+        """
+        semaphore = asyncio.Semaphore(Config.TICKETS_CONCURRENCY)
+        
+        async def approve(ticket_id: int) -> Optional[bool]:
+            async with semaphore:
+                return await cls.approve(ticket_id)
+        
+        results = await asyncio.gather(*(approve(ticket_id) for ticket_id in ticket_ids if ticket_id in cls._open))
+        return sum(1 for result in results if result), len(results)
+    
+    @classmethod
+    def open_ids(cls) -> List[int]:
+        """Номера всех открытых заявок."""
+        return list(cls._open)
@@ -0,0 +1,261 @@
+"""
+Сбор и хранение статистики трафика по ключам.
+"""
+import time
+import heapq
+import logging
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+
+from api.outline import OutlineAPI
+
+logger = logging.getLogger(__name__)
+
+class Tier:
+    """
+    Кольцевой буфер счетчиков одного разрешения для всех ключей.
+    
+    Данные лежат в одном массиве array('Q') построчно: строка ключа
+    занимает slots ячеек. Для каждой строки поддерживается сумма по
+    окну, поэтому запрос «сколько за окно» стоит O(1).
+    """
+    
+    def __init__(self, resolution: int, slots: int):
+        """
+        Args:
+            resolution (int): Длительность одной ячейки в секундах
+            slots (int): Число ячеек в окне
+        """
+        self.resolution = resolution
+        self.slots = slots
+        self.data = array('Q')
+        self.totals = array('Q')
+        self.bucket = int(time.time() // resolution)
+    
+    def grow(self) -> None:
+        """Добавление строки для нового ключа."""
+        self.data.extend([0] * self.slots)
+        self.totals.append(0)
+    
+    def clear_row(self, row: int) -> None:
+        """Обнуление строки удаленного ключа."""
+        start = row * self.slots
+        for index in range(start, start + self.slots):
+            self.data[index] = 0
+        self.totals[row] = 0
+    
+    def advance(self, now: float) -> None:
+        """Сдвиг окна к текущему времени с обнулением устаревших ячеек."""
+        bucket = int(now // self.resolution)
+        if bucket <= self.bucket:
+            return
+        
+        self.bucket, previous = bucket, self.bucket
+        rows = len(self.totals)
+        if bucket - previous >= self.slots:
+            # Окно устарело целиком
+            self.data = array('Q', bytes(8 * rows * self.slots))
+            self.totals = array('Q', bytes(8 * rows))
+            return
+        
+        zeros = array('Q', bytes(8 * rows))
+        for expired_bucket in range(previous + 1, bucket + 1):
+            slot = expired_bucket % self.slots
+            # Столбец ячейки у всех ключей берется срезом с шагом slots
+            column = self.data[slot::self.slots]
+            if not any(column):
+                continue
+            for row, amount in enumerate(column):
+                if amount:
+                    self.totals[row] -= amount
+            self.data[slot::self.slots] = zeros
+    
+    def add(self, row: int, amount: int) -> None:
+        """Учет трафика в текущей ячейке."""
+        self.data[row * self.slots + self.bucket % self.slots] += amount
+        self.totals[row] += amount
+
+class TrafficStore:
+    """Статистика трафика по ключам в нескольких разрешениях."""
+    
+    # Окна статистики: имя -> (длительность ячейки, число ячеек)
+    TIERS = {
+        "hour": (60, 60),
+        "day": (3600, 24),
+        "month": (86400, 30),
+    }
+    
+    def __init__(self):
+        self.tiers = {name: Tier(*params) for name, params in self.TIERS.items()}
+        self._rows: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._free: List[int] = []
+    
+    def _row(self, key_id: str) -> int:
+        """Номер строки ключа (создается при первом обращении)."""
+        row = self._rows.get(key_id)
+        if row is not None:
+            return row
+        if self._free:
+            row = self._free.pop()
+            self._ids[row] = key_id
+        else:
+            row = len(self._ids)
+            self._ids.append(key_id)
+            for tier in self.tiers.values():
+                tier.grow()
+        self._rows[key_id] = row
+        return row
+    
+    def record(self, deltas: Dict[str, int], now: Optional[float] = None) -> None:
+        """
+        Учет приращений трафика.
+        
+        Args:
+            deltas (Dict[str, int]): Байты по ID ключа с прошлого опроса
+            now (Optional[float]): Момент опроса
+        """
+        now = time.time() if now is None else now
+        for tier in self.tiers.values():
+            tier.advance(now)
+        for key_id, amount in deltas.items():
+            row = self._row(key_id)
+            for tier in self.tiers.values():
+                tier.add(row, amount)
+    
+    def seed(self, tier_name: str, amounts: Dict[str, int], now: Optional[float] = None) -> None:
+        """
+        Начальное заполнение одного окна (трафик, набранный до первого опроса).
+        
+        Args:
+            tier_name (str): Имя окна
+            amounts (Dict[str, int]): Байты по ID ключа
+            now (Optional[float]): Момент опроса
+        """
+        tier = self.tiers[tier_name]
+        tier.advance(time.time() if now is None else now)
+        for key_id, amount in amounts.items():
+            tier.add(self._row(key_id), amount)
+    
+    def remove(self, key_id: str) -> None:
+        """
+        Удаление статистики ключа.
+        
+        Args:
+            key_id (str): ID ключа
+        """
+        row = self._rows.pop(key_id, None)
+        if row is None:
+            return
+        for tier in self.tiers.values():
+            tier.clear_row(row)
+        self._ids[row] = None
+        self._free.append(row)
+    
+    def usage(self, key_id: str) -> Dict[str, int]:
+        """
+        Трафик ключа по всем окнам.
+        
+        Args:
+            key_id (str): ID ключа
+            
+        Returns:
+            Dict[str, int]: Байты по имени окна
+        """
+        row = self._rows.get(key_id)
+        return {name: tier.totals[row] if row is not None else 0 for name, tier in self.tiers.items()}
+    
+    def top(self, tier_name: str, limit: int) -> List[Tuple[str, int]]:
+        """
+        Ключи с наибольшим трафиком за окно.
+        
+        Args:
+            tier_name (str): Имя окна: hour, day или month
+            limit (int): Максимум ключей
+            
+        Returns:
+            List[Tuple[str, int]]: Пары (ID ключа, байты) по убыванию трафика
+        """
+        totals = self.tiers[tier_name].totals
+        # Строки удаленных ключей обнулены и отсекаются вместе с ключами без трафика
+        rows = heapq.nlargest(limit, range(len(totals)), key=totals.__getitem__)
+        return [(self._ids[row], totals[row]) for row in rows if totals[row]]
+
+class TrafficCollector:
+    """Периодический опрос metrics/transfer и расчет приращений."""
+    
+    store = TrafficStore()
+    _last: Dict[str, int] = {}  # Последние значения счетчиков Outline по ID ключа
+    _changed: Set[str] = set()  # Ключи с новым трафиком с прошлого take_changed()
+    
+    @classmethod
+    async def collect(cls) -> bool:
+        """
+        Один опрос всех серверов.
+        
+        Первое значение счетчика ключа служит точкой отсчета для
+        приращений. Счетчик Outline — трафик за последние 30 дней,
+        поэтому им заполняется окно «месяц»: после перезапуска расход
+        для лимитов не обнуляется. В окна «час» и «сутки» трафик до
+        запуска бота не попадает.
+        
+        Returns:
+            bool: True если получены данные хотя бы с одного сервера
+        """
+        counters = await OutlineAPI.get_transfer_metrics()
+        if counters is None:
+            return False
+        
+        deltas = {}
+        baselines = {}
+        for key_id, value in counters.items():
+            previous = cls._last.get(key_id)
+            cls._last[key_id] = value
+            if previous is None:
+                if value:
+                    baselines[key_id] = value
+            # Счетчик Outline может уменьшиться (окно 30 дней), такие интервалы не учитываем
+            elif value > previous:
+                deltas[key_id] = value - previous
+        
+        cls.store.record(deltas)
+        cls.store.seed("month", baselines)
+        cls._changed.update(deltas)
+        cls._changed.update(baselines)
+        return True
+    
+    @classmethod
+    def known(cls, key_id: str) -> bool:
+        """
+        Проверка, что счетчик ключа уже получен и расход за месяц известен.
+        
+        Args:
+            key_id (str): ID ключа
+            
+        Returns:
+            bool: True после первого опроса, вернувшего ключ
+        """
+        return key_id in cls._last
+    
+    @classmethod
+    def forget(cls, key_id: str) -> None:
+        """
+        Удаление статистики удаленного ключа.
+        
+        Args:
+            key_id (str): ID ключа
+        """
+        cls._last.pop(key_id, None)
+        cls._changed.discard(key_id)
+        cls.store.remove(key_id)
+
+    @classmethod
+    def take_changed(cls) -> Set[str]:
+        """
+        Ключи, трафик которых изменился с прошлого вызова.
+        
+        Returns:
+            Set[str]: ID ключей
+        """
+        changed, cls._changed = cls._changed, set()
+        return changed
@@ -0,0 +1,225 @@
+"""
+Многопроцессный режим: раздача обновлений процессам-обработчикам.
+"""
+import queue
+import socket
+import asyncio
+import logging
+import multiprocessing
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import TelegramObject, Update
+
+from config import Config
+from services.leader import LeaderLease
+from storage.backends import Storage
+from web.webhook import update_user_id
+
+logger = logging.getLogger(__name__)
+
+# Период ожидания в блокирующем чтении очереди, чтобы поток чтения не зависал при остановке
+POLL_TIMEOUT = 1.0
+
+class WorkerPool:
+    """
+    Процессы-обработчики приемного процесса.
+    
+    Обновления раскладываются по процессам по ID пользователя, поэтому
+    обновления одного пользователя всегда обрабатывает один процесс и
+    его кэш состояний FSM остается согласованным. Обновления
+    администратора направляются лидеру: там работают зеркало ключей,
+    статистика трафика и сроки действия, которые показывает админка.
+    Пока лидер неизвестен (или сразу после его смены) обновление может
+    попасть к другому процессу: лимиты и сроки, записанные им в
+    хранилище, лидер подхватывает сам (QuotaManager.sync, ExpiryScheduler.sync).
+    Упавший процесс перезапускается с новой очередью: убитый процесс
+    мог оставить захваченной блокировку чтения старой, а обновления,
+    оставшиеся в ней, теряются.
+    """
+    
+    def __init__(self, target: Callable[..., None], count: int, *args: Any):
+        """
+        Args:
+            target: Точка входа процесса: target(номер, число процессов, очередь, *args)
+            count (int): Число процессов
+            *args: Дополнительные аргументы точки входа (должны сериализоваться pickle)
+        """
+        self._context = multiprocessing.get_context("spawn")
+        self._target = target
+        self._args = args
+        self.count = count
+        self._queues = [self._context.Queue(Config.WORKER_QUEUE_SIZE) for _ in range(count)]
+        self._processes: List[Optional[multiprocessing.process.BaseProcess]] = [None] * count
+        self._leader: Optional[int] = None
+        self._watcher: Optional[asyncio.Task] = None
+    
+    def _spawn(self, index: int) -> None:
+        """Запуск процесса-обработчика с заданным номером."""
+        process = self._context.Process(
+            target=self._target,
+            args=(index, self.count, self._queues[index], *self._args),
+            name=f"worker-{index}"
+        )
+        process.start()
+        self._processes[index] = process
+        logger.info(f"Запущен обработчик {index} (pid {process.pid})")
+    
+    def start(self) -> None:
+        """Запуск всех процессов и наблюдения за ними."""
+        for index in range(self.count):
+            self._spawn(index)
+        self._watcher = asyncio.create_task(self._watch())
+    
+    def _leader_index(self, owner: Optional[str]) -> Optional[int]:
+        """Номер нашего процесса, владеющего арендой лидера."""
+        if not owner:
+            return None
+        host, pid, index = owner.rsplit(":", 2)
+        if host != socket.gethostname() or not index.isdigit() or int(index) >= self.count:
+            return None
+        process = self._processes[int(index)]
+        return int(index) if process and str(process.pid) == pid else None
+    
+    async def _watch(self) -> None:
+        """Перезапуск упавших процессов и отслеживание лидера."""
+        while True:
+            try:
+                for index, process in enumerate(self._processes):
+                    if process is not None and not process.is_alive():
+                        logger.error(f"Обработчик {index} завершился с кодом {process.exitcode}, перезапуск")
+                        self._queues[index] = self._context.Queue(Config.WORKER_QUEUE_SIZE)
+                        self._spawn(index)
+                self._leader = self._leader_index(await Storage.get().get(LeaderLease.KEY))
+            except Exception as e:
+                logger.error(f"Ошибка наблюдения за обработчиками: {str(e)}")
+            await asyncio.sleep(min(1.0, Config.LEADER_LEASE_TTL / 3))
+    
+    def worker_for(self, update: Update) -> int:
+        """
+        Номер процесса для обновления.
+        
+        Args:
+            update (Update): Обновление Telegram
+            
+        Returns:
+            int: Номер процесса-обработчика
+        """
+        user_id = update_user_id(update)
+        if user_id == Config.ADMIN_ID and self._leader is not None:
+            return self._leader
+        return (user_id or update.update_id) % self.count
+    
+    async def dispatch(self, update: Update) -> None:
+        """
+        Передача обновления процессу; при заполненной очереди ждет места,
+        не блокируя цикл событий.
+        
+        Args:
+            update (Update): Обновление Telegram
+        """
+        raw = update.model_dump(mode="json", exclude_unset=True)
+        target = self._queues[self.worker_for(update)]
+        try:
+            target.put_nowait(raw)
+        except queue.Full:
+            await asyncio.get_running_loop().run_in_executor(None, target.put, raw)
+    
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Остановка процессов: каждый дообрабатывает очередь и завершается.
+        
+        Args:
+            timeout (Optional[float]): Время ожидания завершения в секундах
+                (по умолчанию SHUTDOWN_TIMEOUT с запасом на закрытие сессий)
+        """
+        timeout = timeout or Config.SHUTDOWN_TIMEOUT + 10
+        if self._watcher:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+        
+        loop = asyncio.get_running_loop()
+        for target in self._queues:
+            await loop.run_in_executor(None, target.put, None)
+        for index, process in enumerate(self._processes):
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                logger.warning(f"Обработчик {index} не завершился за {timeout} с, принудительная остановка")
+                process.terminate()
+
+class ForwardMiddleware(BaseMiddleware):
+    """Внешний middleware приемного процесса: передает обновление обработчикам вместо обработки."""
+    
+    def __init__(self, pool: WorkerPool):
+        self.pool = pool
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        await self.pool.dispatch(event)
+
+def _read(updates: "multiprocessing.Queue") -> Any:
+    """Блокирующее чтение очереди с таймаутом (выполняется в потоке)."""
+    try:
+        return updates.get(timeout=POLL_TIMEOUT)
+    except queue.Empty:
+        return queue.Empty
+
+async def serve_updates(dp: Dispatcher, bot: Bot, updates: "multiprocessing.Queue") -> None:
+    """
+    Обработка обновлений из очереди приемного процесса до получения None.
+    
+    Обновления одного пользователя обрабатываются по порядку, разных —
+    параллельно в WEBHOOK_WORKERS потоках обработки. Очереди потоков
+    ограничены, поэтому при перегрузке чтение останавливается и
+    приемный процесс ждет места в очереди. После остановки принятые
+    обновления дообрабатываются в течение SHUTDOWN_TIMEOUT.
+    
+    Args:
+        dp (Dispatcher): Диспетчер с роутерами бота
+        bot (Bot): Экземпляр бота
+        updates: Очередь обновлений от приемного процесса
+    """
+    workers = max(1, Config.WEBHOOK_WORKERS)
+    lanes = [asyncio.Queue(maxsize=max(1, Config.WORKER_QUEUE_SIZE // workers)) for _ in range(workers)]
+    
+    async def lane_worker(lane: asyncio.Queue) -> None:
+        while True:
+            update = await lane.get()
+            try:
+                await dp.feed_update(bot, update)
+            except Exception as e:
+                logger.error(f"Ошибка обработки обновления {update.update_id}: {str(e)}")
+            finally:
+                lane.task_done()
+    
+    tasks = [asyncio.create_task(lane_worker(lane)) for lane in lanes]
+    loop = asyncio.get_running_loop()
+    parent = multiprocessing.parent_process()
+    try:
+        while True:
+            raw = await loop.run_in_executor(None, _read, updates)
+            if raw is queue.Empty:
+                if parent is not None and not parent.is_alive():
+                    logger.error("Приемный процесс завершился, остановка обработчика")
+                    break
+                continue
+            if raw is None:
+                break
+            update = Update.model_validate(raw, context={"bot": bot})
+            await lanes[update_user_id(update) % workers].put(update)
+        
+        try:
+            await asyncio.wait_for(asyncio.gather(*(lane.join() for lane in lanes)), Config.SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Не обработано обновлений при остановке: {sum(lane.qsize() for lane in lanes)}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
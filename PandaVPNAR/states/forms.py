@@ -8,9 +8,16 @@ class Form(StatesGroup):
     # Создание ключа
     CREATE_PORT = State()
     CREATE_NAME = State()
+    CREATE_EXPIRY = State()
     
     # Удаление ключа
     DELETE_CONFIRM = State()
     
+    # Лимит трафика ключа
+    QUOTA_INPUT = State()
+    
+    # Массовое создание ключей
+    BULK_INPUT = State()
+    
     # Запрос ключа обычным пользователем
     TICKET_REQUEST = State()
\ No newline at end of file
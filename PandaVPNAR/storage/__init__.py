@@ -0,0 +1,3 @@
+"""
+Пакет с хранилищами состояния бота.
+"""
\ No newline at end of file
@@ -0,0 +1,463 @@
+"""
+Хранилища ключ-значение с поддержкой TTL: в памяти, SQLite и Redis.
+"""
+import time
+import heapq
+import asyncio
+import logging
+import sqlite3
+import threading
+from typing import Dict, Optional, List, Tuple
+
+try:
+    from redis import asyncio as aioredis
+except ImportError:  # Redis необязателен
+    aioredis = None
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class Backend:
+    """Базовый интерфейс хранилища. Значения хранятся как строки."""
+    
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Получение значения.
+        
+        Args:
+            key (str): Ключ
+        
+        Returns:
+            Optional[str]: Значение или None, если ключа нет или он истек
+        """
+        raise NotImplementedError
+    
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """
+        Запись значения.
+        
+        Args:
+            key (str): Ключ
+            value (str): Значение
+            ttl (Optional[float]): Время жизни в секундах (None — бессрочно)
+        """
+        raise NotImplementedError
+    
+    async def delete(self, key: str) -> None:
+        """
+        Удаление значения.
+        
+        Args:
+            key (str): Ключ
+        """
+        raise NotImplementedError
+    
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """
+        Атомарное увеличение счетчика.
+        
+        TTL устанавливается только при создании счетчика.
+        
+        Args:
+            key (str): Ключ
+            amount (int): Величина приращения
+            ttl (Optional[float]): Время жизни нового счетчика в секундах
+        
+        Returns:
+            int: Новое значение счетчика
+        """
+        raise NotImplementedError
+    
+    async def set_many(self, items: Dict[str, str], ttl: Optional[float] = None) -> None:
+        """
+        Пакетная запись значений.
+        
+        Args:
+            items (Dict[str, str]): Значения по ключам
+            ttl (Optional[float]): Время жизни в секундах (None — бессрочно)
+        """
+        for key, value in items.items():
+            await self.set(key, value, ttl)
+    
+    async def delete_many(self, keys: List[str]) -> None:
+        """
+        Пакетное удаление значений.
+        
+        Args:
+            keys (List[str]): Ключи
+        """
+        for key in keys:
+            await self.delete(key)
+    
+    async def keys(self, prefix: str) -> List[str]:
+        """
+        Получение всех живых ключей с заданным префиксом.
+        
+        Args:
+            prefix (str): Префикс ключей
+        
+        Returns:
+            List[str]: Список ключей
+        """
+        raise NotImplementedError
+    
+    async def acquire(self, key: str, owner: str, ttl: float) -> bool:
+        """
+        Атомарный захват или продление аренды.
+        
+        Запись создается, если ее нет или она истекла, и продлевается,
+        если уже принадлежит owner.
+        
+        Args:
+            key (str): Ключ аренды
+            owner (str): Идентификатор претендента
+            ttl (float): Срок аренды в секундах
+            
+        Returns:
+            bool: True, если аренда принадлежит owner
+        """
+        raise NotImplementedError
+    
+    async def release(self, key: str, owner: str) -> None:
+        """
+        Освобождение аренды, если она принадлежит owner.
+        
+        Args:
+            key (str): Ключ аренды
+            owner (str): Идентификатор владельца
+        """
+        raise NotImplementedError
+    
+    async def close(self) -> None:
+        """Освобождение ресурсов хранилища."""
+
+class MemoryBackend(Backend):
+    """Хранилище в памяти процесса. Истекшие записи удаляются по куче сроков."""
+    
+    def __init__(self):
+        self._data: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._deadlines: List[Tuple[float, str]] = []
+    
+    def _purge(self) -> None:
+        """Удаление записей с истекшим сроком (амортизированно O(log n) на запись)."""
+        now = time.monotonic()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            expires_at, key = heapq.heappop(self._deadlines)
+            item = self._data.get(key)
+            if item and item[1] == expires_at:
+                del self._data[key]
+    
+    def _store(self, key: str, value: str, ttl: Optional[float]) -> None:
+        """Запись значения со сроком жизни."""
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._data[key] = (value, expires_at)
+        if expires_at is not None:
+            heapq.heappush(self._deadlines, (expires_at, key))
+    
+    async def get(self, key: str) -> Optional[str]:
+        self._purge()
+        item = self._data.get(key)
+        return item[0] if item else None
+    
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        self._purge()
+        self._store(key, value, ttl)
+    
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+    
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        self._purge()
+        item = self._data.get(key)
+        if item is None:
+            self._store(key, str(amount), ttl)
+            return amount
+        value = int(item[0]) + amount
+        self._data[key] = (str(value), item[1])
+        return value
+    
+    async def keys(self, prefix: str) -> List[str]:
+        self._purge()
+        return [key for key in self._data if key.startswith(prefix)]
+    
+    async def acquire(self, key: str, owner: str, ttl: float) -> bool:
+        self._purge()
+        item = self._data.get(key)
+        if item is not None and item[0] != owner:
+            return False
+        self._store(key, owner, ttl)
+        return True
+    
+    async def release(self, key: str, owner: str) -> None:
+        item = self._data.get(key)
+        if item is not None and item[0] == owner:
+            del self._data[key]
+
+class SQLiteBackend(Backend):
+    """
+    Хранилище в файле SQLite.
+    
+    Запросы выполняются в пуле потоков, чтобы не блокировать цикл событий.
+    Режим WAL позволяет использовать один файл из нескольких процессов.
+    """
+    
+    # Удаление истекших записей выполняется раз в PURGE_EVERY операций записи
+    PURGE_EVERY = 500
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Путь к файлу базы данных
+        """
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+    
+    async def _run(self, func, *args):
+        """Выполнение функции с соединением в отдельном потоке."""
+        def call():
+            with self._lock:
+                return func(*args)
+        return await asyncio.to_thread(call)
+    
+    def _maybe_purge(self, now: float) -> None:
+        """Периодическое удаление истекших записей."""
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._conn.execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+    
+    def _get(self, key: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+    
+    def _set(self, key: str, value: str, ttl: Optional[float]) -> None:
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, now + ttl if ttl else None)
+        )
+        self._maybe_purge(now)
+    
+    def _incr(self, key: str, amount: int, ttl: Optional[float]) -> int:
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM kv WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                value, expires_at = amount, (now + ttl if ttl else None)
+            else:
+                value, expires_at = int(row[0]) + amount, row[1]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, str(value), expires_at)
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._maybe_purge(now)
+        return value
+    
+    def _set_many(self, items: Dict[str, str], ttl: Optional[float]) -> None:
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                [(key, value, expires_at) for key, value in items.items()]
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._maybe_purge(now)
+    
+    def _delete_many(self, keys: List[str]) -> None:
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany("DELETE FROM kv WHERE key = ?", [(key,) for key in keys])
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+    
+    def _acquire(self, key: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, now)
+            ).fetchone()
+            acquired = row is None or row[0] == owner
+            if acquired:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, owner, now + ttl)
+                )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return acquired
+    
+    def _keys(self, prefix: str) -> List[str]:
+        rows = self._conn.execute(
+            "SELECT key FROM kv WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?)",
+            (prefix, prefix + "\U0010ffff", time.time())
+        ).fetchall()
+        return [row[0] for row in rows]
+    
+    async def get(self, key: str) -> Optional[str]:
+        return await self._run(self._get, key)
+    
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        await self._run(self._set, key, value, ttl)
+    
+    async def delete(self, key: str) -> None:
+        await self._run(self._conn.execute, "DELETE FROM kv WHERE key = ?", (key,))
+    
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        return await self._run(self._incr, key, amount, ttl)
+    
+    async def set_many(self, items: Dict[str, str], ttl: Optional[float] = None) -> None:
+        await self._run(self._set_many, items, ttl)
+    
+    async def delete_many(self, keys: List[str]) -> None:
+        await self._run(self._delete_many, keys)
+    
+    async def keys(self, prefix: str) -> List[str]:
+        return await self._run(self._keys, prefix)
+    
+    async def acquire(self, key: str, owner: str, ttl: float) -> bool:
+        return await self._run(self._acquire, key, owner, ttl)
+    
+    async def release(self, key: str, owner: str) -> None:
+        await self._run(self._conn.execute, "DELETE FROM kv WHERE key = ? AND value = ?", (key, owner))
+    
+    async def close(self) -> None:
+        await self._run(self._conn.close)
+
+class RedisBackend(Backend):
+    """Хранилище в Redis (или совместимом сервере). Требует пакет redis."""
+    
+    # Скрипты аренды: проверка владельца и запись выполняются атомарно
+    ACQUIRE_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current and current ~= ARGV[1] then return 0 end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+return 1
+"""
+    RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+    
+    def __init__(self, url: str):
+        """
+        Args:
+            url (str): URL подключения, например redis://localhost:6379/0
+        """
+        if aioredis is None:
+            raise RuntimeError("Для STORAGE_URL=redis://... установите пакет redis")
+        self._redis = aioredis.from_url(url, decode_responses=True)
+        self._acquire = self._redis.register_script(self.ACQUIRE_SCRIPT)
+        self._release = self._redis.register_script(self.RELEASE_SCRIPT)
+    
+    @staticmethod
+    def _ms(ttl: Optional[float]) -> Optional[int]:
+        """Перевод TTL в миллисекунды."""
+        return max(1, int(ttl * 1000)) if ttl else None
+    
+    async def get(self, key: str) -> Optional[str]:
+        return await self._redis.get(key)
+    
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        await self._redis.set(key, value, px=self._ms(ttl))
+    
+    async def delete(self, key: str) -> None:
+        await self._redis.delete(key)
+    
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            if ttl:
+                pipe.set(key, 0, px=self._ms(ttl), nx=True)
+            pipe.incrby(key, amount)
+            results = await pipe.execute()
+        return int(results[-1])
+    
+    async def set_many(self, items: Dict[str, str], ttl: Optional[float] = None) -> None:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(key, value, px=self._ms(ttl))
+            await pipe.execute()
+    
+    async def delete_many(self, keys: List[str]) -> None:
+        if keys:
+            await self._redis.delete(*keys)
+    
+    async def keys(self, prefix: str) -> List[str]:
+        return [key async for key in self._redis.scan_iter(match=f"{prefix}*")]
+    
+    async def acquire(self, key: str, owner: str, ttl: float) -> bool:
+        return bool(await self._acquire(keys=[key], args=[owner, self._ms(ttl)]))
+    
+    async def release(self, key: str, owner: str) -> None:
+        await self._release(keys=[key], args=[owner])
+    
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+def create_backend(url: str) -> Backend:
+    """
+    Создание хранилища по URL.
+    
+    Args:
+        url (str): memory://, sqlite:///путь/к/файлу.db или redis://хост:порт/база
+    
+    Returns:
+        Backend: Хранилище
+    """
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    if url and url != "memory://":
+        logger.warning(f"Неизвестный STORAGE_URL {url}, используется хранилище в памяти")
+    return MemoryBackend()
+
+class Storage:
+    """Общее хранилище бота, настраиваемое через STORAGE_URL."""
+    
+    _backend: Optional[Backend] = None
+    
+    @classmethod
+    def get(cls) -> Backend:
+        """
+        Получение общего хранилища (создается при первом обращении).
+        
+        Returns:
+            Backend: Хранилище
+        """
+        if cls._backend is None:
+            cls._backend = create_backend(Config.STORAGE_URL)
+        return cls._backend
+    
+    @classmethod
+    async def close(cls) -> None:
+        """Закрывает общее хранилище."""
+        if cls._backend is not None:
+            await cls._backend.close()
+            cls._backend = None
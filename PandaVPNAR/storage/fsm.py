@@ -0,0 +1,157 @@
+"""
+Хранилище состояний FSM поверх общего хранилища ключ-значение.
+"""
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Any, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey, StateType
+
+from storage.backends import Backend
+from utils.tasks import TaskSupervisor
+
+logger = logging.getLogger(__name__)
+
+# Запись FSM: (состояние, данные, момент последней записи)
+Record = Tuple[Optional[str], Dict[str, Any], float]
+
+class KVStorage(BaseStorage):
+    """
+    FSM-хранилище с горячим кэшем и отложенной пакетной записью.
+    
+    Чтение идет из ограниченного LRU-кэша, промахи загружаются из
+    хранилища. Изменения копятся в буфере и сбрасываются одним
+    пакетом раз в flush_interval секунд. Каждая запись живет ttl
+    секунд с последнего изменения, поэтому брошенные диалоги
+    удаляются сами.
+    """
+    
+    def __init__(self, backend: Backend, ttl: float, cache_size: int, flush_interval: float, prefix: str = "fsm"):
+        """
+        Args:
+            backend (Backend): Хранилище ключ-значение
+            ttl (float): Время жизни записи в секундах
+            cache_size (int): Максимум записей в горячем кэше
+            flush_interval (float): Период сброса изменений в секундах
+            prefix (str): Префикс ключей в хранилище
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.prefix = prefix
+        self._cache: "OrderedDict[str, Record]" = OrderedDict()
+        self._dirty: Dict[str, Optional[Record]] = {}  # None — запись удалена
+        self._flusher = f"fsm_flush:{prefix}"  # Имя фоновой задачи сброса
+    
+    def _key(self, key: StorageKey) -> str:
+        """Ключ записи в хранилище."""
+        return (
+            f"{self.prefix}:{key.bot_id}:{key.chat_id}:{key.user_id}:"
+            f"{key.thread_id or ''}:{key.business_connection_id or ''}:{key.destiny}"
+        )
+    
+    def _remember(self, name: str, record: Optional[Record]) -> None:
+        """Помещение записи в кэш с вытеснением самых старых."""
+        if record is None:
+            self._cache.pop(name, None)
+            return
+        self._cache[name] = record
+        self._cache.move_to_end(name)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+    
+    async def _load(self, key: StorageKey) -> Record:
+        """Чтение записи из буфера, кэша или хранилища."""
+        name = self._key(key)
+        now = time.time()
+        
+        if name in self._dirty:
+            record = self._dirty[name]
+        elif name in self._cache:
+            record = self._cache[name]
+            self._cache.move_to_end(name)
+        else:
+            raw = await self.backend.get(name)
+            if raw is None:
+                return None, {}, now
+            payload = json.loads(raw)
+            record = (payload.get("state"), payload.get("data", {}), payload.get("ts", now))
+            self._remember(name, record)
+        
+        if record is None or now - record[2] > self.ttl:
+            return None, {}, now
+        return record
+    
+    def _store(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]) -> None:
+        """Изменение записи с отложенной записью в хранилище."""
+        name = self._key(key)
+        record = (state, data, time.time()) if state is not None or data else None
+        self._dirty[name] = record
+        self._remember(name, record)
+        self._ensure_flusher()
+    
+    def _ensure_flusher(self) -> None:
+        """Запуск фонового сброса изменений, если он еще не запущен."""
+        if not TaskSupervisor.running(self._flusher):
+            TaskSupervisor.spawn(self._flusher, self._flush_loop)
+    
+    async def _flush_loop(self) -> None:
+        """Периодический сброс буфера изменений (работает до закрытия хранилища)."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if not self._dirty:
+                continue
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка записи состояний FSM: {str(e)}")
+    
+    async def flush(self) -> None:
+        """Пакетная запись накопленных изменений в хранилище."""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        
+        items = {
+            name: json.dumps({"state": record[0], "data": record[1], "ts": record[2]}, ensure_ascii=False)
+            for name, record in dirty.items() if record is not None
+        }
+        removed = [name for name, record in dirty.items() if record is None]
+        try:
+            if items:
+                await self.backend.set_many(items, ttl=self.ttl)
+            if removed:
+                await self.backend.delete_many(removed)
+        except Exception:
+            # Возвращаем изменения в буфер, не затирая более новые
+            for name, record in dirty.items():
+                self._dirty.setdefault(name, record)
+            raise
+    
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        _, data, _ = await self._load(key)
+        self._store(key, state.state if isinstance(state, State) else state, data)
+    
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _, _ = await self._load(key)
+        return state
+    
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        state, _, _ = await self._load(key)
+        self._store(key, state, data.copy())
+    
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data, _ = await self._load(key)
+        return data.copy()
+    
+    async def close(self) -> None:
+        await TaskSupervisor.cancel(self._flusher)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Не удалось сохранить состояния FSM при остановке: {str(e)}")
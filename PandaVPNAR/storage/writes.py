@@ -0,0 +1,51 @@
+"""
+Учет собственных изменений записей при подхвате изменений других процессов.
+"""
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+class LocalWrites:
+    """
+    Счетчик изменений записей, которые процесс вносит сам.
+    
+    Лидер периодически перечитывает записи из хранилища, чтобы подхватить
+    изменения других процессов. Прочитанный снимок применяется, только
+    если за время чтения процесс ничего не менял сам: иначе снимок мог
+    устареть и затереть новое значение, поэтому подхват откладывается
+    до следующего прохода.
+    """
+    
+    def __init__(self):
+        self._active = 0  # Изменения, еще не записанные в хранилище
+        self._done = 0  # Завершенные изменения
+    
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        """Изменение записи в памяти и в хранилище."""
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._done += 1
+    
+    def mark(self) -> Optional[int]:
+        """
+        Отметка перед чтением снимка.
+        
+        Returns:
+            Optional[int]: Число завершенных изменений или None, если изменение идет сейчас
+        """
+        return None if self._active else self._done
+    
+    def unchanged(self, mark: Optional[int]) -> bool:
+        """
+        Проверка, что с отметки процесс ничего не менял и снимок можно применить.
+        
+        Args:
+            mark (Optional[int]): Результат mark() перед чтением
+        
+        Returns:
+            bool: True, если снимок актуален
+        """
+        return mark is not None and not self._active and self._done == mark
@@ -0,0 +1,62 @@
+"""
+Общие фикстуры тестов: окружение, хранилище в памяти и имитатор Outline.
+
+Запуск (из каталога PandaVPNAR):
+    python -m pytest -q tests
+"""
+import os
+import sys
+import contextlib
+
+# Конфигурация читается при импорте, поэтому окружение задается до импорта модулей бота
+os.environ.update({
+    "OUTLINE_API_URL": "http://127.0.0.1:9/test",
+    "OUTLINE_API_TOKEN": "test",
+    "OUTLINE_SERVERS": "",
+    "TELEGRAM_TOKEN": "123456:test",
+    "ADMIN_ID": "1",
+    "STORAGE_URL": "memory://",
+    "OUTLINE_RETRIES": "0",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from config import Config
+from api.cache import KeyCache
+from api.servers import ServerPool
+from bench.fake_outline import FakeOutline
+from storage.backends import Storage
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    """Пустые зеркало ключей и хранилище для каждого теста."""
+    Storage._backend = None
+    KeyCache._keys = {}
+    KeyCache._updated_at = 0.0
+    yield
+    Storage._backend = None
+    KeyCache._keys = {}
+    KeyCache._updated_at = 0.0
+
+@pytest.fixture
+def outline(monkeypatch):
+    """
+    Фабрика имитатора Outline: async with outline(keys=...) as fake.
+    
+    Имитатор запускается в цикле событий теста, реестр серверов
+    указывает на него, сессии закрываются при выходе.
+    """
+    @contextlib.asynccontextmanager
+    async def start(keys: int = 0):
+        fake = FakeOutline(keys=keys)
+        monkeypatch.setattr(Config, "OUTLINE_API_URL", await fake.start())
+        ServerPool._servers = {}
+        try:
+            yield fake
+        finally:
+            await ServerPool.close()
+            ServerPool._servers = {}
+            await fake.stop()
+    
+    return start
@@ -0,0 +1,121 @@
+"""
+Разбор срока действия ключа и планировщик истечения.
+"""
+import time
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from config import Config, Messages
+from services.expiry import ExpiryScheduler, parse_expiry, format_deadline
+from utils.tasks import TaskSupervisor
+
+NOW = datetime(2026, 1, 1).timestamp()
+
+def test_parse_days_and_unlimited():
+    assert parse_expiry("0", now=NOW) is None
+    assert parse_expiry(" 30 ", now=NOW) == NOW + 30 * 86400
+    assert parse_expiry(str(Config.EXPIRY_MAX_DAYS), now=NOW) == NOW + Config.EXPIRY_MAX_DAYS * 86400
+
+def test_parse_date_lasts_until_end_of_day():
+    assert parse_expiry("15.01.2026", now=NOW) == datetime(2026, 1, 16).timestamp()
+
+@pytest.mark.parametrize("text", [
+    str(Config.EXPIRY_MAX_DAYS + 1),
+    "99999999999999999999",
+    "31.12.9999",
+    "01.01.2100",
+    "31.12.2025",
+    "-5",
+    "завтра",
+])
+def test_parse_rejects_invalid_and_huge(text):
+    with pytest.raises(ValueError):
+        parse_expiry(text, now=NOW)
+
+def test_longest_accepted_deadline_formats():
+    deadline = parse_expiry(str(Config.EXPIRY_MAX_DAYS))
+    assert format_deadline(deadline)
+
+def test_start_is_idempotent():
+    async def scenario():
+        await ExpiryScheduler.schedule("main:1", time.time() + 3600)
+        await ExpiryScheduler.start()
+        worker = TaskSupervisor._tasks[ExpiryScheduler.TASK]
+        await ExpiryScheduler.start()
+        assert TaskSupervisor._tasks[ExpiryScheduler.TASK] is worker
+        assert len([event for event in ExpiryScheduler._heap if event[1] == "main:1"]) == 2  # Уведомление и удаление
+        await ExpiryScheduler.stop()
+    
+    ExpiryScheduler._records, ExpiryScheduler._heap = {}, []
+    try:
+        asyncio.run(scenario())
+    finally:
+        ExpiryScheduler._records, ExpiryScheduler._heap, ExpiryScheduler._wakeup = {}, [], None
+
+def test_leader_picks_up_expiry_written_by_other_processes(monkeypatch):
+    monkeypatch.setattr(Config, "BOT_WORKERS", 2)
+    monkeypatch.setattr(Config, "EXPIRY_SYNC_INTERVAL", 0.05)
+    deadline = time.time() + 3600
+    
+    async def scenario():
+        from storage.backends import Storage
+        from services.expiry import ExpiryRecord
+        
+        await ExpiryScheduler.schedule("main:1", deadline)
+        await ExpiryScheduler.start()
+        # Другой процесс назначил срок main:2 и отменил срок main:1
+        await Storage.get().set(ExpiryScheduler.PREFIX + "main:2", ExpiryRecord(deadline, owner=7).dump())
+        await Storage.get().delete(ExpiryScheduler.PREFIX + "main:1")
+        await asyncio.sleep(0.2)
+        assert ExpiryScheduler.get("main:1") is None
+        assert ExpiryScheduler.get("main:2") == deadline
+        assert ExpiryScheduler._records["main:2"].owner == 7
+        assert await ExpiryScheduler.sync() == 0
+        await ExpiryScheduler.stop()
+    
+    ExpiryScheduler._records, ExpiryScheduler._heap = {}, []
+    try:
+        asyncio.run(scenario())
+    finally:
+        ExpiryScheduler._records, ExpiryScheduler._heap, ExpiryScheduler._wakeup = {}, [], None
+
+def test_huge_expiry_creates_no_key(outline):
+    from aiogram import Bot
+    from bench.feeder import FakeSession, UpdateFactory
+    from bot import create_dispatcher
+    
+    async def scenario():
+        async with outline() as fake:
+            session = FakeSession()
+            bot = Bot(token=Config.TELEGRAM_TOKEN, session=session)
+            dp = create_dispatcher(bot)
+            updates = UpdateFactory()
+            answers = []
+            make_request = session.make_request
+            
+            async def record(bot, method, timeout=None):
+                answers.append(getattr(method, "text", None))
+                return await make_request(bot, method, timeout)
+            
+            session.make_request = record
+            try:
+                await dp.feed_update(bot, updates.callback(Config.ADMIN_ID, "create_key"))
+                await dp.feed_update(bot, updates.message(Config.ADMIN_ID, "443"))
+                await dp.feed_update(bot, updates.message(Config.ADMIN_ID, "laptop"))
+                await dp.feed_update(bot, updates.message(Config.ADMIN_ID, "99999999999"))
+                assert fake.keys == {}
+                assert answers[-1] == Messages.EXPIRY_INVALID.format(max_days=Config.EXPIRY_MAX_DAYS)
+                
+                await dp.feed_update(bot, updates.message(Config.ADMIN_ID, "30"))
+                assert [key["name"] for key in fake.keys.values()] == ["laptop"]
+                assert ExpiryScheduler.get(f"main:{next(iter(fake.keys))}") is not None
+            finally:
+                await dp.storage.close()
+    
+    ExpiryScheduler._records, ExpiryScheduler._heap = {}, []
+    try:
+        asyncio.run(scenario())
+    finally:
+        ExpiryScheduler._records, ExpiryScheduler._heap, ExpiryScheduler._wakeup = {}, [], None
@@ -0,0 +1,175 @@
+"""
+Резерв ключей: опознание ключей резерва, сверка, захват и выдача.
+"""
+import json
+import asyncio
+
+import pytest
+
+from config import Config
+from api.cache import KeyCache, is_pool_key, pool_key_name
+from api.models import AccessKey
+from api.outline import OutlineAPI
+from services.key_pool import KeyPool
+from storage.backends import Storage
+
+@pytest.fixture(autouse=True)
+def empty_pool():
+    KeyPool._keys = {}
+    yield
+    KeyPool._keys = {}
+
+def make_key(name: str) -> AccessKey:
+    return AccessKey.from_api({"id": "1", "name": name, "port": 443, "method": "m", "password": "p", "accessUrl": ""}, "main")
+
+def test_is_pool_key_requires_full_marker():
+    assert is_pool_key(make_key(pool_key_name("0" * 32)))
+    assert not is_pool_key(make_key("pool-party-laptop"))
+    assert not is_pool_key(make_key("pool-0123456789ab"))
+    assert not is_pool_key(make_key(pool_key_name("0" * 32) + "x"))
+
+def test_user_keys_named_like_pool_are_kept(outline, monkeypatch):
+    monkeypatch.setattr(Config, "KEY_POOL_SIZE", 0)
+    
+    async def scenario():
+        async with outline() as fake:
+            fake._add("pool-party-laptop", 443)
+            fake._add(pool_key_name("a" * 32), 443)  # Имя резерва, но резерв его не создавал
+            await KeyPool.reconcile()
+            await KeyPool.maintain()
+            assert KeyPool.size() == 0
+            assert len(fake.keys) == 2
+            
+            await OutlineAPI.refresh_keys()
+            assert [key.name for key in KeyCache.all()] == ["pool-party-laptop"]
+    
+    asyncio.run(scenario())
+
+def test_maintain_fills_and_issue_renames(outline, monkeypatch):
+    monkeypatch.setattr(Config, "KEY_POOL_SIZE", 3)
+    monkeypatch.setattr(Config, "KEY_POOL_MIN", 1)
+    
+    async def scenario():
+        async with outline() as fake:
+            await KeyPool.reconcile()
+            await KeyPool.maintain()
+            assert KeyPool.size() == 3
+            assert all(is_pool_key(make_key(key["name"])) for key in fake.keys.values())
+            
+            key = await KeyPool.issue(None, "alice")
+            assert key.name == "alice"
+            assert fake.keys[key.id.rpartition(":")[2]]["name"] == "alice"
+            assert KeyPool.size() == 2
+            assert KeyCache.get(key.id) is not None
+            # Захват снят после выдачи
+            assert await Storage.get().get(KeyPool.CLAIM_PREFIX + key.id) is None
+            assert await Storage.get().get(KeyPool.PREFIX + key.id) is None
+    
+    asyncio.run(scenario())
+
+def test_remove_skips_key_claimed_in_same_process(outline, monkeypatch):
+    monkeypatch.setattr(Config, "KEY_POOL_SIZE", 1)
+    
+    async def scenario():
+        async with outline() as fake:
+            await KeyPool.maintain()
+            (key_id,) = KeyPool._keys
+            key, token = await KeyPool._claim(None)
+            # Выдача еще переименовывает ключ: удаление лишних его не получает
+            KeyPool._keys[key_id] = key
+            assert not await KeyPool._remove(key_id)
+            assert len(fake.keys) == 1
+            await Storage.get().release(KeyPool.CLAIM_PREFIX + key_id, token)
+    
+    asyncio.run(scenario())
+
+def test_failed_rename_returns_key_to_pool(outline, monkeypatch):
+    monkeypatch.setattr(Config, "KEY_POOL_SIZE", 1)
+    
+    async def scenario():
+        async with outline() as fake:
+            await KeyPool.maintain()
+            (pool_id,) = KeyPool._keys
+            
+            async def rename_fails(key_id, name):
+                return False
+            
+            monkeypatch.setattr(OutlineAPI, "rename_key", rename_fails)
+            key = await KeyPool.issue(None, "bob")
+            assert key.id != pool_id and key.name == "bob"
+            assert list(KeyPool._keys) == [pool_id]
+            assert await Storage.get().get(KeyPool.PREFIX + pool_id) is not None
+            assert await Storage.get().get(KeyPool.CLAIM_PREFIX + pool_id) is None
+            assert len(fake.keys) == 2
+    
+    asyncio.run(scenario())
+
+def test_reconcile_adopts_only_pending_names(outline, monkeypatch):
+    monkeypatch.setattr(Config, "KEY_POOL_SIZE", 5)
+    
+    async def scenario():
+        async with outline() as fake:
+            backend = Storage.get()
+            # Имя записано, ключ создан, но запись о ключе не сохранена (аварийная остановка)
+            crashed = pool_key_name("b" * 32)
+            await backend.set(KeyPool.PENDING_PREFIX + crashed, "")
+            adopted = fake._add(crashed, 443)
+            # Запись о ключе, которого на сервере уже нет
+            await backend.set(KeyPool.PREFIX + "main:404", json.dumps(make_key(pool_key_name("c" * 32)).replace(id="main:404").to_dict()))
+            # Неудавшееся создание: имя записано, ключа нет
+            await backend.set(KeyPool.PENDING_PREFIX + pool_key_name("d" * 32), "")
+            
+            await KeyPool.reconcile()
+            assert list(KeyPool._keys) == [f"main:{adopted['id']}"]
+            assert await backend.get(KeyPool.PREFIX + "main:404") is None
+            assert await backend.keys(KeyPool.PENDING_PREFIX) == []
+    
+    asyncio.run(scenario())
+
+def test_pool_job_not_started_when_disabled(monkeypatch):
+    import bot
+    from utils.tasks import TaskSupervisor
+    
+    spawned = []
+    monkeypatch.setattr(Config, "KEY_POOL_SIZE", 0)
+    monkeypatch.setattr(TaskSupervisor, "spawn", classmethod(lambda cls, name, factory, *args, **kwargs: spawned.append(name)))
+    
+    async def nothing():
+        return None
+    
+    monkeypatch.setattr(bot.QuotaManager, "load", nothing)
+    monkeypatch.setattr(bot.ExpiryScheduler, "start", nothing)
+    asyncio.run(bot.start_leader_jobs())
+    assert "key_pool" not in spawned
+
+def test_concurrent_claims_issue_key_once(outline, monkeypatch):
+    monkeypatch.setattr(Config, "KEY_POOL_SIZE", 1)
+    
+    async def scenario():
+        async with outline() as fake:
+            await KeyPool.maintain()
+            stale = dict(KeyPool._keys)
+            (pool_id,) = stale
+            
+            # Каждый «процесс» видит устаревший список резерва, в котором ключ еще есть
+            async def stale_sync(force=False):
+                KeyPool._keys = dict(stale)
+            
+            monkeypatch.setattr(KeyPool, "sync", stale_sync)
+            rename = OutlineAPI.rename_key
+            
+            async def slow_rename(key_id, name):
+                await asyncio.sleep(0.01)
+                return await rename(key_id, name)
+            
+            monkeypatch.setattr(OutlineAPI, "rename_key", slow_rename)
+            first, second = await asyncio.gather(KeyPool.issue(None, "alice"), KeyPool.issue(None, "bob"))
+            # Выдача после освобождения захвата первой тоже не получает ключ повторно
+            third = await KeyPool.issue(None, "carol")
+            
+            issued = [key for key in (first, second, third) if key.id == pool_id]
+            assert len(issued) == 1
+            assert len({first.id, second.id, third.id}) == 3
+            assert sorted(key["name"] for key in fake.keys.values()) == ["alice", "bob", "carol"]
+    
+    asyncio.run(scenario())
@@ -0,0 +1,66 @@
+"""
+Инкрементальная синхронизация ключей и пометка изменений вне бота.
+"""
+import asyncio
+
+import pytest
+
+from api.cache import KeyCache
+from api.outline import OutlineAPI
+from services.key_sync import KeySync, CHANGE_ADDED, CHANGE_REMOVED, CHANGE_RENAMED
+
+@pytest.fixture(autouse=True)
+def empty_sync():
+    def reset():
+        KeySync._snapshots = {}
+        KeySync._fingerprints = {}
+        KeySync._listeners = []
+        KeySync._recent.clear()
+        OutlineAPI._writes = {}
+    
+    reset()
+    yield
+    reset()
+
+def origins(changes):
+    return {(change.kind, change.name): change.external for change in changes}
+
+def test_external_flag_ignores_mirror_reload(outline):
+    async def scenario():
+        async with outline(keys=4) as fake:
+            published = []
+            
+            async def listener(changes):
+                published.extend(changes)
+            
+            KeySync.subscribe(listener)
+            assert await KeySync.sync()
+            assert len(KeyCache.all()) == 4 and published == []
+            
+            await OutlineAPI.delete_key("main:0")
+            del fake.keys["1"]  # Удален в Outline Manager
+            fake._body = None
+            await OutlineAPI.rename_key("main:2", "renamed-by-bot")
+            fake.keys["3"]["name"] = "renamed-outside"
+            await OutlineAPI.create_key(None, "created-by-bot")
+            fake._add("created-outside", 443)
+            # Запрос пользователя перезагружает зеркало до фоновой синхронизации
+            await OutlineAPI.refresh_keys()
+            
+            assert await KeySync.sync()
+            assert origins(published) == {
+                (CHANGE_REMOVED, "key-000000"): False,
+                (CHANGE_REMOVED, "key-000001"): True,
+                (CHANGE_RENAMED, "renamed-by-bot"): False,
+                (CHANGE_RENAMED, "renamed-outside"): True,
+                (CHANGE_ADDED, "created-by-bot"): False,
+                (CHANGE_ADDED, "created-outside"): True,
+            }
+            assert OutlineAPI.writes("main") == {}
+            
+            # Неизмененный список: событий нет
+            published.clear()
+            assert await KeySync.sync()
+            assert published == []
+    
+    asyncio.run(scenario())
@@ -0,0 +1,36 @@
+"""
+Аренда лидерства: запуск фоновых задач лидера и продление аренды.
+"""
+import asyncio
+
+import bot
+from config import Config
+from services.leader import LeaderLease
+from utils.tasks import TaskSupervisor
+
+def test_slow_leader_jobs_do_not_block_renewal(monkeypatch):
+    monkeypatch.setattr(Config, "LEADER_LEASE_TTL", 0.3)
+    
+    async def slow_start():
+        await asyncio.Event().wait()  # Загрузка лимитов и сроков из большого хранилища
+    
+    monkeypatch.setattr(bot, "start_leader_jobs", slow_start)
+    
+    async def scenario():
+        LeaderLease.start("host:1:0", bot.spawn_leader_jobs, bot.stop_leader_jobs)
+        await asyncio.sleep(0.05)
+        assert LeaderLease.is_leader()
+        renewed = LeaderLease._renewed
+        
+        # Задачи лидера еще запускаются, а аренда уже продлена
+        await asyncio.sleep(0.2)
+        assert not TaskSupervisor._tasks["leader_jobs"].done()
+        assert TaskSupervisor.running(LeaderLease.TASK)
+        assert LeaderLease._renewed > renewed
+        
+        await LeaderLease.stop()
+        assert "leader_jobs" not in TaskSupervisor._tasks
+        assert not TaskSupervisor.running(LeaderLease.TASK)
+        assert not LeaderLease.is_leader()
+    
+    asyncio.run(scenario())
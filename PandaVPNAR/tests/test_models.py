@@ -0,0 +1,60 @@
+"""
+Модель ключа и разбор списка ключей Outline.
+"""
+import json
+
+import pytest
+
+import api.models
+from api.models import AccessKey, parse_keys, _iter_array
+
+BODY = json.dumps({
+    "accessKeys": [
+        {"id": "0", "name": "alice \"laptop\"", "password": "p", "port": 443, "method": "chacha20-ietf-poly1305",
+         "accessUrl": "ss://a", "dataLimit": {"bytes": 1024}},
+        {"id": "1", "name": "Борис", "password": "q", "port": 8443, "method": "chacha20-ietf-poly1305", "accessUrl": "ss://b"},
+        {"id": "2", "password": "r", "port": 443, "method": "aes-192-gcm", "accessUrl": "ss://c", "extra": [1, {"x": "]"}]},
+    ],
+    "other": {"accessKeys": "не массив"},
+}, ensure_ascii=False, indent=1).encode()
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def parser(request, monkeypatch):
+    """Разбор с orjson и поэлементный разбор без него."""
+    if request.param == "orjson":
+        if api.models.orjson is None:
+            pytest.skip("orjson не установлен")
+    else:
+        monkeypatch.setattr(api.models, "orjson", None)
+    return parse_keys
+
+def test_parse_keys(parser):
+    keys = parser(BODY, "main")
+    assert [key.id for key in keys] == ["main:0", "main:1", "main:2"]
+    assert keys[0].name == "alice \"laptop\"" and keys[0].data_limit == 1024
+    assert keys[1].name == "Борис" and keys[1].port == 8443 and keys[1].data_limit is None
+    assert keys[2].name == "" and keys[2].method == "aes-192-gcm"
+    # Повторяющиеся строки хранятся в одном экземпляре
+    assert keys[0].method is keys[1].method and keys[0].server is keys[2].server
+
+def test_parse_empty_and_missing(parser):
+    assert parser(b'{"accessKeys": []}', "main") == []
+    assert parser(b'{}', "main") == []
+
+def test_iter_array_matches_json():
+    items = list(_iter_array(BODY.decode(), "accessKeys"))
+    assert items == json.loads(BODY)["accessKeys"]
+    assert list(_iter_array(' { "a" : 1 , "k" : [ 1 , 2 ] } ', "k")) == [1, 2]
+
+@pytest.mark.parametrize("text", ['[]', '{"accessKeys": [{"id": "0"}', '{"accessKeys" [1]}', '{"accessKeys": [{"id": }]}'])
+def test_iter_array_rejects_malformed(text):
+    with pytest.raises(ValueError):
+        list(_iter_array(text, "accessKeys"))
+
+def test_access_key_round_trip():
+    (key,) = parse_keys(b'{"accessKeys": [{"id": "7", "name": "n", "port": 1, "method": "m", "password": "p", "accessUrl": "u", "dataLimit": {"bytes": 5}}]}', "eu")
+    assert AccessKey.from_dict(key.to_dict()) == key
+    renamed = key.replace(name="other")
+    assert renamed != key and renamed.name == "other" and key.name == "n"
+    with pytest.raises(TypeError):
+        hash(key)
@@ -0,0 +1,112 @@
+"""
+Лимиты трафика: проверка состояний и перезапуск бота.
+"""
+import json
+import asyncio
+
+import pytest
+
+from services.quota import QuotaManager, QUOTA_BLOCKED, parse_quota
+from services.traffic import TrafficStore, TrafficCollector
+from storage.backends import Storage
+
+@pytest.fixture(autouse=True)
+def empty_quotas():
+    def reset():
+        QuotaManager._limits = {}
+        QuotaManager._states = {}
+        QuotaManager._dirty = set()
+        QuotaManager._pending = {}
+        TrafficCollector.store = TrafficStore()
+        TrafficCollector._last = {}
+        TrafficCollector._changed = set()
+    
+    reset()
+    yield
+    reset()
+
+async def restart_with_block(limit: int) -> None:
+    """Запись заблокированного ключа в хранилище и загрузка лимитов, как при запуске."""
+    await Storage.get().set(QuotaManager.PREFIX + "main:0", json.dumps({"limit": limit, "state": QUOTA_BLOCKED}))
+    await QuotaManager.load()
+
+def test_block_survives_restart_until_usage_known(outline):
+    async def scenario():
+        async with outline(keys=1) as fake:
+            fake.transfer = {"0": 10_000}
+            await restart_with_block(limit=5_000)
+            
+            # Счетчики еще не получены: блокировка не снимается
+            assert await QuotaManager.evaluate() == 0
+            assert QuotaManager.is_blocked("main:0")
+            assert QuotaManager._pending == {}
+            
+            # Счетчик Outline за 30 дней выше лимита: ключ остается заблокированным
+            await TrafficCollector.collect()
+            assert await QuotaManager.evaluate() == 0
+            assert QuotaManager.is_blocked("main:0")
+            assert QuotaManager._pending == {}
+    
+    asyncio.run(scenario())
+
+def test_block_lifted_when_known_usage_below_limit(outline):
+    async def scenario():
+        async with outline(keys=1) as fake:
+            fake.transfer = {"0": 0}
+            await restart_with_block(limit=10 ** 9)
+            await TrafficCollector.collect()
+            assert await QuotaManager.evaluate() == 1
+            assert not QuotaManager.is_blocked("main:0")
+            assert QuotaManager._pending == {"main:0": None}
+            assert await QuotaManager.flush() == 0
+    
+    asyncio.run(scenario())
+
+def test_limit_blocks_and_warns():
+    async def scenario():
+        TrafficCollector._last = {"main:1": 0, "main:2": 0}
+        TrafficCollector.store.record({"main:1": 900, "main:2": 100})
+        await QuotaManager.set_limit("main:1", 1000)
+        await QuotaManager.set_limit("main:2", 1000)
+        assert await QuotaManager.evaluate() == 1
+        assert QuotaManager._states == {"main:1": "warned"}
+        
+        TrafficCollector.store.record({"main:1": 100})
+        TrafficCollector._changed.add("main:1")
+        assert await QuotaManager.evaluate() == 1
+        assert QuotaManager.is_blocked("main:1")
+        assert QuotaManager._pending == {"main:1": 0}
+    
+    asyncio.run(scenario())
+
+def test_sync_picks_up_limits_written_by_other_processes():
+    async def scenario():
+        backend = Storage.get()
+        await QuotaManager.set_limit("main:1", 1000)
+        QuotaManager._limits["main:3"] = 10
+        QuotaManager._states["main:3"] = QUOTA_BLOCKED
+        # Другой процесс изменил лимит main:1, назначил main:2 и снял лимит main:3
+        await backend.set(QuotaManager.PREFIX + "main:1", json.dumps({"limit": 2000, "state": "ok"}))
+        await backend.set(QuotaManager.PREFIX + "main:2", json.dumps({"limit": 500, "state": "ok"}))
+        
+        # Пока идет собственное изменение, снимок не применяется
+        with QuotaManager._writes.write():
+            assert await QuotaManager.sync() == 0
+        
+        assert await QuotaManager.sync() == 3
+        assert QuotaManager._limits == {"main:1": 2000, "main:2": 500}
+        assert QuotaManager._dirty >= {"main:1", "main:2"}
+        assert QuotaManager._pending == {"main:3": None}
+        assert await QuotaManager.sync() == 0
+    
+    asyncio.run(scenario())
+
+def test_parse_quota():
+    assert parse_quota("0") is None
+    assert parse_quota("1,5") == 3 * 1024 ** 3 // 2
+    assert parse_quota(" 10 ") == 10 * 1024 ** 3
+
+@pytest.mark.parametrize("text", ["inf", "-inf", "nan", "-1", "1e-12", "1e300", "", "много"])
+def test_parse_quota_rejects(text):
+    with pytest.raises(ValueError):
+        parse_quota(text)
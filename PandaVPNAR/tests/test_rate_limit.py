@@ -0,0 +1,64 @@
+"""
+Ограничитель запросов по скользящему окну.
+"""
+import asyncio
+
+from storage.backends import MemoryBackend
+from utils.rate_limit import SlidingWindowLimiter
+
+class InterleavingBackend(MemoryBackend):
+    """Хранилище, уступающее цикл событий перед каждой операцией, как сетевое."""
+    
+    async def get(self, key):
+        await asyncio.sleep(0)
+        return await super().get(key)
+    
+    async def incr(self, key, amount=1, ttl=None):
+        await asyncio.sleep(0)
+        return await super().incr(key, amount, ttl)
+
+def test_limit_within_window():
+    async def scenario():
+        limiter = SlidingWindowLimiter(MemoryBackend(), limit=3, window=100)
+        results = [await limiter.hit("u", now=1000 + index) for index in range(5)]
+        assert results == [True, True, True, False, False]
+        # Отклоненные запросы не расходуют лимит
+        assert await limiter.backend.get(limiter._key("u", 10)) == "3"
+        assert await limiter.hit("other", now=1001)
+    
+    asyncio.run(scenario())
+
+def test_previous_window_weight():
+    async def scenario():
+        limiter = SlidingWindowLimiter(MemoryBackend(), limit=4, window=100)
+        for index in range(4):
+            assert await limiter.hit("u", now=1000 + index)
+        # Прошла четверть нового окна: из прошлого учитываются 3 запроса из 4
+        assert await limiter.hit("u", now=1125)
+        assert not await limiter.hit("u", now=1126)
+        # Прошло три четверти: из прошлого окна учитывается 1 запрос, проходят еще два
+        assert await limiter.hit("u", now=1175)
+        assert await limiter.hit("u", now=1176)
+        assert not await limiter.hit("u", now=1177)
+        # Через два окна счетчики не учитываются
+        assert await limiter.hit("u", now=1300)
+    
+    asyncio.run(scenario())
+
+def test_concurrent_hits_respect_limit():
+    async def scenario():
+        limiter = SlidingWindowLimiter(InterleavingBackend(), limit=3, window=100)
+        results = await asyncio.gather(*(limiter.hit("u", now=1000) for _ in range(20)))
+        assert sum(results) == 3
+    
+    asyncio.run(scenario())
+
+def test_reset():
+    async def scenario():
+        limiter = SlidingWindowLimiter(MemoryBackend(), limit=1, window=100)
+        assert await limiter.hit("u", now=1000)
+        assert not await limiter.hit("u", now=1001)
+        await limiter.reset("u", now=1001)
+        assert await limiter.hit("u", now=1002)
+    
+    asyncio.run(scenario())
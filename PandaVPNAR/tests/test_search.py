@@ -0,0 +1,79 @@
+"""
+Префиксный индекс ключей для inline-поиска.
+"""
+import random
+
+import pytest
+
+from api.cache import KeyCache
+from api.models import AccessKey
+from services.search import KeySearch, _Node, _tokens
+
+@pytest.fixture(autouse=True)
+def empty_index():
+    KeySearch._root = _Node("")
+    yield
+    KeySearch._root = _Node("")
+
+def make_key(key_id: str, name: str, port: int = 443) -> AccessKey:
+    return AccessKey(f"main:{key_id}", "main", name, port, "m", "p", "", None)
+
+def brute_force(keys, query):
+    query = query.strip().casefold()
+    return {key.id for key in keys.values() if any(token.startswith(query) for token in _tokens(key))}
+
+def test_search_by_name_word_id_and_port():
+    KeySearch.apply(None, make_key("12", "Alice iPhone", 8443))
+    KeySearch.apply(None, make_key("13", "bob-laptop"))
+    assert KeySearch.search("ali", 10) == ["main:12"]
+    assert KeySearch.search("IPH", 10) == ["main:12"]
+    assert KeySearch.search("lap", 10) == ["main:13"]
+    assert KeySearch.search("12", 10) == ["main:12"]
+    assert KeySearch.search("844", 10) == ["main:12"]
+    assert set(KeySearch.search("", 10)) == {"main:12", "main:13"}
+    assert KeySearch.search("carol", 10) == []
+
+def test_rename_and_remove_update_index():
+    old = make_key("1", "alpha")
+    KeySearch.apply(None, old)
+    new = old.replace(name="beta")
+    KeySearch.apply(old, new)
+    assert KeySearch.search("alp", 10) == []
+    assert KeySearch.search("bet", 10) == ["main:1"]
+    KeySearch.apply(new, None)
+    assert KeySearch.search("", 10) == []
+    assert KeySearch._root.children is None  # Опустевшие узлы удалены
+
+def test_limit():
+    for index in range(30):
+        KeySearch.apply(None, make_key(str(100 + index), f"user {index}"))
+    assert len(KeySearch.search("user", 7)) == 7
+
+def test_matches_brute_force_under_random_changes():
+    rng = random.Random(7)
+    words = ["al", "alex", "alexa", "bo", "bob", "box", "x", "xy"]
+    keys = {}
+    for step in range(600):
+        key_id = str(rng.randrange(40))
+        old = keys.get(key_id)
+        if old is not None and rng.random() < 0.3:
+            KeySearch.apply(old, None)
+            del keys[key_id]
+        else:
+            name = " ".join(rng.choice(words) for _ in range(rng.randint(0, 3)))
+            new = make_key(key_id, name, rng.choice([443, 4433, 80]))
+            KeySearch.apply(old, new)
+            keys[key_id] = new
+        
+        for query in ("", "a", "al", "alex", "b", "bo", "x", "44", "1", "zz"):
+            assert set(KeySearch.search(query, 1000)) == brute_force(keys, query), (step, query)
+
+def test_index_follows_key_cache():
+    # Индекс подписан на зеркало при импорте services.search
+    KeyCache.replace([make_key("1", "alpha"), make_key("2", "beta")])
+    assert KeySearch.search("alp", 10) == ["main:1"]
+    KeyCache.put(make_key("2", "alpine"))
+    assert set(KeySearch.search("alp", 10)) == {"main:1", "main:2"}
+    KeyCache.remove("main:1")
+    assert KeySearch.search("alp", 10) == ["main:2"]
+    KeyCache.clear()
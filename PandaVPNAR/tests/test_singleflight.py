@@ -0,0 +1,66 @@
+"""
+Объединение одновременных запросов к Outline.
+"""
+import asyncio
+
+import pytest
+
+from api.outline import OutlineAPI
+from api.singleflight import SingleFlight
+
+def test_concurrent_calls_share_one_result():
+    calls = []
+    
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+    
+    async def scenario():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*(flight.do("main", fetch) for _ in range(10)))
+        assert results == [1] * 10
+        assert await flight.do("main", fetch) == 2  # Завершенный вызов не кэшируется
+        assert flight._calls == {}
+    
+    asyncio.run(scenario())
+
+def test_error_reaches_all_waiters():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("сбой")
+    
+    async def scenario():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*(flight.do("main", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+    
+    asyncio.run(scenario())
+
+def test_cancelled_waiter_does_not_abort_call():
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "ok"
+    
+    async def scenario():
+        flight = SingleFlight("test")
+        first = asyncio.ensure_future(flight.do("main", fetch))
+        second = asyncio.ensure_future(flight.do("main", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == "ok"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+    
+    asyncio.run(scenario())
+
+def test_list_burst_makes_one_request(outline):
+    async def scenario():
+        async with outline(keys=50) as fake:
+            await OutlineAPI.refresh_keys()
+            before = fake.requests
+            results = await asyncio.gather(*(OutlineAPI.get_all_keys() for _ in range(16)))
+            assert fake.requests - before == 1
+            assert all(len(result["accessKeys"]) == 50 for result in results)
+    
+    asyncio.run(scenario())
@@ -0,0 +1,66 @@
+"""
+Кольцевые буферы статистики трафика и сбор счетчиков Outline.
+"""
+import time
+import asyncio
+
+import pytest
+
+from services.traffic import Tier, TrafficStore, TrafficCollector
+
+@pytest.fixture(autouse=True)
+def empty_collector():
+    TrafficCollector.store = TrafficStore()
+    TrafficCollector._last = {}
+    TrafficCollector._changed = set()
+    yield
+    TrafficCollector.store = TrafficStore()
+    TrafficCollector._last = {}
+    TrafficCollector._changed = set()
+
+def test_tier_window_slides_and_expires():
+    tier = Tier(resolution=10, slots=3)
+    tier.bucket = 0
+    tier.grow()
+    tier.grow()
+    tier.add(0, 5)
+    tier.advance(10)
+    tier.add(0, 7)
+    tier.add(1, 1)
+    assert list(tier.totals) == [12, 1]
+    
+    tier.advance(30)  # Ячейка 0 вышла из окна
+    assert list(tier.totals) == [7, 1]
+    tier.advance(100)  # Окно устарело целиком
+    assert list(tier.totals) == [0, 0]
+    assert not any(tier.data)
+
+def test_store_tiers_and_row_reuse():
+    store = TrafficStore()
+    # Окна начинаются с текущего времени, поэтому отсчет идет от начала следующих суток
+    start = (time.time() // 86400 + 1) * 86400
+    store.record({"a": 100, "b": 50}, now=start)
+    store.record({"a": 10}, now=start + 3600)
+    assert store.usage("a") == {"hour": 10, "day": 110, "month": 110}
+    assert store.top("month", 5) == [("a", 110), ("b", 50)]
+    
+    store.remove("a")
+    assert store.usage("a") == {"hour": 0, "day": 0, "month": 0}
+    store.record({"c": 1}, now=start + 3600)
+    assert store._rows["c"] == 0  # Строка удаленного ключа используется повторно
+    assert store.top("month", 5) == [("b", 50), ("c", 1)]
+
+def test_first_sample_seeds_month_only(outline):
+    async def scenario():
+        async with outline(keys=2) as fake:
+            fake.transfer = {"0": 5000, "1": 0}
+            assert await TrafficCollector.collect()
+            usage = TrafficCollector.store.usage("main:0")
+            assert usage["month"] > 5000 and usage["hour"] == 0
+            assert TrafficCollector.known("main:1")
+            assert "main:0" in TrafficCollector.take_changed()
+            
+            await TrafficCollector.collect()
+            assert TrafficCollector.store.usage("main:0")["hour"] == 1024
+    
+    asyncio.run(scenario())
@@ -0,0 +1,106 @@
+"""
+Circuit breaker и транспорт запросов к Outline.
+"""
+import asyncio
+
+import pytest
+
+from config import Config
+from api.transport import CircuitBreaker, CircuitOpenError, Transport, TransportError
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Управляемое время для circuit breaker."""
+    now = [1000.0]
+    monkeypatch.setattr("api.transport.time.monotonic", lambda: now[0])
+    monkeypatch.setattr(Config, "OUTLINE_BREAKER_THRESHOLD", 3)
+    monkeypatch.setattr(Config, "OUTLINE_BREAKER_RESET", 30)
+    return now
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker("main")
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.trips == 1
+    assert not breaker.allow()
+
+def test_breaker_half_open_single_probe(clock):
+    breaker = CircuitBreaker("main")
+    for _ in range(3):
+        breaker.record_failure()
+    clock[0] += 31
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # Пробный запрос уже выполняется
+    
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.trips == 2
+    clock[0] += 31
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+    assert breaker.allow() and breaker.allow()
+
+def test_breaker_release_frees_probe(clock):
+    breaker = CircuitBreaker("main")
+    for _ in range(3):
+        breaker.record_failure()
+    clock[0] += 31
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+class BrokenSession:
+    """Сессия, падающая с непредвиденной ошибкой."""
+    
+    def request(self, *args, **kwargs):
+        raise RuntimeError("сбой внутри клиента")
+
+def test_unexpected_error_releases_probe(clock):
+    async def get_session():
+        return BrokenSession()
+    
+    async def scenario():
+        transport = Transport("main", get_session)
+        for _ in range(3):
+            transport.breaker.record_failure()
+        clock[0] += 31
+        
+        with pytest.raises(TransportError):
+            await transport.request("GET", "server")
+        # Пробный запрос учтен как сбой: автомат снова разомкнут, а не завис в half-open
+        assert transport.breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(CircuitOpenError):
+            await transport.request("GET", "server")
+        clock[0] += 31
+        assert transport.breaker.allow()
+    
+    asyncio.run(scenario())
+
+def test_retries_only_idempotent(monkeypatch):
+    monkeypatch.setattr(Config, "OUTLINE_BREAKER_THRESHOLD", 10)
+    monkeypatch.setattr(Config, "OUTLINE_RETRIES", 2)
+    monkeypatch.setattr(Config, "OUTLINE_RETRY_BACKOFF", 0)
+    calls = []
+    
+    class FailingSession:
+        def request(self, method, *args, **kwargs):
+            calls.append(method)
+            raise asyncio.TimeoutError()
+    
+    async def get_session():
+        return FailingSession()
+    
+    async def scenario():
+        transport = Transport("main", get_session)
+        with pytest.raises(TransportError):
+            await transport.request("GET", "access-keys")
+        with pytest.raises(TransportError):
+            await transport.request("POST", "access-keys")
+        assert calls == ["GET", "GET", "GET", "POST"]
+        assert transport.retries == 2 and transport.timeouts == 4
+    
+    asyncio.run(scenario())
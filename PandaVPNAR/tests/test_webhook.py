@@ -0,0 +1,76 @@
+"""
+Прием обновлений через webhook: проверка секрета.
+"""
+import asyncio
+
+from aiogram import Bot, Dispatcher
+from aiohttp.test_utils import TestClient, TestServer
+
+from config import Config
+from bench.feeder import FakeSession, UpdateFactory
+from web.webhook import WebhookServer, SECRET_HEADER
+
+def make_server(monkeypatch, secret: str = "") -> WebhookServer:
+    monkeypatch.setattr(Config, "WEBHOOK_SECRET", secret)
+    return WebhookServer(Dispatcher(), Bot(token=Config.TELEGRAM_TOKEN, session=FakeSession()))
+
+async def post(server: WebhookServer, headers: dict) -> int:
+    update = UpdateFactory().message(1, "/start")
+    async with TestClient(TestServer(server.app())) as client:
+        resp = await client.post(
+            Config.WEBHOOK_PATH,
+            data=update.model_dump_json(exclude_none=True),
+            headers={"Content-Type": "application/json", **headers}
+        )
+        return resp.status
+
+def test_secret_required_in_webhook_mode(monkeypatch):
+    monkeypatch.setattr(Config, "BOT_MODE", "webhook")
+    monkeypatch.setattr(Config, "WEBHOOK_URL", "https://bot.example")
+    monkeypatch.setattr(Config, "WEBHOOK_SECRET", "")
+    assert not Config.validate()
+    monkeypatch.setattr(Config, "WEBHOOK_SECRET", "configured_secret")
+    assert Config.validate()
+
+def test_updates_rejected_without_secret(monkeypatch):
+    server = make_server(monkeypatch)
+    
+    async def scenario():
+        assert await post(server, {}) == 401
+        assert await post(server, {SECRET_HEADER: ""}) == 401
+        assert server.queued == 0
+    
+    asyncio.run(scenario())
+
+def test_wrong_secret_rejected(monkeypatch):
+    server = make_server(monkeypatch, "configured_secret")
+    
+    async def scenario():
+        assert await post(server, {}) == 401
+        assert await post(server, {SECRET_HEADER: "forged"}) == 401
+        assert await post(server, {SECRET_HEADER: "ключ"}) == 401
+        assert await post(server, {SECRET_HEADER: "configured_secret"}) == 200
+        assert server.queued == 1
+    
+    asyncio.run(scenario())
+
+def test_configured_secret_registered(monkeypatch):
+    server = make_server(monkeypatch, "configured_secret")
+    monkeypatch.setattr(Config, "WEBHOOK_PORT", 0)
+    monkeypatch.setattr(Config, "WEBHOOK_URL", "https://bot.example.com")
+    registered = []
+    make_request = server.bot.session.make_request
+    
+    async def record(bot, method, timeout=None):
+        registered.append(getattr(method, "secret_token", None))
+        return await make_request(bot, method, timeout)
+    
+    server.bot.session.make_request = record
+    
+    async def scenario():
+        assert await post(server, {SECRET_HEADER: "configured_secret"}) == 200
+        await server.start()
+        await server.stop()
+        assert registered == ["configured_secret"]
+    
+    asyncio.run(scenario())
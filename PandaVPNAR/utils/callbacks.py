@@ -0,0 +1,31 @@
+"""
+Ответы на нажатия кнопок в обычных сообщениях и сообщениях inline-режима.
+"""
+from typing import Optional
+
+from aiogram import types
+
+async def edit_callback_text(
+    callback: types.CallbackQuery,
+    text: str,
+    reply_markup: Optional[types.InlineKeyboardMarkup] = None
+) -> None:
+    """
+    Замена текста сообщения, в котором нажата кнопка.
+    
+    У сообщения, отправленного через inline-режим (результат поиска),
+    нет callback.message: оно редактируется по inline_message_id.
+    
+    Args:
+        callback (types.CallbackQuery): Нажатие кнопки
+        text (str): Новый текст
+        reply_markup (Optional[types.InlineKeyboardMarkup]): Новая клавиатура
+    """
+    if callback.inline_message_id:
+        await callback.bot.edit_message_text(
+            text,
+            inline_message_id=callback.inline_message_id,
+            reply_markup=reply_markup
+        )
+    else:
+        await callback.message.edit_text(text, reply_markup=reply_markup)
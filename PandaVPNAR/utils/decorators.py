@@ -6,9 +6,10 @@ from functools import wraps
 from typing import Callable, Any, Awaitable
 
 from aiogram import types
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, InlineQuery
 
 from config import Config
+from utils.metrics import HANDLER_ERRORS
 
 logger = logging.getLogger(__name__)
 
@@ -23,13 +24,16 @@ def admin_only(func: Callable[[Any, Any], Awaitable[Any]]) -> Callable[[Any, Any
         Callable: Обернутая функция
     """
     @wraps(func)
-    async def wrapper(event: Message | CallbackQuery, *args, **kwargs) -> Any:
+    async def wrapper(event: Message | CallbackQuery | InlineQuery, *args, **kwargs) -> Any:
         user_id = event.from_user.id
         
         if user_id != Config.ADMIN_ID:
             if isinstance(event, CallbackQuery):
                 await event.answer("🚫 Доступ запрещен!", show_alert=True)
                 return None
+            elif isinstance(event, InlineQuery):
+                await event.answer([], cache_time=Config.INLINE_CACHE_TIME, is_personal=True)
+                return None
             else:
                 await event.answer("🚫 Доступ запрещен!")
                 return None
@@ -49,16 +53,21 @@ def log_errors(func: Callable[[Any, Any], Awaitable[Any]]) -> Callable[[Any, Any
         Callable: Обернутая функция
     """
     @wraps(func)
-    async def wrapper(event: Message | CallbackQuery, *args, **kwargs) -> Any:
+    async def wrapper(event: Message | CallbackQuery | InlineQuery, *args, **kwargs) -> Any:
         try:
             return await func(event, *args, **kwargs)
         except Exception as e:
+            HANDLER_ERRORS.inc(func.__name__)
             # Определение типа события
             if isinstance(event, Message):
                 user_info = f"user_id={event.from_user.id}, chat_id={event.chat.id}"
                 event_info = f"message_id={event.message_id}, text={event.text}"
-            else:  # CallbackQuery
-                user_info = f"user_id={event.from_user.id}, chat_id={event.message.chat.id}"
+            elif isinstance(event, InlineQuery):
+                user_info = f"user_id={event.from_user.id}"
+                event_info = f"inline_query={event.query}"
+            else:  # CallbackQuery (у сообщения из inline-режима нет чата)
+                chat_id = event.message.chat.id if event.message else None
+                user_info = f"user_id={event.from_user.id}, chat_id={chat_id}"
                 event_info = f"callback_data={event.data}"
             
             logger.error(f"Ошибка в обработчике {func.__name__}: {str(e)}. {user_info}, {event_info}")
@@ -67,6 +76,8 @@ def log_errors(func: Callable[[Any, Any], Awaitable[Any]]) -> Callable[[Any, Any
             try:
                 if isinstance(event, Message):
                     await event.answer("❌ Произошла ошибка при обработке команды.")
+                elif isinstance(event, InlineQuery):
+                    await event.answer([], cache_time=0, is_personal=True)
                 else:  # CallbackQuery
                     await event.answer("❌ Произошла ошибка!", show_alert=True)
             except Exception as send_error:
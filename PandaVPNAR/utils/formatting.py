@@ -0,0 +1,23 @@
+"""
+Форматирование значений для сообщений бота.
+"""
+
+# Единицы объема данных по возрастанию
+BYTE_UNITS = ("Б", "КБ", "МБ", "ГБ", "ТБ")
+
+def format_bytes(amount: int) -> str:
+    """
+    Форматирует объем данных в читаемом виде.
+    
+    Args:
+        amount (int): Объем в байтах
+        
+    Returns:
+        str: Строка вида «1.5 ГБ»
+    """
+    value = float(amount)
+    for unit in BYTE_UNITS:
+        if value < 1024 or unit == BYTE_UNITS[-1]:
+            return f"{value:.0f} {unit}" if unit == BYTE_UNITS[0] else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{amount} Б"
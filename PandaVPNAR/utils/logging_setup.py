@@ -0,0 +1,158 @@
+"""
+Неблокирующее логирование: очередь записей и фоновый поток вывода.
+"""
+import sys
+import copy
+import json
+import queue
+import logging
+import contextvars
+import multiprocessing
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from typing import Any, List, Optional
+
+from config import Config
+
+# Поля корреляции текущего обновления (задаются middleware)
+update_id_var: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("update_id", default=None)
+user_id_var: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("user_id", default=None)
+handler_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("handler", default=None)
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+class ContextFilter(logging.Filter):
+    """
+    Добавление полей корреляции в запись.
+    
+    Фильтр стоит на QueueHandler, то есть выполняется в потоке
+    цикла событий, где контекст обновления еще доступен; поток
+    вывода получает уже заполненные поля.
+    """
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.update_id = update_id_var.get()
+        record.user_id = user_id_var.get()
+        record.handler = handler_var.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """Форматирование записи в одну строку JSON."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in ("update_id", "user_id", "handler"):
+            value = getattr(record, field, None)
+            if value is not None:
+                payload[field] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+class LogQueueHandler(QueueHandler):
+    """
+    QueueHandler без форматирования в потоке цикла событий.
+    
+    Стандартный prepare() форматирует сообщение при постановке в
+    очередь; здесь подставляются только аргументы и текст исключения,
+    а оформление (текст или JSON) выполняет поток вывода.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        message = record.getMessage()
+        if record.exc_info:
+            message = f"{message}\n{logging.Formatter().formatException(record.exc_info)}"
+        record = copy.copy(record)
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        return record
+
+def _file_handler() -> logging.Handler:
+    """Файловый обработчик с ротацией по времени или по размеру."""
+    if Config.LOG_ROTATE_WHEN:
+        return TimedRotatingFileHandler(
+            Config.LOG_FILE, when=Config.LOG_ROTATE_WHEN, backupCount=Config.LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    return RotatingFileHandler(
+        Config.LOG_FILE, maxBytes=Config.LOG_MAX_BYTES, backupCount=Config.LOG_BACKUP_COUNT, encoding="utf-8"
+    )
+
+class LogPipeline:
+    """
+    Логирование через очередь: корневой логгер только ставит записи
+    в очередь, а запись в файл и консоль выполняет поток QueueListener.
+    
+    В многопроцессном режиме очередь общая: процессы-обработчики
+    подключаются к ней через attach(), и в файл пишет только
+    приемный процесс.
+    """
+    
+    _listener: Optional[QueueListener] = None
+    _records: Any = None
+    
+    @staticmethod
+    def _install(records: Any) -> None:
+        """Замена обработчиков корневого логгера постановкой в очередь."""
+        queue_handler = LogQueueHandler(records)
+        queue_handler.addFilter(ContextFilter())
+        
+        root = logging.getLogger()
+        root.setLevel(Config.LOG_LEVEL)
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+    
+    @classmethod
+    def start(cls) -> None:
+        """Настройка корневого логгера и запуск потока вывода."""
+        if cls._listener is not None:
+            return
+        
+        formatter = JsonFormatter() if Config.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+        handlers: List[logging.Handler] = [logging.StreamHandler(sys.stderr)]
+        if Config.LOG_FILE:
+            handlers.append(_file_handler())
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        
+        if Config.BOT_WORKERS > 1:
+            cls._records = multiprocessing.get_context("spawn").Queue()
+        else:
+            cls._records = queue.SimpleQueue()
+        cls._install(cls._records)
+        
+        cls._listener = QueueListener(cls._records, *handlers, respect_handler_level=True)
+        cls._listener.start()
+        
+    @classmethod
+    def records(cls) -> Any:
+        """Очередь записей для передачи процессам-обработчикам."""
+        return cls._records
+    
+    @classmethod
+    def attach(cls, records: Any) -> None:
+        """
+        Подключение процесса-обработчика к очереди приемного процесса.
+        
+        Args:
+            records: Очередь, полученная из records() в приемном процессе
+        """
+        cls._records = records
+        cls._install(records)
+    
+    @classmethod
+    def stop(cls) -> None:
+        """Запись оставшихся сообщений и остановка потока вывода."""
+        if cls._listener is None:
+            return
+        cls._listener.stop()
+        for handler in cls._listener.handlers:
+            handler.close()
+        cls._listener = None
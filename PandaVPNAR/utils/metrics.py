@@ -0,0 +1,188 @@
+"""
+Метрики бота в формате Prometheus.
+"""
+import bisect
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Границы корзин гистограмм длительности (в секундах)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value: str) -> str:
+    """Экранирование значения метки."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """Форматирование набора меток {name="value",...}."""
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    """Форматирование числа без лишней дробной части."""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Metric:
+    """Базовый класс метрики с набором меток."""
+    
+    kind = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        """
+        Args:
+            name (str): Имя метрики
+            documentation (str): Описание для строки HELP
+            labels (Iterable[str]): Имена меток
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        Registry.register(self)
+    
+    def samples(self) -> List[str]:
+        """Строки значений метрики."""
+        raise NotImplementedError
+    
+    def render(self) -> str:
+        """Метрика в текстовом формате Prometheus."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    """Монотонно растущий счетчик."""
+    
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """
+        Увеличение счетчика.
+        
+        Args:
+            *labels (str): Значения меток в порядке объявления
+            amount (float): Приращение
+        """
+        self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labels, key)} {_number(value)}" for key, value in self._values.items()]
+
+class Gauge(Metric):
+    """Текущее значение; может вычисляться функцией в момент сбора."""
+    
+    kind = "gauge"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Iterable[str] = (),
+        function: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+    ):
+        """
+        Args:
+            name (str): Имя метрики
+            documentation (str): Описание для строки HELP
+            labels (Iterable[str]): Имена меток
+            function: Функция, возвращающая значения по кортежам меток в момент сбора
+        """
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function = function
+    
+    def set(self, value: float, *labels: str) -> None:
+        """
+        Установка значения.
+        
+        Args:
+            value (float): Значение
+            *labels (str): Значения меток в порядке объявления
+        """
+        self._values[labels] = value
+    
+    def samples(self) -> List[str]:
+        values = self._function() if self._function else self._values
+        return [f"{self.name}{_labels(self.labels, key)} {_number(value)}" for key, value in values.items()]
+
+class Histogram(Metric):
+    """
+    Гистограмма распределения значений.
+    
+    Для каждого набора меток хранятся счетчики корзин без накопления;
+    накопленные значения считаются только при выдаче метрик, поэтому
+    наблюдение стоит одного бинарного поиска.
+    """
+    
+    kind = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # Корзины + [+Inf, сумма]
+    
+    def observe(self, value: float, *labels: str) -> None:
+        """
+        Учет одного значения.
+        
+        Args:
+            value (float): Наблюдаемое значение
+            *labels (str): Значения меток в порядке объявления
+        """
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+    
+    def samples(self) -> List[str]:
+        lines = []
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket_labels = _labels(self.labels, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {_number(cumulative)}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {_number(cumulative)}")
+        return lines
+
+class Registry:
+    """Реестр всех метрик процесса."""
+    
+    _metrics: Dict[str, Metric] = {}
+    
+    @classmethod
+    def register(cls, metric: Metric) -> None:
+        """Регистрация метрики (повторная регистрация имени заменяет метрику)."""
+        cls._metrics[metric.name] = metric
+    
+    @classmethod
+    def render(cls) -> str:
+        """
+        Все метрики в текстовом формате Prometheus.
+        
+        Returns:
+            str: Тело ответа /metrics
+        """
+        return "\n".join(metric.render() for metric in cls._metrics.values()) + "\n"
+
+# Обновления Telegram и обработчики
+UPDATES = Counter("bot_updates_total", "Обработанные обновления по типу", ("type",))
+UPDATE_LATENCY = Histogram("bot_update_seconds", "Полное время обработки обновления", ("type",))
+HANDLER_LATENCY = Histogram("bot_handler_seconds", "Время работы обработчика", ("handler",))
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Ошибки в обработчиках", ("handler",))
+FSM_UPDATES = Counter("bot_fsm_updates_total", "Обновления по состоянию FSM пользователя", ("state",))
+
+# Запросы к Bot API
+TELEGRAM_LATENCY = Histogram("telegram_request_seconds", "Время запроса к Bot API", ("method",))
+TELEGRAM_ERRORS = Counter("telegram_request_errors_total", "Неудачные запросы к Bot API", ("method",))
+
+# Запросы к серверам Outline
+OUTLINE_REQUESTS = Counter("outline_requests_total", "Попытки запросов к Outline", ("server", "method", "endpoint", "status"))
+OUTLINE_LATENCY = Histogram("outline_request_seconds", "Время попытки запроса к Outline", ("server", "method", "endpoint"))
+OUTLINE_RETRIES = Counter("outline_retries_total", "Повторы запросов к Outline", ("server", "method", "endpoint"))
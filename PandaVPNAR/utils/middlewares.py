@@ -0,0 +1,161 @@
+"""
+Middleware для сбора метрик обработки обновлений и запросов к Bot API,
+для полей корреляции в логах и учета незавершенных обработчиков.
+"""
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+from aiogram.types import TelegramObject, Update
+
+from utils.logging_setup import update_id_var, user_id_var, handler_var
+from utils.metrics import (
+    Gauge, UPDATES, UPDATE_LATENCY, HANDLER_LATENCY, FSM_UPDATES,
+    TELEGRAM_LATENCY, TELEGRAM_ERRORS
+)
+
+logger = logging.getLogger(__name__)
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """
+    Внешний middleware обновлений: число обновлений по типу, полное
+    время обработки и состояние FSM, в котором пришло обновление.
+    """
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        update_type = event.event_type
+        UPDATES.inc(update_type)
+        FSM_UPDATES.inc(data.get("raw_state") or "none")
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            UPDATE_LATENCY.observe(time.perf_counter() - started, update_type)
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Внутренний middleware: время работы конкретного обработчика."""
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object else "unknown"
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, name)
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: время и ошибки запросов к Bot API."""
+    
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            TELEGRAM_ERRORS.inc(name)
+            raise
+        finally:
+            TELEGRAM_LATENCY.observe(time.perf_counter() - started, name)
+
+class LogContextMiddleware(BaseMiddleware):
+    """
+    Внешний middleware обновлений: ID обновления и пользователя для
+    всех записей лога, сделанных во время обработки.
+    """
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        update_token = update_id_var.set(event.update_id)
+        user_token = user_id_var.set(user.id if user else None)
+        try:
+            return await handler(event, data)
+        finally:
+            update_id_var.reset(update_token)
+            user_id_var.reset(user_token)
+
+class HandlerLogContextMiddleware(BaseMiddleware):
+    """Внутренний middleware: имя обработчика для записей лога."""
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        token = handler_var.set(handler_object.callback.__name__ if handler_object else None)
+        try:
+            return await handler(event, data)
+        finally:
+            handler_var.reset(token)
+
+class InFlightMiddleware(BaseMiddleware):
+    """
+    Внешний middleware обновлений: число обновлений в обработке.
+    
+    При остановке прием обновлений прекращается раньше закрытия сессий,
+    и drain() дает начатым обработчикам (например, созданию ключа на
+    сервере) завершиться и отчитаться администратору.
+    """
+    
+    _active: int = 0
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        InFlightMiddleware._active += 1
+        try:
+            return await handler(event, data)
+        finally:
+            InFlightMiddleware._active -= 1
+    
+    @classmethod
+    async def drain(cls, timeout: float) -> int:
+        """
+        Ожидание завершения начатых обработчиков.
+        
+        Args:
+            timeout (float): Максимальное время ожидания в секундах
+            
+        Returns:
+            int: Число обработчиков, не завершившихся за отведенное время
+        """
+        if cls._active:
+            logger.info(f"Ожидание завершения обработчиков: {cls._active}")
+        deadline = time.monotonic() + timeout
+        while cls._active and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if cls._active:
+            logger.warning(f"Не завершено обработчиков при остановке: {cls._active}")
+        return cls._active
+
+IN_FLIGHT = Gauge("bot_updates_in_flight", "Обновления в обработке", function=lambda: {(): InFlightMiddleware._active})
@@ -0,0 +1,110 @@
+"""
+Ограничение частоты запросов пользователей по скользящему окну.
+"""
+import time
+import logging
+from typing import Optional
+
+from config import Config
+from storage.backends import Backend, Storage
+
+logger = logging.getLogger(__name__)
+
+class SlidingWindowLimiter:
+    """
+    Ограничитель «скользящее окно со счетчиками».
+    
+    Хранит по два счетчика на субъекта (текущее и предыдущее окно) и
+    оценивает число запросов за последние window секунд как
+    prev * (1 - доля прошедшего окна) + curr. Проверка стоит O(1),
+    счетчики истекают сами через два окна.
+    
+    Счетчик текущего окна сначала атомарно увеличивается, и решение
+    принимается по возвращенному значению: одновременные запросы из
+    разных процессов получают разные значения и не проходят лимит все
+    вместе. Отклоненный запрос возвращает свое приращение.
+    """
+    
+    def __init__(self, backend: Backend, limit: int, window: float, prefix: str = "rl"):
+        """
+        Args:
+            backend (Backend): Хранилище счетчиков
+            limit (int): Максимум запросов за окно
+            window (float): Длина окна в секундах
+            prefix (str): Префикс ключей в хранилище
+        """
+        self.backend = backend
+        self.limit = limit
+        self.window = window
+        self.prefix = prefix
+    
+    def _key(self, subject: str, window_id: int) -> str:
+        """Ключ счетчика субъекта в заданном окне."""
+        return f"{self.prefix}:{subject}:{window_id}"
+    
+    async def hit(self, subject: str, now: Optional[float] = None) -> bool:
+        """
+        Учет запроса, если лимит не превышен.
+        
+        Args:
+            subject (str): Идентификатор субъекта (например, ID пользователя)
+            now (Optional[float]): Текущее время (для проверок)
+        
+        Returns:
+            bool: True если запрос разрешен
+        """
+        now = time.time() if now is None else now
+        window_id = int(now // self.window)
+        elapsed = (now % self.window) / self.window
+        
+        key = self._key(subject, window_id)
+        current = await self.backend.incr(key, ttl=self.window * 2)
+        previous = int(await self.backend.get(self._key(subject, window_id - 1)) or 0)
+        if previous * (1 - elapsed) + current > self.limit:
+            await self.backend.incr(key, -1)
+            return False
+        return True
+    
+    async def reset(self, subject: str, now: Optional[float] = None) -> None:
+        """
+        Сброс счетчиков субъекта.
+        
+        Args:
+            subject (str): Идентификатор субъекта
+            now (Optional[float]): Текущее время (для проверок)
+        """
+        window_id = int((time.time() if now is None else now) // self.window)
+        await self.backend.delete(self._key(subject, window_id - 1))
+        await self.backend.delete(self._key(subject, window_id))
+
+class RequestLimiter:
+    """Лимит запросов ключей от пользователей (REQUEST_LIMIT за REQUEST_WINDOW)."""
+    
+    _limiter: Optional[SlidingWindowLimiter] = None
+    
+    @classmethod
+    def get(cls) -> SlidingWindowLimiter:
+        """Получение ограничителя (создается при первом обращении)."""
+        if cls._limiter is None:
+            cls._limiter = SlidingWindowLimiter(
+                Storage.get(), Config.REQUEST_LIMIT, Config.REQUEST_WINDOW, prefix="requests"
+            )
+        return cls._limiter
+    
+    @classmethod
+    async def check(cls, user_id: int) -> bool:
+        """
+        Проверка лимита запросов пользователя.
+        
+        Args:
+            user_id (int): ID пользователя
+        
+        Returns:
+            bool: True если лимит не превышен, иначе False
+        """
+        try:
+            return await cls.get().hit(str(user_id))
+        except Exception as e:
+            # Недоступность хранилища не должна блокировать пользователей
+            logger.error(f"Ошибка проверки лимита запросов: {str(e)}")
+            return True
@@ -0,0 +1,220 @@
+"""
+Очередь исходящих сообщений с учетом лимитов Telegram.
+"""
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Any
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest
+
+from config import Config, Messages
+from utils.metrics import Gauge
+from utils.tasks import TaskSupervisor
+
+logger = logging.getLogger(__name__)
+
+# Максимальная длина текста сообщения Telegram
+MAX_MESSAGE_LENGTH = 4096
+
+# Разделитель сообщений внутри дайджеста
+DIGEST_SEPARATOR = "\n\n➖➖➖\n\n"
+
+class OutboundMessage:
+    """Сообщение, ожидающее отправки."""
+    
+    __slots__ = ("chat_id", "text", "kwargs", "digest", "attempts")
+    
+    def __init__(self, chat_id: int, text: str, digest: Optional[str], kwargs: Dict[str, Any]):
+        self.chat_id = chat_id
+        self.text = text
+        self.digest = digest
+        self.kwargs = kwargs
+        self.attempts = 0
+
+class MessageQueue:
+    """
+    Центральная очередь исходящих сообщений.
+    
+    Соблюдает общий лимит отправки и интервал между сообщениями в один
+    чат, повторяет отправку после TelegramRetryAfter. Сообщения с
+    одинаковым ключом дайджеста, накопившиеся для одного чата, пока
+    он ждет своей очереди, объединяются в одно сообщение.
+    """
+    
+    TASK = "send_queue"
+    
+    _bot: Optional[Bot] = None
+    _pending: "OrderedDict[int, Deque[OutboundMessage]]" = OrderedDict()
+    _next_allowed: Dict[int, float] = {}  # Чат -> момент, когда в него можно писать снова
+    _global_next: float = 0.0
+    _rate: float = Config.SEND_GLOBAL_RATE
+    _size: int = 0
+    _wakeup: Optional[asyncio.Event] = None
+    _running: bool = False
+    
+    @classmethod
+    def start(cls, bot: Bot, rate: Optional[float] = None) -> None:
+        """
+        Запуск фоновой отправки.
+        
+        Args:
+            bot (Bot): Экземпляр бота
+            rate (Optional[float]): Лимит сообщений в секунду для процесса (по умолчанию SEND_GLOBAL_RATE)
+        """
+        cls._bot = bot
+        cls._rate = rate or Config.SEND_GLOBAL_RATE
+        cls._wakeup = asyncio.Event()
+        cls._running = True
+        TaskSupervisor.spawn(cls.TASK, cls._run)
+    
+    @classmethod
+    def send(cls, chat_id: int, text: str, digest: Optional[str] = None, **kwargs: Any) -> bool:
+        """
+        Постановка сообщения в очередь без ожидания отправки.
+        
+        Args:
+            chat_id (int): ID чата
+            text (str): Текст сообщения
+            digest (Optional[str]): Ключ дайджеста: сообщения с одним ключом могут быть объединены
+            **kwargs: Дополнительные параметры send_message
+        
+        Returns:
+            bool: True если сообщение принято в очередь
+        """
+        if cls._size >= Config.SEND_QUEUE_LIMIT:
+            logger.error(f"Очередь отправки переполнена, сообщение в чат {chat_id} отброшено")
+            return False
+        
+        cls._pending.setdefault(chat_id, deque()).append(OutboundMessage(chat_id, text, digest, kwargs))
+        cls._size += 1
+        if cls._wakeup:
+            cls._wakeup.set()
+        return True
+    
+    @classmethod
+    def _take(cls, chat_id: int) -> OutboundMessage:
+        """Извлечение следующего сообщения чата с объединением дайджеста."""
+        queue = cls._pending[chat_id]
+        message = queue.popleft()
+        cls._size -= 1
+        if message.digest is None or not queue or queue[0].digest != message.digest:
+            return message
+        
+        parts = [message.text]
+        length = len(message.text)
+        while queue and queue[0].digest == message.digest:
+            extra = len(DIGEST_SEPARATOR) + len(queue[0].text)
+            if length + extra > MAX_MESSAGE_LENGTH - 100:
+                break
+            parts.append(queue.popleft().text)
+            cls._size -= 1
+            length += extra
+        
+        if len(parts) > 1:
+            message.text = Messages.DIGEST_HEADER.format(count=len(parts)) + DIGEST_SEPARATOR.join(parts)
+        return message
+    
+    @classmethod
+    def _ready_chat(cls, now: float) -> Optional[int]:
+        """Поиск чата с сообщениями, в который уже можно писать."""
+        for chat_id, queue in cls._pending.items():
+            if queue and cls._next_allowed.get(chat_id, 0.0) <= now:
+                return chat_id
+        return None
+    
+    @classmethod
+    async def _wait(cls, timeout: Optional[float]) -> None:
+        """Ожидание нового сообщения или истечения таймаута."""
+        cls._wakeup.clear()
+        try:
+            await asyncio.wait_for(cls._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+    
+    @classmethod
+    async def _run(cls) -> None:
+        """Основной цикл отправки."""
+        while cls._running:
+            now = time.monotonic()
+            if cls._global_next > now:
+                await asyncio.sleep(cls._global_next - now)
+                continue
+            
+            chat_id = cls._ready_chat(now)
+            if chat_id is None:
+                waits = [cls._next_allowed.get(chat, 0.0) - now for chat, queue in cls._pending.items() if queue]
+                await cls._wait(max(0.0, min(waits)) if waits else None)
+                continue
+            
+            message = cls._take(chat_id)
+            # Чат переходит в конец очереди, чтобы остальные чаты не ждали
+            cls._pending.move_to_end(chat_id)
+            if not cls._pending[chat_id]:
+                del cls._pending[chat_id]
+            
+            cls._global_next = time.monotonic() + 1 / cls._rate
+            cls._next_allowed[chat_id] = time.monotonic() + Config.SEND_CHAT_INTERVAL
+            await cls._deliver(message)
+            cls._prune(now)
+    
+    @classmethod
+    def _prune(cls, now: float) -> None:
+        """Удаление истекших интервалов чатов, чтобы словарь не рос без ограничений."""
+        if len(cls._next_allowed) > 1000:
+            cls._next_allowed = {
+                chat_id: moment for chat_id, moment in cls._next_allowed.items()
+                if moment > now or chat_id in cls._pending
+            }
+    
+    @classmethod
+    async def _deliver(cls, message: OutboundMessage) -> None:
+        """Отправка одного сообщения с обработкой ошибок."""
+        message.attempts += 1
+        try:
+            await cls._bot.send_message(message.chat_id, message.text, **message.kwargs)
+            return
+        except TelegramRetryAfter as e:
+            logger.warning(f"Лимит Telegram для чата {message.chat_id}, повтор через {e.retry_after} с")
+            cls._next_allowed[message.chat_id] = time.monotonic() + e.retry_after
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            logger.error(f"Сообщение в чат {message.chat_id} не доставлено: {str(e)}")
+            return
+        except Exception as e:
+            logger.error(f"Ошибка отправки в чат {message.chat_id}: {str(e)}")
+            cls._next_allowed[message.chat_id] = time.monotonic() + Config.SEND_CHAT_INTERVAL * 2 ** message.attempts
+        
+        if message.attempts >= Config.SEND_MAX_ATTEMPTS:
+            logger.error(f"Сообщение в чат {message.chat_id} отброшено после {message.attempts} попыток")
+            return
+        # Возвращаем сообщение в начало очереди чата
+        cls._pending.setdefault(message.chat_id, deque()).appendleft(message)
+        cls._size += 1
+    
+    @classmethod
+    async def stop(cls, timeout: float = 5.0) -> None:
+        """
+        Остановка отправки с попыткой доставить оставшиеся сообщения.
+        
+        Args:
+            timeout (float): Максимальное время ожидания в секундах
+        """
+        deadline = time.monotonic() + timeout
+        while cls._size and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if cls._size:
+            logger.warning(f"Не отправлено сообщений при остановке: {cls._size}")
+        
+        if TaskSupervisor.running(cls.TASK):
+            # Флаг нужен помимо отмены: wait_for в Python 3.11 может
+            # поглотить отмену, если ожидание завершилось одновременно с ней
+            cls._running = False
+            cls._wakeup.set()
+            await TaskSupervisor.cancel(cls.TASK)
+
+SEND_QUEUE_SIZE = Gauge(
+    "bot_send_queue_size", "Сообщения в очереди отправки",
+    function=lambda: {(): MessageQueue._size}
+)
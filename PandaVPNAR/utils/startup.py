@@ -0,0 +1,60 @@
+"""
+Быстрый запуск: параллельное выполнение независимых этапов инициализации.
+"""
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+async def check_dns(host: str = "api.telegram.org") -> None:
+    """
+    Неблокирующая проверка подключения: разрешение имени в пуле потоков цикла событий.
+    
+    Args:
+        host (str): Проверяемое имя хоста
+    """
+    await asyncio.get_running_loop().getaddrinfo(host, 443)
+
+async def _run_phase(name: str, step: Awaitable[Any], timeout: float) -> bool:
+    """Выполнение одного этапа с таймаутом и записью его длительности."""
+    started = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(step, timeout)
+        status = "ошибка" if result is False else "успешно"
+    except asyncio.TimeoutError:
+        result, status = False, f"не завершен за {timeout} с"
+    except Exception as e:
+        result, status = False, f"ошибка: {str(e)}"
+    
+    elapsed = (time.perf_counter() - started) * 1000
+    level = logging.INFO if result is not False else logging.WARNING
+    logger.log(level, f"Этап запуска «{name}»: {status}, {elapsed:.0f} мс")
+    return result is not False
+
+async def run_startup(phases: Dict[str, Awaitable[Any]], timeout: Optional[float] = None) -> Dict[str, bool]:
+    """
+    Параллельный запуск этапов инициализации.
+    
+    Этапы не зависят друг от друга, поэтому общее время запуска равно
+    времени самого долгого из них, а не сумме. Этап, не уложившийся в
+    таймаут, отменяется, и запуск продолжается без него: зеркало ключей
+    и соединения с Outline догрузятся при первом запросе. Работа, которая
+    не догружается сама (лимиты и сроки ключей в задачах лидера), сюда
+    не передается.
+    
+    Args:
+        phases (Dict[str, Awaitable[Any]]): Этапы по названию
+        timeout (Optional[float]): Таймаут одного этапа (по умолчанию STARTUP_TIMEOUT)
+        
+    Returns:
+        Dict[str, bool]: Успешность этапов по названию; этап, вернувший False, считается неуспешным
+    """
+    timeout = timeout or Config.STARTUP_TIMEOUT
+    started = time.perf_counter()
+    results = await asyncio.gather(*(_run_phase(name, step, timeout) for name, step in phases.items()))
+    logger.info(f"Инициализация заняла {(time.perf_counter() - started) * 1000:.0f} мс")
+    return dict(zip(phases, results))
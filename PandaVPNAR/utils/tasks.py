@@ -0,0 +1,97 @@
+"""
+Надзор за фоновыми задачами: учет, перезапуск после сбоя и остановка.
+"""
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict
+
+from config import Config
+from utils.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+class TaskSupervisor:
+    """
+    Реестр фоновых задач процесса.
+    
+    Каждая задача запускается по имени и хранится до остановки, поэтому
+    ее не соберет сборщик мусора и ее можно отменить. Задача, упавшая с
+    исключением, перезапускается с экспоненциальной задержкой от
+    TASK_RESTART_DELAY до TASK_RESTART_MAX_DELAY; если до сбоя она
+    проработала дольше максимальной задержки, отсчет начинается заново.
+    """
+    
+    _tasks: Dict[str, asyncio.Task] = {}
+    
+    @classmethod
+    def spawn(cls, name: str, factory: Callable[[], Awaitable[None]]) -> None:
+        """
+        Запуск фоновой задачи под надзором.
+        
+        Args:
+            name (str): Уникальное имя задачи (для логов, метрик и отмены)
+            factory: Функция, создающая корутину задачи при каждом запуске
+        """
+        if cls.running(name):
+            logger.warning(f"Фоновая задача {name} уже запущена")
+            return
+        cls._tasks[name] = asyncio.create_task(cls._supervise(name, factory), name=name)
+    
+    @classmethod
+    def running(cls, name: str) -> bool:
+        """
+        Проверка, что задача запущена и еще не завершилась.
+        
+        Args:
+            name (str): Имя задачи
+            
+        Returns:
+            bool: True, если задача работает (в том числе ждет перезапуска)
+        """
+        task = cls._tasks.get(name)
+        return task is not None and not task.done()
+    
+    @classmethod
+    async def _supervise(cls, name: str, factory: Callable[[], Awaitable[None]]) -> None:
+        """Выполнение задачи с перезапуском после сбоев."""
+        delay = Config.TASK_RESTART_DELAY
+        while True:
+            started = time.monotonic()
+            try:
+                await factory()
+                logger.info(f"Фоновая задача {name} завершена")
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if time.monotonic() - started > Config.TASK_RESTART_MAX_DELAY:
+                    delay = Config.TASK_RESTART_DELAY
+                logger.exception(f"Фоновая задача {name} упала: {str(e)}; перезапуск через {delay:g} с")
+                TASK_RESTARTS.inc(name)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, Config.TASK_RESTART_MAX_DELAY)
+    
+    @classmethod
+    async def cancel(cls, *names: str) -> None:
+        """
+        Отмена задач по именам с ожиданием их завершения.
+        
+        Args:
+            *names (str): Имена задач
+        """
+        tasks = [cls._tasks.pop(name) for name in names if name in cls._tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    @classmethod
+    async def stop(cls) -> None:
+        """Отмена всех фоновых задач при завершении работы."""
+        await cls.cancel(*list(cls._tasks))
+
+TASK_RESTARTS = Counter("bot_task_restarts_total", "Перезапуски фоновых задач после сбоя", ("task",))
+TASKS_RUNNING = Gauge(
+    "bot_tasks_running", "Работающие фоновые задачи",
+    function=lambda: {(): sum(1 for task in TaskSupervisor._tasks.values() if not task.done())}
+)
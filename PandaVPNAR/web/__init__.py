@@ -0,0 +1,3 @@
+"""
+Пакет с HTTP-сервисами бота.
+"""
\ No newline at end of file
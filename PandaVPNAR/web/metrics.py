@@ -0,0 +1,50 @@
+"""
+HTTP-эндпоинт метрик для Prometheus.
+"""
+import logging
+from typing import Optional
+
+from aiohttp import web
+
+from config import Config
+from utils.metrics import Registry
+
+logger = logging.getLogger(__name__)
+
+# Тип содержимого текстового формата Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class MetricsServer:
+    """Отдельный HTTP-сервер с маршрутом /metrics."""
+    
+    _runner: Optional[web.AppRunner] = None
+    
+    @staticmethod
+    async def handle_metrics(request: web.Request) -> web.Response:
+        """Выдача всех метрик."""
+        return web.Response(body=Registry.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+    
+    @classmethod
+    async def start(cls, port: Optional[int] = None) -> None:
+        """
+        Запуск сервера, если порт задан.
+        
+        Args:
+            port (Optional[int]): Порт (по умолчанию METRICS_PORT; 0 — не запускать)
+        """
+        port = Config.METRICS_PORT if port is None else port
+        if not port:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", cls.handle_metrics)
+        cls._runner = web.AppRunner(app, access_log=None)
+        await cls._runner.setup()
+        await web.TCPSite(cls._runner, Config.METRICS_HOST, port).start()
+        logger.info(f"Метрики доступны на http://{Config.METRICS_HOST}:{port}/metrics")
+    
+    @classmethod
+    async def stop(cls) -> None:
+        """Остановка сервера."""
+        if cls._runner:
+            await cls._runner.cleanup()
+            cls._runner = None
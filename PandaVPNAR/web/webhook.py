@@ -0,0 +1,159 @@
+"""
+Прием обновлений Telegram через webhook.
+"""
+import hmac
+import asyncio
+import logging
+from typing import List, Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Заголовок, в котором Telegram передает секрет webhook
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+def update_user_id(update: Update) -> int:
+    """
+    Определение ID пользователя, от которого пришло обновление.
+    
+    Args:
+        update (Update): Обновление Telegram
+    
+    Returns:
+        int: ID пользователя или 0, если пользователя нет
+    """
+    user = getattr(update.event, "from_user", None)
+    return user.id if user else 0
+
+class WebhookServer:
+    """
+    HTTP-сервер webhook с ограниченной очередью обработки.
+    
+    Обновления раскладываются по очередям обработчиков по ID пользователя:
+    обновления одного пользователя обрабатываются строго по порядку,
+    разных пользователей — параллельно. При переполнении очереди
+    сервер отвечает 503, и Telegram повторит доставку позже.
+    
+    Обновления без верного секрета в заголовке отклоняются всегда.
+    WEBHOOK_SECRET обязателен в режиме webhook (Config.validate): секрет
+    общий для всех экземпляров бота за балансировщиком, без него
+    сервер отклоняет любое обновление.
+    """
+    
+    def __init__(self, dp: Dispatcher, bot: Bot):
+        """
+        Args:
+            dp (Dispatcher): Диспетчер с зарегистрированными роутерами
+            bot (Bot): Экземпляр бота
+        """
+        self.dp = dp
+        self.bot = bot
+        self.secret = Config.WEBHOOK_SECRET
+        workers = max(1, Config.WEBHOOK_WORKERS)
+        queue_size = max(1, Config.WEBHOOK_QUEUE_SIZE // workers)
+        self._queues: List[asyncio.Queue] = [asyncio.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._workers: List[asyncio.Task] = []
+        self._runner: Optional[web.AppRunner] = None
+        self.in_flight = 0
+        self.rejected = 0
+    
+    @property
+    def queued(self) -> int:
+        """Число обновлений, ожидающих обработки."""
+        return sum(queue.qsize() for queue in self._queues)
+    
+    def app(self) -> web.Application:
+        """
+        Создание aiohttp-приложения с маршрутами webhook и проверки состояния.
+        
+        Returns:
+            web.Application: Приложение
+        """
+        app = web.Application()
+        app.router.add_post(Config.WEBHOOK_PATH, self.handle_update)
+        app.router.add_get("/health", self.handle_health)
+        return app
+    
+    async def handle_update(self, request: web.Request) -> web.Response:
+        """Прием одного обновления от Telegram."""
+        secret = request.headers.get(SECRET_HEADER, "")
+        if not self.secret or not hmac.compare_digest(secret.encode(), self.secret.encode()):
+            logger.warning(f"Webhook: неверный секрет от {request.remote}")
+            return web.Response(status=401)
+        
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            logger.error(f"Webhook: некорректное обновление: {str(e)}")
+            return web.Response(status=400)
+        
+        queue = self._queues[update_user_id(update) % len(self._queues)]
+        try:
+            queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning("Webhook: очередь обработки переполнена")
+            return web.Response(status=503)
+        return web.Response()
+    
+    async def handle_health(self, request: web.Request) -> web.Response:
+        """Проверка состояния для балансировщика."""
+        return web.json_response({
+            "status": "ok",
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected
+        })
+    
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        """Последовательная обработка обновлений из одной очереди."""
+        while True:
+            update = await queue.get()
+            self.in_flight += 1
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                logger.error(f"Webhook: ошибка обработки обновления {update.update_id}: {str(e)}")
+            finally:
+                self.in_flight -= 1
+                queue.task_done()
+    
+    async def start(self) -> None:
+        """Регистрация webhook в Telegram и запуск HTTP-сервера."""
+        self._workers = [asyncio.create_task(self._worker(queue)) for queue in self._queues]
+        
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, Config.WEBHOOK_HOST, Config.WEBHOOK_PORT).start()
+        
+        await self.bot.set_webhook(
+            url=Config.WEBHOOK_URL.rstrip("/") + Config.WEBHOOK_PATH,
+            secret_token=self.secret,
+            allowed_updates=self.dp.resolve_used_update_types(),
+            max_connections=Config.WEBHOOK_MAX_CONNECTIONS
+        )
+        logger.info(f"Webhook запущен на {Config.WEBHOOK_HOST}:{Config.WEBHOOK_PORT}{Config.WEBHOOK_PATH}")
+    
+    async def stop(self) -> None:
+        """Остановка HTTP-сервера и обработка уже принятых обновлений."""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues)),
+                Config.WEBHOOK_DRAIN_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Webhook: не обработано обновлений при остановке: {self.queued}")
+        
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []